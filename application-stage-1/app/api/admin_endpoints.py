@@ -0,0 +1,290 @@
+from dataclasses import asdict
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import asyncio
+import logging
+import secrets
+
+from app.config import settings
+from app.models.schemas import (
+    ProfileRequest,
+    RebuildRequest,
+    SnapshotRequest,
+    SnapshotRestoreRequest,
+    SnapshotRestoreResponse,
+)
+from app.services.rebuild_service import RebuildService
+from app.services.snapshot_service import SnapshotService
+
+if TYPE_CHECKING:
+    from app.services.analytics.hot_questions import HotQuestionService
+    from app.services.experiments.experiment import Experiment
+    from app.services.experiments.experiment_sink import ExperimentSink
+    from app.services.profiling import ProcessProfiler, SlowRequestProfiler
+
+logger = logging.getLogger(__name__)
+
+
+async def verify_admin_token(
+    x_admin_token: Optional[str] = Header(None, max_length=256),
+) -> None:
+    """Проверка токена администратора из заголовка X-Admin-Token
+
+    Без ADMIN_TOKEN в настройках административный API выключен
+    """
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=403, detail="Административный API выключен: не задан ADMIN_TOKEN"
+        )
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token.encode("utf-8"), settings.admin_token.encode("utf-8")
+    ):
+        raise HTTPException(status_code=401, detail="Неверный токен администратора")
+
+
+admin_router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+snapshot_service: SnapshotService | None = None
+rebuild_service: RebuildService | None = None
+experiment: Optional["Experiment"] = None
+experiment_sink: Optional["ExperimentSink"] = None
+process_profiler: Optional["ProcessProfiler"] = None
+slow_request_profiler: Optional["SlowRequestProfiler"] = None
+hot_question_service: Optional["HotQuestionService"] = None
+
+
+def get_snapshot_service() -> SnapshotService:
+    if not snapshot_service:
+        logger.error("Сервис снимков не инициализирован")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return snapshot_service
+
+
+@admin_router.get("/snapshots")
+async def list_snapshots() -> List[Dict[str, Any]]:
+    """Список снимков коллекций"""
+    service = get_snapshot_service()
+    return await asyncio.to_thread(service.list_snapshots)
+
+
+@admin_router.post("/snapshots")
+async def create_snapshot(request: SnapshotRequest) -> Dict[str, Any]:
+    """Создание снимка всех подключенных коллекций
+
+    Пример запроса:
+    ```json
+    {
+        "name": "before-update",
+        "dtype": "float16"
+    }
+    """
+    service = get_snapshot_service()
+    try:
+        return await asyncio.to_thread(
+            service.export_snapshot, request.name, request.dtype
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (FileExistsError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"При создании снимка произошла ошибка: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+
+@admin_router.post(
+    "/snapshots/{name}/restore", response_model=SnapshotRestoreResponse
+)
+async def restore_snapshot(name: str, request: SnapshotRestoreRequest):
+    """Восстановление коллекций из снимка без повторного расчета эмбеддингов"""
+    service = get_snapshot_service()
+    try:
+        result = await asyncio.to_thread(service.restore_snapshot, name, request.force)
+        if rebuild_service:
+            await asyncio.to_thread(rebuild_service.rag_service.invalidate_answer_cache)
+        return result
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"При восстановлении снимка произошла ошибка: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+
+def get_rebuild_service() -> RebuildService:
+    if not rebuild_service:
+        logger.error("Сервис пересборки не инициализирован")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return rebuild_service
+
+
+@admin_router.post("/rebuild", status_code=202)
+async def start_rebuild(request: RebuildRequest) -> Dict[str, Any]:
+    """Запуск пересборки коллекции в теневое поколение
+
+    Запросы продолжают обслуживаться текущим поколением до переключения
+    """
+    service = get_rebuild_service()
+    try:
+        return service.start(request.chunk_size, request.chunk_overlap)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.get("/rebuild")
+async def get_rebuild_status() -> Dict[str, Any]:
+    """Статус последней пересборки коллекции"""
+    return get_rebuild_service().status
+
+
+@admin_router.post("/rollback")
+async def rollback_collection() -> Dict[str, Any]:
+    """Возврат коллекции к предыдущему поколению"""
+    service = get_rebuild_service()
+    try:
+        if not await asyncio.to_thread(service.rollback):
+            raise HTTPException(status_code=409, detail="Нет поколения для отката")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return service.rag_service.vector_store.get_collection_info()
+
+
+@admin_router.get("/experiments")
+async def get_experiment_summary() -> Dict[str, Any]:
+    """Сводка текущего эксперимента по вариантам: задержки, токены, уверенность, кэш"""
+    if not experiment or not experiment_sink:
+        raise HTTPException(status_code=404, detail="Эксперимент не настроен")
+    return {
+        "experiment": experiment.name,
+        "weights": {arm.name: arm.weight for arm in experiment.arms},
+        "arms": await asyncio.to_thread(experiment_sink.summary, experiment.name),
+    }
+
+
+def get_hot_question_service() -> "HotQuestionService":
+    if not hot_question_service:
+        raise HTTPException(
+            status_code=404,
+            detail="Подготовка ответов на частые вопросы не включена в этом воркере",
+        )
+    return hot_question_service
+
+
+@admin_router.get("/hot-questions")
+async def get_hot_questions() -> Dict[str, Any]:
+    """Журнал запросов и подготовленные ответы: частые вопросы, доли попаданий в кэши"""
+    service = get_hot_question_service()
+    since = datetime.now().timestamp() - service.window_days * 86400
+    return {
+        "status": service.status,
+        "query_log": await asyncio.to_thread(service.query_log.summary, since),
+        "top_questions": [
+            asdict(cluster) for cluster in await asyncio.to_thread(service.top_questions)
+        ],
+        "precomputed": await asyncio.to_thread(service.precomputed_answers.entries),
+    }
+
+
+@admin_router.post("/hot-questions/precompute", status_code=202)
+async def precompute_hot_questions(force: bool = False) -> Dict[str, Any]:
+    """Подготовка ответов на частые вопросы сейчас, вне окна низкой нагрузки
+
+    Вопросы с актуальными ответами пропускаются, force=true готовит все заново
+    """
+    try:
+        return get_hot_question_service().run_now(force)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.post("/profile")
+async def profile_process(request: ProfileRequest) -> Response:
+    """Профилирование работающего процесса в течение seconds, результат — файл
+
+    Одновременно в воркере выполняется одно профилирование, повторный запрос — 409.
+    cprofile (pstats): `python -m pstats profile.prof`, snakeviz;
+    sampling: свернутые стеки для flamegraph.pl / speedscope
+
+    Пример запроса:
+    ```json
+    {
+        "seconds": 10,
+        "mode": "sampling"
+    }
+    """
+    if not process_profiler:
+        logger.error("Профилировщик не инициализирован")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    if request.seconds > process_profiler.max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Длительность профилирования не больше {process_profiler.max_seconds} с",
+        )
+
+    logger.info(f"Профилирование процесса ({request.mode}) на {request.seconds} с")
+    try:
+        if request.mode == "cprofile":
+            content = await process_profiler.cprofile(request.seconds, request.output_format)
+            extension = "prof" if request.output_format == "pstats" else "txt"
+        else:
+            content = await process_profiler.sample(request.seconds, request.interval_ms)
+            extension = "folded"
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = f"profile-{request.mode}-{datetime.now():%Y%m%d-%H%M%S}.{extension}"
+    return Response(
+        content,
+        media_type="application/octet-stream" if extension == "prof" else "text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@admin_router.get("/slow-requests")
+async def get_slow_requests() -> Dict[str, Any]:
+    """Последние запросы дольше порога: разбивка по этапам и частые стеки"""
+    if not slow_request_profiler:
+        raise HTTPException(
+            status_code=404, detail="Профилирование медленных запросов не включено"
+        )
+    return {
+        "threshold_ms": slow_request_profiler.threshold * 1000,
+        "requests": list(slow_request_profiler.reports)[::-1],
+    }
+
+
+def set_snapshot_service(service: SnapshotService):
+    """Установка сервиса снимков (вызывается из main.py)"""
+    global snapshot_service
+    snapshot_service = service
+
+
+def set_rebuild_service(service: RebuildService):
+    """Установка сервиса пересборки (вызывается из main.py)"""
+    global rebuild_service
+    rebuild_service = service
+
+
+def set_experiment(current: "Experiment", sink: "ExperimentSink"):
+    """Установка эксперимента и его журнала (вызывается из main.py)"""
+    global experiment, experiment_sink
+    experiment = current
+    experiment_sink = sink
+
+
+def set_profilers(
+    process: "ProcessProfiler", slow_requests: Optional["SlowRequestProfiler"] = None
+):
+    """Установка профилировщиков процесса и медленных запросов (вызывается из main.py)"""
+    global process_profiler, slow_request_profiler
+    process_profiler = process
+    slow_request_profiler = slow_requests
+
+
+def set_hot_question_service(service: "HotQuestionService"):
+    """Установка подготовки ответов на частые вопросы (вызывается из main.py)"""
+    global hot_question_service
+    hot_question_service = service
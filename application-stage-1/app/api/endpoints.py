@@ -1,27 +1,49 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, Optional
 import logging
 
+from app.api.responses import NDJSONResponse, ORJSONResponse
+from app.config import settings
 from app.models.schemas import (
+    BatchQueryRequest,
+    BatchQueryResult,
     DocumentUploadResponse,
     HealthResponse,
     QueryRequest,
     QueryResponse,
 )
+from app.services.admission_controller import AdmissionController
 from app.services.rag_service import RAGService
+from app.services.resilience import deadline_scope, resilient_callers
+from app.services.upstream_scheduler import UpstreamScheduler, background_priority
+
+if TYPE_CHECKING:
+    from app.services.document_watcher import DocumentWatcher
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 rag_service: RAGService | None = None
+upstream_scheduler: UpstreamScheduler | None = None
+admission_controller: AdmissionController | None = None
+document_watcher: Optional["DocumentWatcher"] = None
 
 
 @router.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(
+    request: QueryRequest,
+    x_request_timeout: Optional[float] = Header(None, gt=0),
+    x_client_id: Optional[str] = Header(None, max_length=128),
+):
     """
     Обработка запроса пользователя
 
+    Заголовок X-Request-Timeout (секунды) сокращает дедлайн обработки запроса,
+    X-Client-Id закрепляет за клиентом вариант эксперимента. Запросы с одним
+    session_id — ходы диалога: уточнения вроде "а когда пересдача?" понимаются
+    в контексте предыдущих вопросов
+
     Пример запроса:
     ```json
     {
@@ -32,13 +54,53 @@ async def process_query(request: QueryRequest):
         raise HTTPException(status_code=500, detail="RAG service not initialized")
 
     try:
-        response = await rag_service.process_query(prompt=request.prompt)
+        deadline = min(
+            x_request_timeout or settings.request_deadline_seconds,
+            settings.request_deadline_seconds,
+        )
+        with deadline_scope(deadline):
+            response = await rag_service.process_query(
+                prompt=request.prompt,
+                source=request.source,
+                audience=request.audience,
+                faculties=request.faculties,
+                assignment_key=x_client_id,
+                session_id=request.session_id,
+            )
+        response.session_id = request.session_id
         return response
     except Exception as e:
         logger.error(f"При обработке запроса произошла ошибка: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
+@router.post("/query/batch")
+async def process_query_batch(request: BatchQueryRequest) -> NDJSONResponse:
+    """
+    Пакетная обработка запросов (ночная оценка, подготовка ответов)
+
+    Результаты возвращаются в формате NDJSON по мере готовности, порядок строк
+    не совпадает с порядком запросов — каждая строка содержит поле index.
+    Вызовы внешних API выполняются с фоновым приоритетом
+    """
+    if not rag_service:
+        raise HTTPException(status_code=500, detail="RAG service not initialized")
+    if len(request.queries) > settings.batch_query_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Размер пачки превышает {settings.batch_query_max_size} запросов",
+        )
+
+    async def stream_results() -> AsyncIterator[BatchQueryResult]:
+        with background_priority():
+            async for index, response in rag_service.process_batch(
+                request.queries, max_concurrency=settings.batch_query_concurrency
+            ):
+                yield BatchQueryResult.model_construct(index=index, **dict(response))
+
+    return NDJSONResponse(stream_results())
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Проверка состояния системы"""
@@ -65,9 +127,17 @@ async def health_check():
 
 
 @router.post("/upload-document", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    audience: Optional[str] = Form(None),
+    faculty: Optional[str] = Form(None),
+    query_class: Optional[str] = Form(None),
+):
     """Загрузка нового документа в систему
     Поддерживаемые форматы: .txt
+
+    Документы с указанным факультетом сохраняются в отдельный раздел коллекции,
+    с классом запросов (query_class) — в коллекцию этого класса
     """
 
     if not rag_service:
@@ -77,14 +147,28 @@ async def upload_document(file: UploadFile = File(...)):
     if file.filename and not file.filename.endswith(".txt"):
         raise HTTPException(status_code=400, detail="Для добавления поддерживаются только .txt файлы")
 
+    if query_class and query_class not in rag_service.routed_collections:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Для класса запросов '{query_class}' не задана коллекция",
+        )
+
     try:
         content = await file.read()
         text_content = content.decode("utf-8")
 
         if file.filename:
-            success = await rag_service.add_document(text_content, file.filename)
+            with background_priority():
+                success = await rag_service.add_document(
+                    text_content,
+                    file.filename,
+                    audience=audience,
+                    faculty=faculty,
+                    query_class=query_class,
+                    durable=True,
+                )
             if success:
-                chunks = rag_service.text_splitter.split_text(text_content)
+                chunks, _, _ = rag_service.split_document(text_content, file.filename)
                 return DocumentUploadResponse(
                     message="Документ успешно добавлен",
                     filename=file.filename,
@@ -108,19 +192,29 @@ async def upload_document(file: UploadFile = File(...)):
 
 
 @router.get("/documents/count")
-async def get_documents_count() -> Dict[str, Any]:
+async def get_documents_count() -> ORJSONResponse:
     """Получение количества документов в системе"""
     if not rag_service:
         logger.error("RAG-система не инициализирована")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
     try:
-        info = rag_service.chroma_db.get_collection_info()
-        return info
+        info = rag_service.vector_store.get_collection_info()
+        return ORJSONResponse(info)
     except Exception as e:
         logger.error(f"При подсчете количества документов произошла ошибка: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
+@router.get("/documents/status")
+async def get_documents_status() -> Dict[str, Any]:
+    """Состояние загрузки файлов каталога документов, измененных после старта"""
+    if not document_watcher:
+        raise HTTPException(
+            status_code=404, detail="Наблюдение за каталогом документов выключено"
+        )
+    return document_watcher.status
+
+
 @router.get("/embedding/test")
 async def test_embedding():
     """Тестирование сервиса эмбеддингов"""
@@ -129,7 +223,7 @@ async def test_embedding():
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
     try:
         test_text = "Это тестовый текст для проверки эмбеддингов"
-        embedding = await rag_service.chroma_db.embedding_service.client.aembed_query(
+        embedding = await rag_service.vector_store.embedding_service.embed_query(
             test_text
         )
 
@@ -146,7 +240,43 @@ async def test_embedding():
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """Метрики вызовов внешних API (очереди, время ожидания, 429, состояние автоматов),
+    контроля допуска запросов и диалогов"""
+    return {
+        "admission": admission_controller.get_metrics() if admission_controller else {},
+        "upstream": upstream_scheduler.get_metrics() if upstream_scheduler else {},
+        "resilience": {
+            name: caller.get_metrics() for name, caller in resilient_callers.items()
+        },
+        "sessions": (
+            rag_service.session_store.get_metrics()
+            if rag_service and rag_service.session_store
+            else {}
+        ),
+    }
+
+
 def set_rag_service(service: RAGService):
     """Установка RAG сервиса (вызывается из main.py)"""
     global rag_service
     rag_service = service
+
+
+def set_admission_controller(controller: AdmissionController):
+    """Установка контроля допуска запросов (вызывается из main.py)"""
+    global admission_controller
+    admission_controller = controller
+
+
+def set_upstream_scheduler(scheduler: UpstreamScheduler):
+    """Установка планировщика вызовов внешних API (вызывается из main.py)"""
+    global upstream_scheduler
+    upstream_scheduler = scheduler
+
+
+def set_document_watcher(watcher: "DocumentWatcher"):
+    """Установка наблюдения за каталогом документов (вызывается из main.py)"""
+    global document_watcher
+    document_watcher = watcher
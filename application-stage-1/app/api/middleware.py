@@ -0,0 +1,225 @@
+from typing import TYPE_CHECKING, Any, Optional
+import uuid
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import zstandard
+
+from app.logging_config import request_id_var
+from app.services.admission_controller import AdmissionController
+from app.services.upstream_scheduler import Priority
+
+if TYPE_CHECKING:
+    from app.services.profiling import SlowRequestProfiler
+
+# Эндпоинты под контролем допуска; остальные (health, metrics, admin) не ограничиваются
+ADMISSION_PRIORITIES = {
+    "/api/v1/query": Priority.INTERACTIVE,
+    "/api/v1/query/batch": Priority.BACKGROUND,
+    "/api/v1/upload-document": Priority.BACKGROUND,
+    "/api/v1/embedding/test": Priority.BACKGROUND,
+}
+
+# Запросы, длительность которых задает клиент, профилировщиком медленных запросов не учитываются
+SLOW_REQUEST_EXCLUDED_PATHS = {"/api/v1/admin/profile"}
+
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class RequestIdMiddleware:
+    """Идентификатор запроса для сквозной корреляции записей лога
+
+    Берется из заголовка X-Request-Id (или создается) и возвращается в ответе
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = (Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex[:16])[:64]
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-Id", request_id)
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+class SlowRequestMiddleware:
+    """Разбивка по этапам и профиль стеков запросов дольше порога SlowRequestProfiler"""
+
+    def __init__(self, app: ASGIApp, profiler: "SlowRequestProfiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"].rstrip("/") in SLOW_REQUEST_EXCLUDED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+        with self.profiler.track(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+class AdmissionControlMiddleware:
+    """Быстрый отказ 503 с Retry-After при перегрузке вместо накопления запросов"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        priority: Optional[Priority] = None
+        if scope["type"] == "http":
+            priority = ADMISSION_PRIORITIES.get(scope["path"].rstrip("/"))
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self.controller.try_admit(priority)
+        if retry_after is not None:
+            response = JSONResponse(
+                {"detail": "Сервис перегружен, повторите запрос позже"},
+                status_code=503,
+                headers={"Retry-After": str(int(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+def negotiate_encoding(accept_encoding: str, supported: tuple[str, ...]) -> Optional[str]:
+    """Выбор кодирования по Accept-Encoding: наибольший q, при равенстве — порядок supported"""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best: Optional[str] = None
+    best_weight = 0.0
+    for encoding in supported:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """Сжатие JSON, NDJSON и текстовых ответов zstd или gzip по Accept-Encoding клиента
+
+    Ответы меньше minimum_size байт отправляются как есть. Потоковые ответы
+    сжимаются по частям: каждая часть сразу отправляется клиенту
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        encodings: tuple[str, ...] = ("zstd", "gzip"),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.encodings = encodings
+
+    def create_compressor(self, encoding: str) -> tuple[Any, int]:
+        """Компрессор и режим сброса, после которого клиент может распаковать отправленное"""
+        if encoding == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+            return compressor, zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor, zlib.Z_SYNC_FLUSH
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(
+                Headers(scope=scope).get("accept-encoding", ""), self.encodings
+            )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self, encoding, send)(scope, receive)
+
+
+class CompressionResponder:
+    """Сжатие одного ответа; решение принимается по заголовкам и первой части тела"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Any = None
+        self.flush_mode = 0
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Заголовки отправляются вместе с первой частью тела, когда известен ее размер
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_CONTENT_TYPES)
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                await self.send(start)
+                await self.send(message)
+                return
+
+            self.compressor, self.flush_mode = self.middleware.create_compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.flush()
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(start)
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+        body = self.compressor.compress(body)
+        body += self.compressor.flush(self.flush_mode) if more_body else self.compressor.flush()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
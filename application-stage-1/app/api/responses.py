@@ -0,0 +1,26 @@
+from typing import AsyncIterable, AsyncIterator
+
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+import orjson
+
+__all__ = ["NDJSONResponse", "ORJSONResponse", "dump_json"]
+
+
+def dump_json(model: BaseModel) -> bytes:
+    """Сериализация модели через orjson (быстрее model_dump_json на кириллице)"""
+    return orjson.dumps(model.model_dump())
+
+
+class NDJSONResponse(StreamingResponse):
+    """Потоковый ответ NDJSON: одна модель на строку по мере готовности"""
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self, content: AsyncIterable[BaseModel], **kwargs):
+        super().__init__(self._lines(content), **kwargs)
+
+    @staticmethod
+    async def _lines(content: AsyncIterable[BaseModel]) -> AsyncIterator[bytes]:
+        async for model in content:
+            yield dump_json(model) + b"\n"
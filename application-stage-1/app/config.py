@@ -6,6 +6,16 @@ class Settings(BaseSettings):
     api_host: str = "localhost"
     api_port: int = 8001
     debug: bool = True
+    api_workers: int = 1
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_sampling: str = ""
+    log_queue_size: int = 10000
+    slow_request_threshold_ms: float = 0.0
+    slow_request_sample_interval_ms: float = 10.0
+    slow_request_max_reports: int = 50
+    profiling_max_seconds: float = 60.0
+    shutdown_drain_timeout: float = 25.0
 
     embedding_api_provider: str = ""
     embedding_api_model: str = ""
@@ -15,13 +25,119 @@ class Settings(BaseSettings):
     llm_api_model: str = ""
     llm_api_key: Optional[str] = None
 
+    local_embedding_model_path: str = "./models/embeddings"
+    local_embedding_max_length: int = 512
+    local_embedding_threads: int = 0
+    local_embedding_int8: bool = False
+    local_embedding_max_batch_size: int = 32
+    local_embedding_batch_wait_ms: float = 0.0
+    local_embedding_query_prefix: str = ""
+    local_embedding_document_prefix: str = ""
+    local_embedding_hashing_dimension: int = 1024
+
     gigachat_scope: Optional[str] = None
     mincifry_cert_path: Optional[str] = None
     verify_ssl_certs: Optional[bool] = None
+    gigachat_max_connections: int = 16
+    gigachat_max_keepalive_connections: int = 16
+    gigachat_keepalive_expiry: float = 60.0
+    gigachat_http2: bool = False
+    gigachat_token_refresh_margin: float = 60.0
+
+    upstream_llm_rate: float = 5.0
+    upstream_llm_burst: int = 5
+    upstream_llm_max_concurrency: int = 4
+    upstream_embeddings_rate: float = 10.0
+    upstream_embeddings_burst: int = 10
+    upstream_embeddings_max_concurrency: int = 4
+    upstream_background_share: float = 0.5
+
+    request_deadline_seconds: float = 30.0
+    rag_context_chunks: int = 3
+    session_enabled: bool = True
+    session_max_sessions: int = 10000
+    session_ttl_seconds: float = 1800.0
+    session_max_turns: int = 10
+    session_history_tokens: int = 600
+    session_reuse_threshold: float = 0.6
+    parent_retrieval_enabled: bool = False
+    parent_store_path: str = "./cache/parents.sqlite3"
+    parent_chunk_size: int = 1000
+    child_chunk_size: int = 250
+    child_chunk_overlap: int = 0
+    admission_max_in_flight: int = 64
+    admission_queue_wait_slo: float = 2.0
+    admission_background_share: float = 0.5
+    batch_query_max_size: int = 500
+    batch_query_concurrency: int = 4
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    resilience_attempt_timeout: float = 10.0
+    resilience_max_attempts: int = 3
+    resilience_retry_base_delay: float = 0.2
+    resilience_retry_max_delay: float = 2.0
+    resilience_breaker_failure_threshold: int = 5
+    resilience_breaker_recovery_timeout: float = 30.0
+    resilience_hedge_enabled: bool = False
+    resilience_hedge_min_delay: float = 0.5
+
+    vector_store_provider: str = "chroma"
+    vector_store_persist_directory: Optional[str] = "./vector_store"
+    vector_store_dtype: str = "float32"
+    vector_store_hnsw_threshold: int = 0
+    vector_store_quantization: str = "none"
+    vector_store_collection_quantization: str = ""
+    vector_store_pq_subvectors: int = 64
+    vector_store_rescore_factor: int = 10
+    vector_store_checkpoint_interval: float = 30.0
+
+    cache_path: str = "./cache/cache.sqlite3"
+    cache_max_entries: int = 100000
+    embedding_cache_enabled: bool = True
+    answer_cache_enabled: bool = True
+    answer_cache_ttl_seconds: float = 3600.0
+    ingestion_lock_path: str = "./cache/ingestion.lock"
+
+    query_log_enabled: bool = True
+    query_log_path: str = "./cache/query_log.sqlite3"
+    query_log_flush_interval: float = 5.0
+    hot_questions_enabled: bool = False
+    hot_questions_path: str = "./cache/hot_questions.sqlite3"
+    hot_questions_hours: str = "2-6"
+    hot_questions_window_days: float = 7.0
+    hot_questions_min_count: int = 5
+    hot_questions_max_questions: int = 100
+    hot_questions_similarity: float = 0.8
+    hot_questions_check_interval: float = 60.0
+
+    snapshot_directory: str = "./snapshots"
+    snapshot_batch_size: int = 500
+    admin_token: Optional[str] = None
+
+    document_watch_enabled: bool = True
+    document_watch_directory: str = "./documents"
+    document_watch_debounce_ms: int = 1600
+    document_watch_max_concurrency: int = 2
+
+    rebuild_embedding_rate: float = 20.0
+    rebuild_min_documents_ratio: float = 0.9
+    rebuild_validation_queries: str = "Когда начинается зимняя сессия?"
+    rebuild_lock_path: str = "./cache/rebuild.lock"
 
     chroma_db_host: str = ""
     chroma_db_port: str = ""
     chroma_db_collection_name: str = ""
+    chroma_db_alias_ttl: float = 5.0
+
+    query_router_enabled: bool = False
+    query_router_weights_path: Optional[str] = None
+    query_router_min_confidence: float = 0.5
+    query_router_collections: str = ""
+
+    experiment_config_path: Optional[str] = None
+    experiment_sink_path: str = "./cache/experiments.sqlite3"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,227 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from collections import deque
+from typing import Any, Optional
+import atexit
+import logging
+import random
+import sys
+import threading
+import zlib
+
+import orjson
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Атрибуты LogRecord, не попадающие в JSON как дополнительные поля (extra)
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, request_id, сообщение и extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class SamplingFilter(logging.Filter):
+    """Выборочная запись сообщений ниже WARNING по логгерам
+
+    rates — доля сохраняемых записей по префиксу имени логгера (самый длинный
+    совпавший префикс). Решение принимается по request_id, поэтому у запроса
+    сохраняются либо все записи логгера, либо ни одной
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+        self._logger_rates: dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        if name not in self._logger_rates:
+            self._logger_rates[name] = next(
+                (
+                    rate
+                    for prefix, rate in self.rates
+                    if name == prefix or name.startswith(prefix + ".")
+                ),
+                1.0,
+            )
+        return self._logger_rates[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1.0:
+            return True
+        request_id = request_id_var.get()
+        point = (
+            zlib.crc32(request_id.encode("utf-8")) / 2**32
+            if request_id
+            else random.random()
+        )
+        return point < rate
+
+
+class LogWriter:
+    """Поток записи лога: форматирует и пишет накопленные записи пачками
+
+    Поток просыпается раз в flush_interval секунд, а не на каждую запись,
+    поэтому запись в лог не переключает потоки на каждом сообщении
+    """
+
+    def __init__(self, output: logging.Handler, flush_interval: float = 0.1):
+        self.output = output
+        self.flush_interval = flush_interval
+        self.buffer: deque[logging.LogRecord] = deque()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        lines = []
+        while self.buffer:
+            record = self.buffer.popleft()
+            try:
+                lines.append(self.output.format(record))
+            except Exception:
+                self.output.handleError(record)
+        if lines and isinstance(self.output, logging.StreamHandler):
+            self.output.stream.write("\n".join(lines) + "\n")
+            self.output.flush()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._thread.join()
+
+
+class QueueHandler(logging.Handler):
+    """Неблокирующая передача записей в LogWriter без форматирования в вызывающем потоке
+
+    В записи сохраняется только request_id текущего запроса. Сверх capacity
+    неотправленных записей новые записи отбрасываются
+    """
+
+    def __init__(self, writer: LogWriter, capacity: int = 10000):
+        super().__init__()
+        self.writer = writer
+        self.capacity = capacity
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Блокировка обработчика не нужна: deque.append потокобезопасен
+        if not self.filter(record):
+            return False
+        if len(self.writer.buffer) >= self.capacity:
+            self.dropped += 1
+            return True
+        record.request_id = request_id_var.get() or "-"
+        self.writer.buffer.append(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.handle(record)
+
+
+class RequestIdFilter(logging.Filter):
+    """request_id для текстового формата без очереди"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+def parse_sampling(value: str) -> dict[str, float]:
+    """Разбор настройки вида "app.services.rag_service=0.1,app.services.chroma_db_service=0.05" """
+    rates = {}
+    for item in filter(None, value.split(",")):
+        name, rate = item.split("=", 1)
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+writer: Optional[LogWriter] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    sampling: str = "",
+    queue_size: int = 10000,
+    use_queue: bool = True,
+    stream: Any = None,
+) -> logging.Handler:
+    """Настройка корневого логгера
+
+    Returns:
+        logging.Handler: Обработчик корневого логгера (очередь или поток вывода)
+    """
+    global writer
+    stop_logging()
+    # Поля записи, которые не выводятся, но собираются при каждом вызове логгера
+    # (https://docs.python.org/3/howto/logging.html#optimization)
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    logging._srcfile = None
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(
+        JSONFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    handler: logging.Handler
+    if use_queue:
+        writer = LogWriter(output)
+        writer.start()
+        handler = QueueHandler(writer, capacity=queue_size)
+    else:
+        handler = output
+        handler.addFilter(RequestIdFilter())
+    rates = parse_sampling(sampling)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    return handler
+
+
+def stop_logging() -> None:
+    """Запись оставшихся в очереди сообщений и остановка потока записи"""
+    global writer
+    if writer is not None:
+        writer.stop()
+        writer = None
+
+
+atexit.register(stop_logging)
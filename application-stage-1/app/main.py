@@ -1,36 +1,94 @@
 from pathlib import Path
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Optional
 
+import asyncio
 import logging
+import time
 from fastapi import FastAPI
+from filelock import FileLock, Timeout
 from fastapi.middleware.cors import CORSMiddleware
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.config import settings
-from app.services.chroma_db_service import ChromaDBService
+from app.logging_config import configure_logging
 from app.services.factory.embedding_service_factory import EmbeddingServiceFactory
 from app.services.factory.llm_service_factory import LLMServiceFactory
+from app.services.factory.vector_store_service_factory import (
+    VectorStoreServiceFactory,
+)
+from app.services.admission_controller import AdmissionController
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.cache.sqlite_cache import SQLiteCache
+from app.services.profiling import ProcessProfiler
 from app.services.rag_service import RAGService
+from app.services.rebuild_service import RebuildService
+from app.services.resilience import CircuitBreaker, ResilientCaller
+from app.services.snapshot_service import SnapshotService
+from app.services.upstream_scheduler import (
+    UpstreamLane,
+    UpstreamScheduler,
+    background_priority,
+)
+
+from app.api.admin_endpoints import (
+    admin_router,
+    set_experiment,
+    set_hot_question_service,
+    set_profilers,
+    set_rebuild_service,
+    set_snapshot_service,
+)
+from app.api.endpoints import (
+    router,
+    set_admission_controller,
+    set_document_watcher,
+    set_rag_service,
+    set_upstream_scheduler,
+)
+from app.api.middleware import (
+    AdmissionControlMiddleware,
+    CompressionMiddleware,
+    RequestIdMiddleware,
+    SlowRequestMiddleware,
+)
+from app.api.responses import ORJSONResponse
 
-from app.api.endpoints import router, set_rag_service
+if TYPE_CHECKING:
+    from app.services.experiments.experiment import Experiment
+    from app.services.gigachat.gigachat_session import GigaChatSession
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+configure_logging(
+    level=settings.log_level,
+    log_format=settings.log_format,
+    sampling=settings.log_sampling,
+    queue_size=settings.log_queue_size,
 )
 logger = logging.getLogger(__name__)
 
 
 async def load_initial_documents(rag_service: RAGService):
-    """Загрузка начальных документов при старте"""
+    """Загрузка начальных документов при старте
+
+    Документы коллекций классов запросов (QUERY_ROUTER_COLLECTIONS) лежат
+    в подкаталогах с именем класса: ./documents/<класс>/*.txt
+    """
     data_dir = Path("./documents")
 
     if not data_dir.exists() or not data_dir.is_dir():
         logger.warning(
-            f"Папка с документами {data_dir.resolve()} не найдена. Документы не будут загружены в ChromaDB автоматически."
+            f"Папка с документами {data_dir.resolve()} не найдена. Документы не будут загружены в векторное хранилище автоматически."
         )
         return
 
     loaded_count = 0
-    files_to_load = list(data_dir.glob("*.txt"))
+    files_to_load = [(file_path, None) for file_path in data_dir.glob("*.txt")]
+    for query_class in rag_service.routed_collections:
+        files_to_load.extend(
+            (file_path, query_class)
+            for file_path in (data_dir / query_class).glob("*.txt")
+        )
     if not files_to_load:
         logger.warning(
             f"Не найдены .txt файлы документов в папке {data_dir.resolve()}."
@@ -38,15 +96,17 @@ async def load_initial_documents(rag_service: RAGService):
         return
 
     logger.info(
-        f"Найдено {len(files_to_load)} документов в {data_dir.resolve()} для загрузки в ChromaDB."
+        f"Найдено {len(files_to_load)} документов в {data_dir.resolve()} для загрузки в векторное хранилище."
     )
 
-    for file_path in files_to_load:
+    for file_path, query_class in files_to_load:
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
 
-            success = await rag_service.add_document(content, file_path.name)
+            success = await rag_service.add_document(
+                content, file_path.name, query_class=query_class
+            )
 
             if success:
                 loaded_count += 1
@@ -60,7 +120,7 @@ async def load_initial_documents(rag_service: RAGService):
             )
 
     try:
-        info = rag_service.chroma_db.get_collection_info()
+        info = rag_service.vector_store.get_collection_info()
         logger.info(
             f"Загружены файлы в количестве: {loaded_count}. "
             f"Количество документов (чанков) в коллекции '{info.get('name', 'N/A')}': {info.get('documents_count', 0)}"
@@ -72,74 +132,548 @@ async def load_initial_documents(rag_service: RAGService):
         )
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Управление жизненным циклом приложения"""
+async def load_experiment_documents(
+    rag_service: RAGService,
+    experiment: "Experiment",
+    experiment_collections: dict[str, VectorStoreServiceBase],
+):
+    """Заполнение коллекций вариантов эксперимента начальными документами
+
+    Документы разбиваются на чанки параметрами первого варианта, использующего коллекцию
+    """
+    files_to_load = sorted(Path("./documents").glob("*.txt"))
+    current = rag_service.text_splitter
+    loaded_collections = set()
+    for arm in experiment.arms:
+        if not arm.collection or arm.collection in loaded_collections:
+            continue
+        loaded_collections.add(arm.collection)
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=arm.chunk_size or current._chunk_size,
+            chunk_overlap=(
+                arm.chunk_overlap if arm.chunk_overlap is not None else current._chunk_overlap
+            ),
+        )
+        loaded_count = 0
+        for file_path in files_to_load:
+            content = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
+            if await rag_service.add_document(
+                content,
+                file_path.name,
+                vector_store=experiment_collections[arm.collection],
+                text_splitter=text_splitter,
+            ):
+                loaded_count += 1
+            else:
+                logger.error(
+                    f"Не удалось загрузить файл {file_path.name} в коллекцию {arm.collection}"
+                )
+        logger.info(
+            f"В коллекцию {arm.collection} варианта {arm.name} загружены файлы в количестве: {loaded_count}"
+        )
+
+
+def create_upstream_scheduler() -> UpstreamScheduler:
+    """Создание планировщика вызовов GigaChat по настройкам приложения"""
+    return UpstreamScheduler(
+        {
+            "llm": UpstreamLane(
+                "llm",
+                rate=settings.upstream_llm_rate,
+                burst=settings.upstream_llm_burst,
+                max_concurrency=settings.upstream_llm_max_concurrency,
+                background_share=settings.upstream_background_share,
+            ),
+            "embeddings": UpstreamLane(
+                "embeddings",
+                rate=settings.upstream_embeddings_rate,
+                burst=settings.upstream_embeddings_burst,
+                max_concurrency=settings.upstream_embeddings_max_concurrency,
+                background_share=settings.upstream_background_share,
+            ),
+        }
+    )
+
+
+def create_resilient_caller(name: str, hedge_enabled: bool = False) -> ResilientCaller:
+    """Создание слоя повторов и автомата отключения по настройкам приложения"""
+    return ResilientCaller(
+        CircuitBreaker(
+            name,
+            failure_threshold=settings.resilience_breaker_failure_threshold,
+            recovery_timeout=settings.resilience_breaker_recovery_timeout,
+        ),
+        attempt_timeout=settings.resilience_attempt_timeout,
+        max_attempts=settings.resilience_max_attempts,
+        base_delay=settings.resilience_retry_base_delay,
+        max_delay=settings.resilience_retry_max_delay,
+        hedge_enabled=hedge_enabled,
+        hedge_min_delay=settings.resilience_hedge_min_delay,
+    )
 
-    logger.info("Старт RAG-системы...")
 
+gigachat_sessions: dict[str, "GigaChatSession"] = {}
+
+
+def get_gigachat_session(api_key: Optional[str]) -> Optional["GigaChatSession"]:
+    """Общая сессия GigaChat для всех сервисов с одинаковым ключом"""
+    if not api_key:
+        return None
+    if api_key not in gigachat_sessions:
+        from app.services.gigachat.gigachat_session import GigaChatSession
+
+        gigachat_sessions[api_key] = GigaChatSession(
+            credentials=api_key,
+            ca_bundle_file=settings.mincifry_cert_path,
+            verify_ssl_certs=bool(settings.verify_ssl_certs),
+            max_connections=settings.gigachat_max_connections,
+            max_keepalive_connections=settings.gigachat_max_keepalive_connections,
+            keepalive_expiry=settings.gigachat_keepalive_expiry,
+            http2=settings.gigachat_http2,
+            token_refresh_margin=settings.gigachat_token_refresh_margin,
+        )
+    return gigachat_sessions[api_key]
+
+
+def create_embedding_service(
+    upstream_scheduler: Optional[UpstreamScheduler] = None,
+) -> EmbeddingServiceBase:
+    """Создание сервиса эмбеддингов по настройкам приложения"""
     embedding_service = EmbeddingServiceFactory.create_service(
         api_provider=settings.embedding_api_provider,
         model=settings.embedding_api_model,
         api_key=settings.embedding_api_key,
         verify_ssl_certs=settings.verify_ssl_certs,
         ca_bundle_file=settings.mincifry_cert_path,
+        upstream_lane=(
+            upstream_scheduler.get_lane("embeddings") if upstream_scheduler else None
+        ),
+        resilience=create_resilient_caller("embeddings"),
+        session=(
+            get_gigachat_session(settings.embedding_api_key)
+            if settings.embedding_api_provider.lower() == "gigachat"
+            else None
+        ),
+        local_model_path=settings.local_embedding_model_path,
+        local_max_length=settings.local_embedding_max_length,
+        local_threads=settings.local_embedding_threads,
+        local_int8=settings.local_embedding_int8,
+        local_max_batch_size=settings.local_embedding_max_batch_size,
+        local_batch_wait_ms=settings.local_embedding_batch_wait_ms,
+        local_query_prefix=settings.local_embedding_query_prefix,
+        local_document_prefix=settings.local_embedding_document_prefix,
+        local_hashing_dimension=settings.local_embedding_hashing_dimension,
+    )
+    if settings.embedding_cache_enabled:
+        from app.services.cache.cached_embedding_service import CachedEmbeddingService
+
+        embedding_service = CachedEmbeddingService(
+            embedding_service,
+            SQLiteCache(
+                settings.cache_path,
+                "embeddings",
+                max_entries=settings.cache_max_entries,
+            ),
+        )
+    return embedding_service
+
+
+def create_vector_store_service(
+    collection_name: str, embedding_service: EmbeddingServiceBase
+) -> VectorStoreServiceBase:
+    """Создание векторного хранилища по настройкам приложения"""
+    collection_quantization = dict(
+        route.split("=", 1)
+        for route in filter(None, settings.vector_store_collection_quantization.split(","))
+    )
+    return VectorStoreServiceFactory.create_service(
+        provider=settings.vector_store_provider,
+        collection_name=collection_name,
+        embedding_service=embedding_service,
+        chroma_db_host=settings.chroma_db_host,
+        chroma_db_port=settings.chroma_db_port,
+        alias_ttl=settings.chroma_db_alias_ttl,
+        persist_directory=settings.vector_store_persist_directory,
+        dtype=settings.vector_store_dtype,
+        hnsw_threshold=settings.vector_store_hnsw_threshold,
+        quantization=collection_quantization.get(
+            collection_name, settings.vector_store_quantization
+        ),
+        pq_subvectors=settings.vector_store_pq_subvectors,
+        rescore_factor=settings.vector_store_rescore_factor,
+        checkpoint_interval=settings.vector_store_checkpoint_interval,
+    )
+
+
+def create_snapshot_service(
+    vector_stores: list[VectorStoreServiceBase],
+) -> SnapshotService:
+    """Создание сервиса снимков коллекций по настройкам приложения"""
+    return SnapshotService(
+        vector_stores,
+        snapshot_directory=settings.snapshot_directory,
+        batch_size=settings.snapshot_batch_size,
     )
 
+
+def acquire_ingestion_lock() -> Optional[FileLock]:
+    """Блокировка загрузки начальных документов: ее получает только один воркер
+
+    Блокировка держится до остановки воркера и снимается ОС при его завершении
+    """
+    Path(settings.ingestion_lock_path).parent.mkdir(parents=True, exist_ok=True)
+    lock = FileLock(settings.ingestion_lock_path)
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        return None
+    return lock
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Управление жизненным циклом приложения"""
+
+    logger.info("Старт RAG-системы...")
+
+    upstream_scheduler = create_upstream_scheduler()
+    set_upstream_scheduler(upstream_scheduler)
+    admission_controller.upstream_scheduler = upstream_scheduler
+
+    embedding_service = create_embedding_service(upstream_scheduler)
+
     llm_service = LLMServiceFactory.create_service(
         api_provider=settings.llm_api_provider,
         model=settings.llm_api_model,
         api_key=settings.llm_api_key,
         verify_ssl_certs=settings.verify_ssl_certs,
         ca_bundle_file=settings.mincifry_cert_path,
+        upstream_lane=upstream_scheduler.get_lane("llm"),
+        resilience=create_resilient_caller(
+            "llm", hedge_enabled=settings.resilience_hedge_enabled
+        ),
+        session=(
+            get_gigachat_session(settings.llm_api_key)
+            if settings.llm_api_provider.lower() == "gigachat"
+            else None
+        ),
     )
+    for session in gigachat_sessions.values():
+        await session.start()
 
-    vector_db = ChromaDBService(
-        chroma_db_host=settings.chroma_db_host,
-        chroma_db_port=settings.chroma_db_port,
-        chroma_db_collection_name=settings.chroma_db_collection_name,
-        embedding_service=embedding_service,
+    def create_vector_store(collection_name: str):
+        return create_vector_store_service(collection_name, embedding_service)
+
+    vector_store = create_vector_store(settings.chroma_db_collection_name)
+
+    query_router = None
+    routed_collections = {}
+    if settings.query_router_enabled:
+        from app.services.router.query_router import QueryRouter
+
+        query_router = QueryRouter(
+            weights_path=settings.query_router_weights_path,
+            min_confidence=settings.query_router_min_confidence,
+        )
+        for route in filter(None, settings.query_router_collections.split(",")):
+            query_class, collection_name = route.split("=", 1)
+            routed_collections[query_class.strip()] = create_vector_store(
+                collection_name.strip()
+            )
+
+    experiment = None
+    experiment_sink = None
+    experiment_collections = {}
+    if settings.experiment_config_path:
+        from app.services.experiments.experiment import Experiment
+        from app.services.experiments.experiment_sink import ExperimentSink
+
+        experiment = Experiment.from_file(settings.experiment_config_path)
+        experiment_sink = ExperimentSink(settings.experiment_sink_path)
+        for arm in experiment.arms:
+            if arm.collection and arm.collection not in experiment_collections:
+                experiment_collections[arm.collection] = create_vector_store(
+                    arm.collection
+                )
+
+    query_log = None
+    if settings.query_log_enabled:
+        from app.services.analytics.query_log import QueryLog
+
+        query_log = QueryLog(
+            settings.query_log_path, flush_interval=settings.query_log_flush_interval
+        )
+    precomputed_answers = None
+    if settings.hot_questions_enabled:
+        from app.services.analytics.precomputed_answers import PrecomputedAnswers
+
+        precomputed_answers = PrecomputedAnswers(settings.hot_questions_path)
+
+    parent_store = None
+    parent_splitter = None
+    if settings.parent_retrieval_enabled:
+        from app.services.retrieval.parent_store import ParentStore
+
+        parent_store = ParentStore(settings.parent_store_path)
+        parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.parent_chunk_size, chunk_overlap=0
+        )
+    session_store = None
+    if settings.session_enabled:
+        from app.services.session_store import SessionStore
+
+        session_store = SessionStore(
+            max_sessions=settings.session_max_sessions,
+            ttl_seconds=settings.session_ttl_seconds,
+            max_turns=settings.session_max_turns,
+            history_tokens=settings.session_history_tokens,
+            reuse_threshold=settings.session_reuse_threshold,
+        )
+
+    rag_service = RAGService(
+        vector_store,
+        llm_service,
+        query_router=query_router,
+        routed_collections=routed_collections,
+        answer_cache=(
+            SQLiteCache(
+                settings.cache_path,
+                "answers",
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                max_entries=settings.cache_max_entries,
+            )
+            if settings.answer_cache_enabled
+            else None
+        ),
+        context_chunks=settings.rag_context_chunks,
+        experiment=experiment,
+        experiment_sink=experiment_sink,
+        experiment_collections=experiment_collections,
+        parent_store=parent_store,
+        parent_splitter=parent_splitter,
+        query_log=query_log,
+        precomputed_answers=precomputed_answers,
+        session_store=session_store,
     )
+    if settings.parent_retrieval_enabled:
+        rag_service.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.child_chunk_size,
+            chunk_overlap=settings.child_chunk_overlap,
+        )
 
-    rag_service = RAGService(vector_db, llm_service)
+    if query_log:
+        query_log.start()
 
     set_rag_service(rag_service)
+    set_snapshot_service(
+        create_snapshot_service([vector_store, *routed_collections.values()])
+    )
+    rebuild_service = RebuildService(
+        rag_service,
+        lock_path=settings.rebuild_lock_path,
+        embedding_rate=settings.rebuild_embedding_rate,
+        min_documents_ratio=settings.rebuild_min_documents_ratio,
+        validation_queries=[
+            query.strip()
+            for query in settings.rebuild_validation_queries.split(";")
+            if query.strip()
+        ],
+    )
+    set_rebuild_service(rebuild_service)
 
     health_info = await rag_service.health_check()
     logger.info(f"Статус сервисов: {health_info}")
 
-    if (
+    ingestion_lock = acquire_ingestion_lock()
+    if settings.api_workers > 1 and settings.vector_store_provider == "in_memory":
+        logger.warning(
+            "Встроенное хранилище не разделяется между воркерами: документы, загруженные "
+            "одним воркером, другие увидят только после перезапуска. Используйте ChromaDB."
+        )
+
+    if ingestion_lock is None:
+        logger.info("Начальные документы загружает другой воркер, пропуск загрузки.")
+    elif (
         health_info.get("chroma_db_status") == "healthy"
         and health_info.get("llm_status") == "healthy"
     ):
         logger.info("Основные сервисы работают, Загрузка начальных файлов.")
-        await load_initial_documents(rag_service)
+        with background_priority():
+            await load_initial_documents(rag_service)
+            if experiment_collections:
+                await load_experiment_documents(
+                    rag_service, experiment, experiment_collections
+                )
     else:
         logger.warning(
             "Один или несколько сервисов не работают. Пропуск загрузки начальных файлов."
         )
 
+    document_watcher = None
+    if ingestion_lock and settings.document_watch_enabled:
+        # Как и начальную загрузку, изменения каталога обрабатывает один воркер
+        from app.services.document_watcher import DocumentWatcher
+
+        document_watcher = DocumentWatcher(
+            rag_service,
+            directory=settings.document_watch_directory,
+            debounce_ms=settings.document_watch_debounce_ms,
+            max_concurrency=settings.document_watch_max_concurrency,
+        )
+        document_watcher.start()
+        set_document_watcher(document_watcher)
+
+    hot_question_service = None
+    if ingestion_lock and query_log and precomputed_answers:
+        # Ответы готовит один воркер, выдают подготовленные ответы все
+        from app.services.analytics.hot_questions import HotQuestionService
+
+        hot_question_service = HotQuestionService(
+            rag_service,
+            query_log,
+            precomputed_answers,
+            hours=settings.hot_questions_hours,
+            window_days=settings.hot_questions_window_days,
+            min_count=settings.hot_questions_min_count,
+            max_questions=settings.hot_questions_max_questions,
+            similarity=settings.hot_questions_similarity,
+            check_interval=settings.hot_questions_check_interval,
+        )
+        hot_question_service.start()
+        set_hot_question_service(hot_question_service)
+
+    if experiment:
+        from app.services.retrieval.lexical_index import BM25Index
+
+        # Вариант с пустой коллекцией измерял бы пустой поиск
+        empty_collections = {
+            name
+            for name, store in experiment_collections.items()
+            if await asyncio.to_thread(store.count) == 0
+        }
+        rejected_arms = [
+            arm.name for arm in experiment.arms if arm.collection in empty_collections
+        ]
+        if rejected_arms:
+            logger.error(
+                f"Варианты {rejected_arms} исключены из эксперимента {experiment.name}: "
+                f"коллекции {sorted(empty_collections)} пусты"
+            )
+            experiment = Experiment(
+                experiment.name,
+                [arm for arm in experiment.arms if arm.name not in rejected_arms],
+            )
+            rag_service.experiment = experiment
+
+        # Индексы гибридного поиска строятся по загруженным документам один раз
+        for arm in experiment.arms:
+            if arm.strategy and arm.strategy.hybrid:
+                rag_service.lexical_indexes[arm.name] = await asyncio.to_thread(
+                    BM25Index.from_vector_store,
+                    experiment_collections.get(arm.collection, vector_store),
+                )
+        set_experiment(experiment, experiment_sink)
+
     logger.info("RAG-система успешно запущена.")
     yield
     logger.info("Завершение работы RAG-системы...")
+    drain_started = time.perf_counter()
+
+    def remaining_drain_time() -> float:
+        return max(
+            0.0, settings.shutdown_drain_timeout - (time.perf_counter() - drain_started)
+        )
+
+    await admission_controller.drain(remaining_drain_time())
+    await rebuild_service.stop(remaining_drain_time())
+    if document_watcher:
+        await document_watcher.stop(remaining_drain_time())
+    if hot_question_service:
+        await hot_question_service.stop(remaining_drain_time())
+    unfinished_ingestions = await rag_service.wait_for_ingestion(remaining_drain_time())
+
+    for store in [
+        vector_store,
+        *routed_collections.values(),
+        *experiment_collections.values(),
+    ]:
+        await asyncio.to_thread(store.close)
+    if rag_service.answer_cache:
+        rag_service.answer_cache.close()
+    if experiment_sink:
+        experiment_sink.close()
+    if query_log:
+        await query_log.stop()
+        query_log.close()
+    if precomputed_answers:
+        precomputed_answers.close()
+    if rag_service.parent_store:
+        rag_service.parent_store.close()
+    await embedding_service.close()
+    for session in gigachat_sessions.values():
+        await session.close()
+    gigachat_sessions.clear()
+    if ingestion_lock:
+        ingestion_lock.release()
+    logger.info(
+        f"RAG-система остановлена за {time.perf_counter() - drain_started:.2f} с, "
+        f"прервано запросов: {admission_controller.in_flight}, "
+        f"незавершенных записей документов: {unfinished_ingestions}"
+    )
 
 
+admission_controller = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight,
+    queue_wait_slo=settings.admission_queue_wait_slo,
+    background_share=settings.admission_background_share,
+)
+set_admission_controller(admission_controller)
+
+# Порог 0 выключает профилирование медленных запросов: middleware не добавляется
+slow_request_profiler = None
+if settings.slow_request_threshold_ms > 0:
+    from app.services.profiling import SlowRequestProfiler
+
+    slow_request_profiler = SlowRequestProfiler(
+        settings.slow_request_threshold_ms,
+        sample_interval_ms=settings.slow_request_sample_interval_ms,
+        max_reports=settings.slow_request_max_reports,
+    )
+set_profilers(ProcessProfiler(settings.profiling_max_seconds), slow_request_profiler)
+
 app = FastAPI(
     title="UrFU AI Ассистент - RAG System",
     description="Масштабируемая RAG-система для университетского ИИ-ассистента",
     version="1.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+if slow_request_profiler:
+    # Внутри контроля допуска: отказы 503 не профилируются
+    app.add_middleware(SlowRequestMiddleware, profiler=slow_request_profiler)
+# Контроль допуска внутри CORS, чтобы ответы 503 тоже получали CORS-заголовки
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        zstd_level=settings.compression_zstd_level,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-Id"],
 )
+# Снаружи всех слоев: request_id есть и у отказов контроля допуска
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(router, prefix="/api/v1", tags=["RAG"])
+app.include_router(admin_router, prefix="/api/v1/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -162,4 +696,6 @@ if __name__ == "__main__":
         host=settings.api_host,
         port=settings.api_port,
         reload=settings.debug,
+        workers=settings.api_workers,
+        timeout_graceful_shutdown=int(settings.shutdown_drain_timeout),
     )
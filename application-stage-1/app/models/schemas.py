@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Literal, Optional
 
 
 class QueryRequest(BaseModel):
@@ -9,6 +10,25 @@ class QueryRequest(BaseModel):
         max_length=500,
         description="Запрос пользователя",
     )
+    source: Optional[str] = Field(
+        None,
+        description="Поиск только по чанкам указанного файла",
+    )
+    audience: Optional[str] = Field(
+        None,
+        description="Аудитория (например, student или teacher)",
+    )
+    faculties: Optional[list[str]] = Field(
+        None,
+        description="Поиск только по разделам указанных факультетов",
+    )
+    session_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        pattern=r"^[A-Za-z0-9._-]+$",
+        description="Идентификатор диалога для уточняющих вопросов "
+        "(выбирается клиентом, в пакетной обработке не используется)",
+    )
 
 
 class QueryResponse(BaseModel):
@@ -26,12 +46,31 @@ class QueryResponse(BaseModel):
         ...,
         description="Время обработки запроса",
     )
+    session_id: Optional[str] = Field(
+        None,
+        description="Идентификатор диалога запроса",
+    )
     timestamp: datetime = Field(
         default_factory=datetime.now,
         description="Время запроса",
     )
 
 
+class BatchQueryRequest(BaseModel):
+    queries: list[QueryRequest] = Field(
+        ...,
+        min_length=1,
+        description="Запросы пачки",
+    )
+
+
+class BatchQueryResult(QueryResponse):
+    index: int = Field(
+        ...,
+        description="Индекс запроса в пачке",
+    )
+
+
 class HealthResponse(BaseModel):
     status: str
     chroma_db_status: str
@@ -45,3 +84,57 @@ class DocumentUploadResponse(BaseModel):
     filename: str
     chunks_count: int
     success: bool
+
+
+class SnapshotRequest(BaseModel):
+    name: Optional[str] = Field(
+        None,
+        pattern=r"^[A-Za-z0-9._-]+$",
+        description="Имя снимка, по умолчанию текущие дата и время",
+    )
+    dtype: str = Field(
+        "float32",
+        description="Тип векторов в снимке (float32 или float16)",
+    )
+
+
+class SnapshotRestoreRequest(BaseModel):
+    force: bool = Field(
+        False,
+        description="Восстановить, даже если модель эмбеддингов отличается",
+    )
+
+
+class SnapshotRestoreResponse(BaseModel):
+    name: str
+    collections: dict[str, int]
+    duration: float
+
+
+class RebuildRequest(BaseModel):
+    chunk_size: Optional[int] = Field(
+        None,
+        ge=50,
+        le=4000,
+        description="Новый размер чанка, по умолчанию текущий",
+    )
+    chunk_overlap: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Новое перекрытие чанков, по умолчанию текущее",
+    )
+
+
+class ProfileRequest(BaseModel):
+    seconds: float = Field(10.0, gt=0, description="Длительность профилирования, с")
+    mode: Literal["cprofile", "sampling"] = Field(
+        "sampling",
+        description="cprofile — детерминированный профиль цикла событий, "
+        "sampling — выборка стеков всех потоков",
+    )
+    output_format: Literal["pstats", "text"] = Field(
+        "pstats", description="Формат результата cprofile"
+    )
+    interval_ms: float = Field(
+        5.0, ge=1, le=1000, description="Интервал выборки стеков, мс"
+    )
@@ -0,0 +1,102 @@
+from collections import Counter
+from typing import Any, Optional
+import asyncio
+import logging
+import math
+import time
+
+from app.services.upstream_scheduler import Priority, UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """Допуск запросов к API по числу обрабатываемых запросов и очереди к GigaChat
+
+    Запрос отклоняется, если обрабатывается max_in_flight запросов или самый
+    давний вызов GigaChat ждет в очереди дольше queue_wait_slo секунд.
+    Для фоновых эндпоинтов оба порога умножаются на background_share, поэтому
+    при росте нагрузки они отклоняются первыми.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        queue_wait_slo: float = 2.0,
+        background_share: float = 0.5,
+    ):
+        self.max_in_flight = max_in_flight
+        self.queue_wait_slo = queue_wait_slo
+        self.background_share = background_share
+        self.upstream_scheduler: Optional[UpstreamScheduler] = None
+        self.in_flight = 0
+        self.draining = False
+        self.admitted: Counter[str] = Counter()
+        self.shed: Counter[tuple[str, str]] = Counter()
+
+    def _limits(self, priority: Priority) -> tuple[float, float]:
+        share = 1.0 if priority == Priority.INTERACTIVE else self.background_share
+        return self.max_in_flight * share, self.queue_wait_slo * share
+
+    def try_admit(self, priority: Priority) -> Optional[float]:
+        """Допуск запроса
+
+        Args:
+            priority (Priority): Приоритет эндпоинта
+
+        Returns:
+            Optional[float]: None если запрос допущен (вызвать release по завершении),
+                иначе рекомендуемая пауза перед повтором (Retry-After) в секундах
+        """
+        max_in_flight, queue_wait_slo = self._limits(priority)
+        queue_wait = (
+            self.upstream_scheduler.oldest_wait() if self.upstream_scheduler else 0.0
+        )
+        reason = None
+        if self.draining:
+            reason = "draining"
+        elif self.in_flight >= max_in_flight:
+            reason = "concurrency"
+        elif queue_wait > queue_wait_slo:
+            reason = "queue_wait"
+        if reason:
+            self.shed[(priority.name.lower(), reason)] += 1
+            logger.info(
+                f"Запрос отклонен ({reason}): обрабатывается {self.in_flight}, "
+                f"ожидание в очереди {queue_wait:.2f} с"
+            )
+            return float(max(1, math.ceil(queue_wait)))
+        self.in_flight += 1
+        self.admitted[priority.name.lower()] += 1
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    async def drain(self, timeout: float) -> bool:
+        """Прекращение допуска новых запросов и ожидание обрабатываемых
+
+        Returns:
+            bool: True если все запросы завершились до истечения timeout
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self.in_flight == 0
+
+    def get_metrics(self) -> dict[str, Any]:
+        shed: dict[str, dict[str, int]] = {}
+        for (priority, reason), count in self.shed.items():
+            shed.setdefault(priority, {})[reason] = count
+        return {
+            "in_flight": self.in_flight,
+            "draining": self.draining,
+            "max_in_flight": self.max_in_flight,
+            "queue_wait": round(
+                self.upstream_scheduler.oldest_wait() if self.upstream_scheduler else 0.0,
+                3,
+            ),
+            "admitted": dict(self.admitted),
+            "shed": shed,
+        }
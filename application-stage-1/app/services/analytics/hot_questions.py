@@ -0,0 +1,287 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, Optional
+import asyncio
+import json
+import logging
+import time
+
+from app.services.analytics.precomputed_answers import PrecomputedAnswers
+from app.services.analytics.query_log import QueryLog
+from app.services.rag_service import RAGService
+from app.services.retrieval.lexical_index import lexical_terms
+from app.services.tracing import start_trace
+from app.services.upstream_scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых частых формулировок из журнала участвует в кластеризации
+CANDIDATE_LIMIT = 2000
+
+
+@dataclass(frozen=True)
+class QueryCluster:
+    """Формулировки одного вопроса: prompt — самая частая из них"""
+
+    prompt: str
+    filters: Optional[str]
+    members: tuple[str, ...]
+    count: int
+
+
+def cluster_queries(
+    rows: list[tuple[str, Optional[str], int]], similarity: float = 0.8
+) -> list[QueryCluster]:
+    """Жадная кластеризация запросов журнала
+
+    Запросы по убыванию частоты присоединяются к первому кластеру с теми же
+    фильтрами, если коэффициент Жаккара основ их слов не меньше similarity.
+    Кластеры упорядочены по суммарной частоте
+    """
+    clusters: list[tuple[set[str], list[Any]]] = []
+    for prompt, filters, count in sorted(rows, key=lambda row: -row[2]):
+        terms = set(lexical_terms(prompt))
+        for cluster_terms, cluster in clusters:
+            union = terms | cluster_terms
+            if (
+                cluster[1] == filters
+                and union
+                and len(terms & cluster_terms) / len(union) >= similarity
+            ):
+                cluster[2].append(prompt)
+                cluster[3] += count
+                break
+        else:
+            clusters.append((terms, [prompt, filters, [prompt], count]))
+    return sorted(
+        (
+            QueryCluster(prompt, filters, tuple(members), count)
+            for _, (prompt, filters, members, count) in clusters
+        ),
+        key=lambda cluster: -cluster.count,
+    )
+
+
+def parse_hours(value: str) -> tuple[int, int]:
+    """Разбор окна низкой нагрузки вида "2-6" (часы местного времени, конец не включается)"""
+    start, end = value.split("-", 1)
+    return int(start), int(end)
+
+
+class HotQuestionService:
+    """Подготовка ответов на частые вопросы из журнала запросов
+
+    В окне низкой нагрузки (hours, не чаще раза в сутки) частые запросы за
+    window_days дней кластеризуются, ответы на max_questions самых частых
+    вопросов (не меньше min_count запросов) готовятся обычным конвейером
+    RAGService с фоновым приоритетом и сохраняются под ключами всех формулировок
+    вопроса. Раз в check_interval секунд ответы, помеченные устаревшими после
+    изменения документов, готовятся заново.
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        query_log: QueryLog,
+        precomputed_answers: PrecomputedAnswers,
+        hours: str = "2-6",
+        window_days: float = 7.0,
+        min_count: int = 5,
+        max_questions: int = 100,
+        similarity: float = 0.8,
+        check_interval: float = 60.0,
+    ):
+        self.rag_service = rag_service
+        self.query_log = query_log
+        self.precomputed_answers = precomputed_answers
+        self.hours = parse_hours(hours)
+        self.window_days = window_days
+        self.min_count = min_count
+        self.max_questions = max_questions
+        self.similarity = similarity
+        self.check_interval = check_interval
+        self.status: dict[str, Any] = {"state": "idle"}
+        self._last_run: Optional[float] = None
+        self._run_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._manual_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._run_lock.locked()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+        logger.info(
+            f"Подготовка ответов на частые вопросы в {self.hours[0]}-{self.hours[1]} ч"
+        )
+
+    async def stop(self, timeout: float) -> None:
+        """Остановка; начатая подготовка ответа прерывается по истечении timeout"""
+        tasks = {task for task in (self._task, self._manual_task) if task and not task.done()}
+        if not tasks:
+            return
+        if self._task:
+            self._task.cancel()
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run_now(self, force: bool = False) -> dict[str, Any]:
+        """Запуск подготовки в фоне вне окна низкой нагрузки
+
+        Без force вопросы, у всех формулировок которых уже есть неустаревший
+        ответ, пропускаются, чтобы ручной запуск не тратил квоту LLM повторно
+        """
+        if self.is_running:
+            raise RuntimeError("Подготовка ответов уже выполняется")
+        self._manual_task = asyncio.create_task(self.precompute(skip_fresh=not force))
+        return self.status
+
+    def top_questions(self, limit: int = 20) -> list[QueryCluster]:
+        """Самые частые вопросы за window_days дней с учетом формулировок"""
+        rows = self.query_log.frequent(
+            time.time() - self.window_days * 86400, CANDIDATE_LIMIT
+        )
+        return cluster_queries(rows, self.similarity)[:limit]
+
+    def in_quiet_hours(self, now: Optional[datetime] = None) -> bool:
+        start, end = self.hours
+        hour = (now or datetime.now()).hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh_stale()
+                if self.in_quiet_hours() and (
+                    self._last_run is None or time.time() - self._last_run > 20 * 3600
+                ):
+                    await self.precompute()
+            except Exception as e:
+                logger.error(f"Ошибка подготовки ответов на частые вопросы: {e}", exc_info=True)
+            await asyncio.sleep(self.check_interval)
+
+    async def precompute(self, skip_fresh: bool = False) -> None:
+        """Кластеризация журнала и подготовка ответов на самые частые вопросы
+
+        При skip_fresh готовятся только вопросы без актуального ответа
+        """
+        async with self._run_lock:
+            started = time.perf_counter()
+            self._last_run = time.time()
+            self.status = {
+                "state": "running",
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "questions": 0,
+                "prepared": 0,
+                "skipped": 0,
+                "failed": 0,
+            }
+            try:
+                rows = await asyncio.to_thread(
+                    self.query_log.frequent,
+                    time.time() - self.window_days * 86400,
+                    CANDIDATE_LIMIT,
+                )
+                clusters = [
+                    cluster
+                    for cluster in cluster_queries(rows, self.similarity)
+                    if cluster.count >= self.min_count
+                ][: self.max_questions]
+                self.status["questions"] = len(clusters)
+                keys = []
+                for cluster in clusters:
+                    cluster_keys = self._entries(cluster.members, cluster.filters)
+                    keys.extend(key for key, _ in cluster_keys)
+                    if skip_fresh and len(
+                        await asyncio.to_thread(
+                            self.precomputed_answers.fresh_keys,
+                            [key for key, _ in cluster_keys],
+                        )
+                    ) == len(cluster_keys):
+                        self.status["skipped"] += 1
+                    elif await self._prepare(cluster.prompt, cluster.filters, cluster_keys):
+                        self.status["prepared"] += 1
+                    else:
+                        self.status["failed"] += 1
+                self.status["removed"] = await asyncio.to_thread(
+                    self.precomputed_answers.retain, keys
+                )
+                self.status["state"] = "completed"
+                logger.info(
+                    f"Подготовлены ответы на частые вопросы: {self.status['prepared']} "
+                    f"из {len(clusters)} за {time.perf_counter() - started:.1f} с"
+                )
+            except Exception as e:
+                logger.error(f"Ошибка подготовки ответов на частые вопросы: {e}", exc_info=True)
+                self.status.update(state="failed", error=str(e))
+            finally:
+                self.status["finished_at"] = datetime.now().isoformat(timespec="seconds")
+
+    async def refresh_stale(self) -> int:
+        """Повторная подготовка ответов, устаревших после изменения документов
+
+        Returns:
+            int: Количество обновленных вопросов
+        """
+        if self.is_running:
+            return 0
+        async with self._run_lock:
+            stale = await asyncio.to_thread(self.precomputed_answers.stale_clusters)
+            refreshed = 0
+            for cluster, filters, prompts in stale:
+                refreshed += await self._prepare(
+                    cluster, filters, self._entries(prompts, filters)
+                )
+            if stale:
+                logger.info(
+                    f"Обновлены ответы на частые вопросы после изменения документов: "
+                    f"{refreshed} из {len(stale)}"
+                )
+            return refreshed
+
+    def _entries(
+        self, prompts: Iterable[str], filters: Optional[str]
+    ) -> list[tuple[str, str]]:
+        """Ключи кэша ответов для формулировок вопроса"""
+        arguments = json.loads(filters) if filters else {}
+        return [
+            (
+                self.rag_service._answer_cache_key(
+                    prompt,
+                    arguments.get("source"),
+                    arguments.get("audience"),
+                    arguments.get("faculties"),
+                ),
+                prompt,
+            )
+            for prompt in prompts
+        ]
+
+    async def _prepare(
+        self, prompt: str, filters: Optional[str], entries: list[tuple[str, str]]
+    ) -> bool:
+        arguments = json.loads(filters) if filters else {}
+        with background_priority(), start_trace() as trace:
+            response = await self.rag_service.process_query(
+                prompt, precompute=True, **arguments
+            )
+        if trace.error:
+            logger.warning(f"Не удалось подготовить ответ на частый вопрос: {prompt!r}")
+            return False
+        value = json.dumps(
+            {"answer": response.answer, "confidence": response.confidence},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        await asyncio.to_thread(
+            self.precomputed_answers.put,
+            entries,
+            prompt,
+            filters,
+            value,
+            trace.chunk_ids,
+            trace.sources,
+        )
+        return True
@@ -0,0 +1,190 @@
+from pathlib import Path
+from typing import Any, Iterable, Optional
+import asyncio
+import threading
+import time
+
+from app.services.cache.sqlite_cache import open_sqlite
+
+
+class PrecomputedAnswers:
+    """Заранее подготовленные ответы на частые вопросы в локальном файле SQLite
+
+    В отличие от кэша ответов записи не устаревают по времени: ответ хранится,
+    пока не изменится один из документов, чанки которых были найдены при его
+    подготовке. Изменение документа помечает зависящие от него ответы
+    устаревшими (они больше не выдаются) до повторной подготовки. База в режиме
+    WAL, пометки видны всем воркерам
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._connection = open_sqlite(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed ("
+            "key TEXT PRIMARY KEY, prompt TEXT NOT NULL, cluster TEXT NOT NULL, "
+            "filters TEXT, value BLOB NOT NULL, chunk_ids TEXT, "
+            "created_at REAL NOT NULL, stale INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed_sources ("
+            "source TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (source, key))"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM precomputed WHERE key = ? AND stale = 0", [key]
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    def put(
+        self,
+        entries: list[tuple[str, str]],
+        cluster: str,
+        filters: Optional[str],
+        value: bytes,
+        chunk_ids: list[str],
+        sources: Iterable[str],
+    ) -> None:
+        """Сохранение ответа кластера под ключами всех его формулировок
+
+        Args:
+            entries (list[tuple[str, str]]): Пары (ключ кэша ответов, запрос)
+            cluster (str): Запрос, по которому подготовлен ответ
+            sources (Iterable[str]): Документы, при изменении которых ответ устаревает
+        """
+        now = time.time()
+        keys = [key for key, _ in entries]
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO precomputed "
+                    "(key, prompt, cluster, filters, value, chunk_ids, created_at, stale) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                    [
+                        (key, prompt, cluster, filters, value, ",".join(chunk_ids), now)
+                        for key, prompt in entries
+                    ],
+                )
+                self._connection.execute(
+                    f"DELETE FROM precomputed_sources WHERE key IN ({placeholders})", keys
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO precomputed_sources (source, key) VALUES (?, ?)",
+                    [(source, key) for source in sources for key in keys],
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def fresh_keys(self, keys: list[str]) -> set[str]:
+        """Ключи из keys, для которых есть неустаревший ответ"""
+        if not keys:
+            return set()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key FROM precomputed WHERE stale = 0 AND key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        return {key for key, in rows}
+
+    def invalidate(self, source: Optional[str] = None) -> int:
+        """Пометка устаревшими ответов, зависящих от документа source (без него — всех)
+
+        Returns:
+            int: Количество помеченных записей
+        """
+        with self._lock:
+            if source is None:
+                cursor = self._connection.execute(
+                    "UPDATE precomputed SET stale = 1 WHERE stale = 0"
+                )
+            else:
+                cursor = self._connection.execute(
+                    "UPDATE precomputed SET stale = 1 WHERE stale = 0 AND key IN ("
+                    "SELECT key FROM precomputed_sources WHERE source = ?)",
+                    [source],
+                )
+            return cursor.rowcount
+
+    def stale_clusters(self) -> list[tuple[str, Optional[str], list[str]]]:
+        """Кластеры с устаревшими ответами: запрос кластера, фильтры, все формулировки"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT cluster, filters, prompt FROM precomputed AS entry WHERE EXISTS ("
+                "SELECT 1 FROM precomputed AS stale_entry WHERE stale_entry.stale = 1 "
+                "AND stale_entry.cluster = entry.cluster "
+                "AND stale_entry.filters IS entry.filters) "
+                "ORDER BY cluster, filters"
+            ).fetchall()
+        clusters: dict[tuple[str, Optional[str]], list[str]] = {}
+        for cluster, filters, prompt in rows:
+            clusters.setdefault((cluster, filters), []).append(prompt)
+        return [(cluster, filters, prompts) for (cluster, filters), prompts in clusters.items()]
+
+    def retain(self, keys: list[str]) -> int:
+        """Удаление ответов на вопросы, переставшие быть частыми
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS retained (key TEXT)")
+                self._connection.execute("DELETE FROM retained")
+                self._connection.executemany(
+                    "INSERT INTO retained (key) VALUES (?)", [(key,) for key in keys]
+                )
+                deleted = self._connection.execute(
+                    "DELETE FROM precomputed WHERE key NOT IN (SELECT key FROM retained)"
+                ).rowcount
+                self._connection.execute(
+                    "DELETE FROM precomputed_sources WHERE key NOT IN (SELECT key FROM retained)"
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def entries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT cluster, filters, prompt, chunk_ids, created_at, stale "
+                "FROM precomputed ORDER BY cluster, prompt"
+            ).fetchall()
+        return [
+            {
+                "cluster": cluster,
+                "filters": filters,
+                "prompt": prompt,
+                "chunk_ids": chunk_ids.split(",") if chunk_ids else [],
+                "created_at": created_at,
+                "stale": bool(stale),
+            }
+            for cluster, filters, prompt, chunk_ids, created_at, stale in rows
+        ]
+
+    def get_metrics(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
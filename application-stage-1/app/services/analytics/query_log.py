@@ -0,0 +1,186 @@
+from pathlib import Path
+from typing import Any, Optional
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from app.services.cache.sqlite_cache import open_sqlite
+from app.services.tracing import STAGES, QueryTrace, rounded
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLog:
+    """Журнал запросов пользователей в локальном файле SQLite (только добавление)
+
+    Нормализованный текст запроса хранится один раз в таблице prompts, строка
+    журнала ссылается на него и содержит фильтры, время этапов, уверенность и
+    найденные чанки. Записи копятся в памяти и пишутся пачками фоновой задачей
+    раз в flush_interval секунд, поэтому журнал не задерживает ответ. Сверх
+    max_pending неотправленных записей новые отбрасываются. База в режиме WAL,
+    журнал общий для всех воркеров
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0, max_pending: int = 10000):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: list[tuple[Any, ...]] = []
+        self._prompt_ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self._connection = open_sqlite(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            "id INTEGER PRIMARY KEY, prompt TEXT NOT NULL UNIQUE)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            "ts REAL NOT NULL, prompt_id INTEGER NOT NULL, filters TEXT, "
+            "total_ms REAL NOT NULL, embedding_ms REAL, search_ms REAL, generation_ms REAL, "
+            "confidence REAL, chunk_ids TEXT, cache_hit TEXT, error INTEGER)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS queries_ts ON queries (ts)")
+
+    @staticmethod
+    def encode_filters(
+        source: Optional[str] = None,
+        audience: Optional[str] = None,
+        faculties: Optional[list[str]] = None,
+    ) -> Optional[str]:
+        """Фильтры запроса одной строкой JSON, None без фильтров"""
+        filters = {
+            key: value
+            for key, value in (
+                ("source", source),
+                ("audience", audience),
+                ("faculties", sorted(faculties) if faculties else None),
+            )
+            if value
+        }
+        return json.dumps(filters, ensure_ascii=False, sort_keys=True) if filters else None
+
+    def append(
+        self,
+        prompt: str,
+        filters: Optional[str],
+        total_ms: float,
+        confidence: float,
+        trace: QueryTrace,
+    ) -> None:
+        """Добавление записи в очередь на запись, без обращения к базе"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        cache_hit = next(
+            (cache for cache in ("answer", "precomputed") if cache in trace.cache_hits), None
+        )
+        self._pending.append(
+            (
+                time.time(),
+                prompt,
+                filters,
+                total_ms,
+                *(trace.stages.get(stage) for stage in STAGES),
+                confidence,
+                ",".join(trace.chunk_ids) or None,
+                cache_hit,
+                trace.error,
+            )
+        )
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        with self._lock:
+            if len(self._prompt_ids) > 100000:
+                self._prompt_ids.clear()
+            new_prompts = {row[1] for row in rows} - self._prompt_ids.keys()
+            if new_prompts:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO prompts (prompt) VALUES (?)",
+                    [(prompt,) for prompt in new_prompts],
+                )
+                placeholders = ",".join("?" * len(new_prompts))
+                self._prompt_ids.update(
+                    self._connection.execute(
+                        f"SELECT prompt, id FROM prompts WHERE prompt IN ({placeholders})",
+                        list(new_prompts),
+                    ).fetchall()
+                )
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO queries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(row[0], self._prompt_ids[row[1]], *row[2:]) for row in rows],
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    async def flush(self) -> None:
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self.write, rows)
+        except Exception as e:
+            # Журнал запросов не должен влиять на ответы пользователям
+            logger.warning(f"Не удалось записать журнал запросов ({len(rows)} записей): {e!r}")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop(self) -> None:
+        """Остановка фоновой записи с записью накопленного"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def frequent(self, since: float, limit: int = 1000) -> list[tuple[str, Optional[str], int]]:
+        """Самые частые запросы (с фильтрами) начиная с since"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT prompts.prompt, queries.filters, COUNT(*) AS count "
+                "FROM queries JOIN prompts ON prompts.id = queries.prompt_id "
+                "WHERE queries.ts >= ? GROUP BY queries.prompt_id, queries.filters "
+                "ORDER BY count DESC LIMIT ?",
+                [since, limit],
+            ).fetchall()
+
+    def summary(self, since: float) -> dict[str, Any]:
+        """Сводка журнала начиная с since: запросы, задержка, доли попаданий в кэши и ошибок"""
+        with self._lock:
+            queries, distinct, mean_ms, answer_hits, precomputed_hits, errors = (
+                self._connection.execute(
+                    "SELECT COUNT(*), COUNT(DISTINCT prompt_id), AVG(total_ms), "
+                    "AVG(cache_hit IS 'answer'), AVG(cache_hit IS 'precomputed'), AVG(error) "
+                    "FROM queries WHERE ts >= ?",
+                    [since],
+                ).fetchone()
+            )
+
+        return {
+            "queries": queries,
+            "distinct_prompts": distinct,
+            "mean_latency_ms": rounded(mean_ms, 1),
+            "answer_cache_hit_rate": rounded(answer_hits),
+            "precomputed_hit_rate": rounded(precomputed_hits),
+            "error_rate": rounded(errors),
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Any
-from langchain_core.embeddings import Embeddings
+from typing import TYPE_CHECKING, Any
+import asyncio
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
 
 
 class EmbeddingServiceBase(ABC):
     """Абстрактный класс для Embedding сервисов"""
 
-    client: Embeddings
+    client: "Embeddings"
 
     @abstractmethod
     async def health_check(self) -> bool:
@@ -18,6 +21,44 @@ class EmbeddingServiceBase(ABC):
         """
         pass
 
+    async def embed_query(self, text: str) -> list[float]:
+        """
+        Получение эмбеддинга запроса
+
+        Args:
+            text (str): Текст запроса
+
+        Returns:
+            list[float]: Вектор эмбеддинга
+        """
+        return await self.client.aembed_query(text)
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Получение эмбеддингов нескольких запросов, как у embed_query
+
+        Сервисы, умеющие векторизовать запросы пачкой, переопределяют метод
+
+        Args:
+            texts (list[str]): Тексты запросов
+
+        Returns:
+            list[list[float]]: Векторы эмбеддингов
+        """
+        return list(await asyncio.gather(*(self.embed_query(text) for text in texts)))
+
+    async def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Получение эмбеддингов документов
+
+        Args:
+            texts (list[str]): Тексты документов
+
+        Returns:
+            list[list[float]]: Векторы эмбеддингов
+        """
+        return await self.client.aembed_documents(texts)
+
     @abstractmethod
     def get_embedding_dimension(self) -> int:
         """
@@ -37,3 +78,7 @@ class EmbeddingServiceBase(ABC):
             dict[str, Any]: Словарь с информацией о сервисе
         """
         pass
+
+    async def close(self) -> None:
+        """Освобождение ресурсов сервиса (пулы потоков, фоновые задачи)"""
+        pass
@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class LLMServiceBase(ABC):
     """Абстрактный класс для LLM сервисов"""
 
+    UNAVAILABLE_ANSWER = "Сервис временно недоступен"
+
     @abstractmethod
     async def generate_response(
         self,
         prompt: str,
         context: str,
+        query_class: Optional[str] = None,
+        prompt_variant: Optional[str] = None,
+        history: Optional[list[tuple[str, str]]] = None,
     ) -> str:
         """
         Генерация ответа
@@ -16,6 +22,9 @@ class LLMServiceBase(ABC):
         Args:
             prompt (str): Запрос пользователя
             context (str): Контекст из документов
+            query_class (Optional[str]): Класс запроса для выбора системного промпта
+            prompt_variant (Optional[str]): Вариант шаблона промпта (для экспериментов)
+            history (Optional[list[tuple[str, str]]]): Предыдущие вопросы и ответы диалога
 
         Returns:
             str: Ответ
@@ -0,0 +1,267 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+import logging
+
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.tracing import trace_stage
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreServiceBase(ABC):
+    """Абстрактный класс для векторных хранилищ"""
+
+    embedding_service: EmbeddingServiceBase
+    collection_name: str
+    collection_metadata: dict[str, Any]
+    partitions: dict[str, Any]
+
+    @abstractmethod
+    async def add_documents(
+        self,
+        documents: list[str],
+        ids: list[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        partition: Optional[str] = None,
+    ) -> bool:
+        """
+        Добавление документов в коллекцию
+
+        Args:
+            documents (list[str]): Тексты чанков
+            ids (list[str]): Идентификаторы чанков
+            metadatas (Optional[list[dict[str, Any]]]): Метаданные чанков
+            partition (Optional[str]): Раздел коллекции (например, факультет)
+
+        Returns:
+            bool: True если документы добавлены, иначе False
+        """
+        pass
+
+    @abstractmethod
+    async def search_by_vector(
+        self,
+        embedding: list[float],
+        limit: int = 4,
+        where: Optional[dict[str, Any]] = None,
+        partitions: Optional[list[str]] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Поиск похожих документов по вектору запроса
+
+        Args:
+            embedding (list[float]): Вектор запроса
+            limit (int): Количество результатов
+            where (Optional[dict[str, Any]]): Фильтр по метаданным в формате ChromaDB
+            partitions (Optional[list[str]]): Разделы для поиска, по умолчанию основная коллекция
+
+        Returns:
+            list[dict[str, Any]]: Результаты, отсортированные по similarity_score
+        """
+        pass
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 4,
+        where: Optional[dict[str, Any]] = None,
+        partitions: Optional[list[str]] = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск похожих документов по тексту запроса"""
+        if not query.strip():
+            logger.warning("Текст запроса не указан")
+            return []
+
+        try:
+            logger.debug(
+                "Поиск по запросу: %r, фильтр: %s, разделы: %s", query, where, partitions
+            )
+            with trace_stage("embedding"):
+                embedding = await self.embedding_service.embed_query(query)
+            with trace_stage("search"):
+                return await self.search_by_vector(
+                    embedding, limit=limit, where=where, partitions=partitions
+                )
+        except Exception as e:
+            logger.error(
+                f"При поиске документов произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return []
+
+    @abstractmethod
+    async def delete_by_source(
+        self,
+        source: str,
+        partition: Optional[str] = None,
+        keep_ids: Optional[list[str]] = None,
+    ) -> int:
+        """
+        Удаление чанков документа
+
+        Args:
+            source (str): Имя файла документа (поле source метаданных)
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+            keep_ids (Optional[list[str]]): Чанки, которые нужно оставить (текущая версия документа)
+
+        Returns:
+            int: Количество удаленных чанков
+        """
+        pass
+
+    @abstractmethod
+    async def get_source_hashes(
+        self, source: str, partition: Optional[str] = None
+    ) -> dict[str, str]:
+        """
+        Хэши содержимого чанков документа
+
+        Args:
+            source (str): Имя файла документа (поле source метаданных)
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+
+        Returns:
+            dict[str, str]: ID чанка -> content_hash из метаданных
+        """
+        pass
+
+    @abstractmethod
+    def get_collection_info(self) -> dict[str, Any]:
+        """
+        Получение информации о коллекции
+
+        Returns:
+            dict[str, Any]: Имя, количество документов, метаданные и разделы
+        """
+        pass
+
+    @abstractmethod
+    def count(self, partition: Optional[str] = None) -> int:
+        """
+        Количество записей в коллекции или разделе
+
+        Args:
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+
+        Returns:
+            int: Количество записей
+        """
+        pass
+
+    @abstractmethod
+    def iter_records(
+        self,
+        batch_size: int = 500,
+        partition: Optional[str] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Потоковое чтение записей коллекции вместе с векторами
+
+        Args:
+            batch_size (int): Размер пачки
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+
+        Returns:
+            Iterator[dict[str, Any]]: Пачки с ключами ids, documents, metadatas, embeddings
+        """
+        pass
+
+    @abstractmethod
+    def upsert_records(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: "np.ndarray",
+        partition: Optional[str] = None,
+    ) -> None:
+        """
+        Запись готовых векторов без обращения к сервису эмбеддингов
+
+        Args:
+            ids (list[str]): Идентификаторы чанков
+            documents (list[str]): Тексты чанков
+            metadatas (list[dict[str, Any]]): Метаданные чанков
+            embeddings (np.ndarray): Векторы чанков
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+        """
+        pass
+
+    def flush(self) -> None:
+        """Сохранение несохраненных изменений на диск (для хранилищ с локальным диском)"""
+        pass
+
+    def close(self) -> None:
+        """Освобождение соединений при остановке приложения"""
+        pass
+
+    @abstractmethod
+    def clear_collection(self, partition: Optional[str] = None) -> bool:
+        """
+        Очистка основной коллекции или раздела
+
+        Args:
+            partition (Optional[str]): Раздел коллекции, по умолчанию основная коллекция
+
+        Returns:
+            bool: True если коллекция очищена, иначе False
+        """
+        pass
+
+    @abstractmethod
+    def create_shadow(self) -> "VectorStoreServiceBase":
+        """
+        Создание пустого теневого поколения коллекции для пересборки
+
+        Returns:
+            VectorStoreServiceBase: Хранилище теневого поколения (запросы в него не идут)
+        """
+        pass
+
+    @abstractmethod
+    def promote(self, shadow: "VectorStoreServiceBase") -> None:
+        """
+        Атомарное переключение запросов на теневое поколение
+
+        Args:
+            shadow (VectorStoreServiceBase): Поколение, созданное create_shadow
+        """
+        pass
+
+    @abstractmethod
+    def rollback(self) -> bool:
+        """
+        Возврат к предыдущему поколению
+
+        Returns:
+            bool: True если откат выполнен, иначе False
+        """
+        pass
+
+    @abstractmethod
+    async def health_check(self) -> bool:
+        """
+        Проверка работы хранилища и сервиса эмбеддингов
+
+        Returns:
+            bool: True если сервисы доступны, иначе False
+        """
+        pass
+
+    async def get_embedding_service_info(self) -> dict[str, Any]:
+        """Получение информации о сервисе эмбеддингов"""
+        try:
+            service_info = self.embedding_service.get_service_info()
+            health_check = await self.embedding_service.health_check()
+            return {
+                **service_info,
+                "health_status": "OK" if health_check else "DOWN",
+            }
+        except Exception as e:
+            logger.error(f"Произошла ошибка: {e}")
+            return {
+                "error": str(e),
+            }
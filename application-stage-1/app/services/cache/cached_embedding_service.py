@@ -0,0 +1,76 @@
+from array import array
+from typing import Any, Awaitable, Callable
+import hashlib
+
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.cache.sqlite_cache import SQLiteCache
+from app.services.tracing import record_cache_hit
+
+
+class CachedEmbeddingService(EmbeddingServiceBase):
+    """Сервис эмбеддингов с общим для воркеров кэшем векторов
+
+    Ключ — модель и SHA-256 текста, вектор хранится как float32.
+    Промахи пачки запрашиваются у исходного сервиса одним вызовом
+    """
+
+    def __init__(self, embedding_service: EmbeddingServiceBase, cache: SQLiteCache):
+        self.embedding_service = embedding_service
+        self.client = embedding_service.client
+        self.cache = cache
+        self.model = embedding_service.get_service_info().get("model", "")
+
+    def _key(self, text: str) -> str:
+        return f"{self.model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    async def embed_query(self, text: str) -> list[float]:
+        # Эмбеддинг запроса может отличаться от эмбеддинга документа (префиксы моделей)
+        key = f"query:{self._key(text)}"
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            record_cache_hit("embedding")
+            return array("f", cached).tolist()
+        embedding = await self.embedding_service.embed_query(text)
+        await self.cache.aset(key, array("f", embedding).tobytes())
+        return embedding
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return await self._embed_many(
+            texts, "query:", self.embedding_service.embed_queries
+        )
+
+    async def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._embed_many(texts, "", self.embedding_service.embed_documents)
+
+    async def _embed_many(
+        self,
+        texts: list[str],
+        key_prefix: str,
+        embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+    ) -> list[list[float]]:
+        keys = [f"{key_prefix}{self._key(text)}" for text in texts]
+        cached = await self.cache.aget_many(list(set(keys)))
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            texts_by_key = dict(zip(keys, texts))
+            embeddings = await embed([texts_by_key[key] for key in missing])
+            computed = {
+                key: array("f", embedding).tobytes()
+                for key, embedding in zip(missing, embeddings)
+            }
+            await self.cache.aset_many(computed.items())
+            cached.update(computed)
+        return [array("f", cached[key]).tolist() for key in keys]
+
+    async def health_check(self) -> bool:
+        return await self.embedding_service.health_check()
+
+    def get_embedding_dimension(self) -> int:
+        return self.embedding_service.get_embedding_dimension()
+
+    def get_service_info(self) -> dict[str, Any]:
+        return self.embedding_service.get_service_info()
+
+    async def close(self) -> None:
+        await self.embedding_service.close()
+        self.cache.close()
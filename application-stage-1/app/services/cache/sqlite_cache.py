@@ -0,0 +1,133 @@
+from pathlib import Path
+from typing import Iterable, Optional
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL = 1000
+
+
+def open_sqlite(path: Optional[Path]) -> sqlite3.Connection:
+    """Соединение с локальным файлом SQLite в режиме WAL (без path - база в памяти)
+
+    Соединение в режиме автокоммита и используется из разных потоков, поэтому
+    обращения к нему вызывающий код защищает своей блокировкой
+    """
+    if path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(
+        path or ":memory:", timeout=30.0, check_same_thread=False, isolation_level=None
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SQLiteCache:
+    """Кэш ключ-значение в локальном файле SQLite, общий для всех воркеров
+
+    База работает в режиме WAL: воркеры читают параллельно, запись
+    сериализуется самим SQLite. Записи старше ttl_seconds не выдаются,
+    при превышении max_entries удаляются самые старые.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        ttl_seconds: Optional[float] = None,
+        max_entries: int = 100000,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Недопустимое имя таблицы кэша: {table}")
+        self.path = Path(path)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self._connection = open_sqlite(self.path)
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)"
+        )
+
+    def _min_created_at(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, value FROM {self.table} "
+                f"WHERE key IN ({placeholders}) AND created_at >= ?",
+                [*keys, self._min_created_at()],
+            ).fetchall()
+        found = dict(rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Iterable[tuple[str, bytes]]) -> None:
+        now = time.time()
+        rows = [(key, value, now) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._writes += len(rows)
+            if self._writes >= PRUNE_INTERVAL:
+                self._writes = 0
+                self._prune()
+
+    def _prune(self) -> None:
+        """Удаление устаревших записей и самых старых сверх max_entries"""
+        self._connection.execute(
+            f"DELETE FROM {self.table} WHERE created_at < ?", [self._min_created_at()]
+        )
+        self._connection.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            [self.max_entries],
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.table}")
+
+    async def aget_many(self, keys: list[str]) -> dict[str, bytes]:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aset_many(self, items: Iterable[tuple[str, bytes]]) -> None:
+        await asyncio.to_thread(self.set_many, list(items))
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return (await self.aget_many([key])).get(key)
+
+    async def aset(self, key: str, value: bytes) -> None:
+        await self.aset_many([(key, value)])
+
+    async def aclear(self) -> None:
+        await asyncio.to_thread(self.clear)
+
+    def get_metrics(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -1,16 +1,46 @@
-from typing import Any
+from typing import Any, Iterator, NamedTuple, Optional
+import asyncio
+import hashlib
 import chromadb
 import logging
+import re
+import time
 
 from langchain_chroma import Chroma
 from chromadb.config import Settings as ChromaSettings
+from chromadb.errors import NotFoundError
+import numpy as np
 
 from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.tracing import trace_stage
 
 logger = logging.getLogger(__name__)
 
+ALIAS_COLLECTION_SUFFIX = ".alias"
 
-class ChromaDBService:
+
+class ChromaGeneration(NamedTuple):
+    """Поколение коллекции: физическая коллекция и ее разделы"""
+
+    collection_name: str
+    interface: Chroma
+    partitions: dict[str, Chroma]
+
+
+class ChromaDBService(VectorStoreServiceBase):
+    """Коллекция ChromaDB за псевдонимом
+
+    Запросы обслуживает активное поколение. Пересборка идет в теневое поколение
+    (create_shadow), после чего promote атомарно переключает ссылку на него,
+    а прежнее поколение остается для отката.
+
+    Псевдоним общий для всех воркеров: каждый перечитывает его не реже чем раз
+    в alias_ttl секунд и переключается на поколение, выбранное другим воркером.
+    Поколения вне псевдонима удаляются только при следующей пересборке и не
+    раньше чем через 2 * alias_ttl после смены псевдонима, когда их уже не
+    обслуживает ни один воркер.
+    """
 
     def __init__(
         self,
@@ -18,6 +48,8 @@ class ChromaDBService:
         chroma_db_port: str,
         chroma_db_collection_name: str,
         embedding_service: EmbeddingServiceBase,
+        generation_name: Optional[str] = None,
+        alias_ttl: float = 5.0,
     ):
         self.embedding_service = embedding_service
         embedding_service_info = self.embedding_service.get_service_info()
@@ -26,7 +58,8 @@ class ChromaDBService:
             f"Embedding сервис: {embedding_service_info.get('api_provider')}; Модель: {embedding_service_info.get('model')}",
         )
 
-        COLLECTION_METADATA = {
+        self.collection_name = chroma_db_collection_name
+        self.collection_metadata = {
             "description": "Коллекция документов УрФУ",
             "embedding_service": embedding_service_info.get("service", "Unknown"),
             "embedding_model": embedding_service_info.get("model", "Unknown"),
@@ -34,38 +67,265 @@ class ChromaDBService:
         }
 
         logger.info(f"Подключение к ChromaDB на {chroma_db_host}:{chroma_db_port}")
-        self.chroma_db_interface = Chroma(
-            client=chromadb.HttpClient(
-                host=chroma_db_host,
-                port=int(chroma_db_port),
-            ),
-            client_settings=ChromaSettings(anonymized_telemetry=False),
-            collection_name=chroma_db_collection_name,
-            collection_metadata=COLLECTION_METADATA,
+        self.chroma_db_host = chroma_db_host
+        self.chroma_db_port = chroma_db_port
+        self.client = chromadb.HttpClient(
+            host=chroma_db_host,
+            port=int(chroma_db_port),
+            settings=ChromaSettings(anonymized_telemetry=False),
+        )
+
+        self.alias_ttl = alias_ttl
+        # Теневое поколение не следит за псевдонимом
+        self.follows_alias = generation_name is None
+        self.previous: Optional[ChromaGeneration] = None
+        self._alias_loaded_at = time.monotonic()
+        if generation_name:
+            self.active = self._open_generation(generation_name)
+        else:
+            alias = self._load_alias()
+            self.active = self._open_generation(alias.get("active", self.collection_name))
+            self._apply_alias(alias)
+        logger.info(
+            f"Инициализирована ChromaDB '{self.collection_name}' (поколение {self.active.collection_name}) с количеством документов: {self.chroma_db_interface._collection.count()}, разделов: {len(self.partitions)}.",
+        )
+
+    @property
+    def chroma_db_interface(self) -> Chroma:
+        return self.active.interface
+
+    @property
+    def partitions(self) -> dict[str, Chroma]:
+        return self.active.partitions
+
+    def _create_interface(
+        self, collection_name: str, collection_metadata: dict[str, Any]
+    ) -> Chroma:
+        return Chroma(
+            client=self.client,
+            collection_name=collection_name,
+            collection_metadata=collection_metadata,
             create_collection_if_not_exists=True,
             embedding_function=self.embedding_service.client,
         )
+
+    def _partition_collection_name(self, partition: str) -> str:
+        """Имя коллекции раздела (ChromaDB допускает только [a-zA-Z0-9._-])"""
+        slug = re.sub(r"[^a-z0-9]+", "-", partition.lower()).strip("-")
+        if not slug or not partition.isascii():
+            slug = hashlib.sha1(partition.encode("utf-8")).hexdigest()[:12]
+        return f"{self.active.collection_name}--{slug}"
+
+    def _list_collection_names(self) -> list[str]:
+        return [collection.name for collection in self.client.list_collections()]
+
+    def _load_partitions(self, collection_name: str) -> dict[str, Chroma]:
+        """Подключение к уже существующим коллекциям разделов"""
+        partitions = {}
+        try:
+            for collection in self.client.list_collections():
+                metadata = collection.metadata or {}
+                if metadata.get("parent_collection") != collection_name:
+                    continue
+                partition = metadata.get("partition")
+                if partition:
+                    partitions[partition] = self._create_interface(
+                        collection.name, metadata
+                    )
+        except Exception as e:
+            logger.error(
+                f"При загрузке разделов коллекции произошла ошибка: {e}",
+                exc_info=True,
+            )
+        return partitions
+
+    def _open_generation(self, collection_name: str) -> ChromaGeneration:
+        return ChromaGeneration(
+            collection_name=collection_name,
+            interface=self._create_interface(collection_name, self.collection_metadata),
+            partitions=self._load_partitions(collection_name),
+        )
+
+    def _load_alias(self) -> dict[str, Any]:
+        try:
+            return (
+                self.client.get_collection(
+                    f"{self.collection_name}{ALIAS_COLLECTION_SUFFIX}"
+                ).metadata
+                or {}
+            )
+        except NotFoundError:
+            return {}
+
+    def _save_alias(self) -> None:
+        """Псевдоним хранится в метаданных служебной коллекции <имя>.alias"""
+        metadata = {"active": self.active.collection_name, "updated_at": time.time()}
+        if self.previous:
+            metadata["previous"] = self.previous.collection_name
+        self.client.get_or_create_collection(
+            f"{self.collection_name}{ALIAS_COLLECTION_SUFFIX}"
+        ).modify(metadata=metadata)
+        self._alias_loaded_at = time.monotonic()
+
+    def _apply_alias(self, alias: dict[str, Any]) -> None:
+        """Переключение на поколения из псевдонима, если их сменил другой воркер"""
+        active_name = alias.get("active", self.collection_name)
+        if active_name != self.active.collection_name:
+            logger.info(
+                f"Коллекция '{self.collection_name}' переключена другим воркером на поколение {active_name}"
+            )
+            self.active = self._open_generation(active_name)
+        previous_name = alias.get("previous")
+        if previous_name != (self.previous.collection_name if self.previous else None):
+            self.previous = (
+                self._open_generation(previous_name)
+                if previous_name in self._list_collection_names()
+                else None
+            )
+        self._alias_loaded_at = time.monotonic()
+
+    def _alias_expired(self) -> bool:
+        return (
+            self.follows_alias
+            and time.monotonic() - self._alias_loaded_at >= self.alias_ttl
+        )
+
+    def refresh_alias(self, force: bool = False) -> None:
+        """Перечитывание псевдонима, если он старше alias_ttl (с force — всегда)"""
+        if force:
+            self._apply_alias(self._load_alias())
+        elif self._alias_expired():
+            # Остальные запросы до ответа ChromaDB не перечитывают псевдоним повторно
+            self._alias_loaded_at = time.monotonic()
+            self._reload_alias()
+
+    async def _arefresh_alias(self) -> None:
+        if self._alias_expired():
+            self._alias_loaded_at = time.monotonic()
+            await asyncio.to_thread(self._reload_alias)
+
+    def _reload_alias(self) -> None:
+        try:
+            self._apply_alias(self._load_alias())
+        except Exception as e:
+            # Запросы продолжает обслуживать известное поколение
+            logger.warning(f"Не удалось прочитать псевдоним коллекции: {e!r}")
+
+    def _drop_generation(self, collection_name: str) -> None:
+        """Удаление коллекции поколения вместе с разделами"""
+        logger.info(f"Удаление поколения {collection_name}")
+        for collection in self.client.list_collections():
+            metadata = collection.metadata or {}
+            if (
+                collection.name == collection_name
+                or metadata.get("parent_collection") == collection_name
+            ):
+                self.client.delete_collection(collection.name)
+
+    def create_shadow(self) -> "ChromaDBService":
+        """Создание пустого теневого поколения для пересборки
+
+        Вызывается под межпроцессной блокировкой пересборки, поэтому чужих
+        незавершенных теневых поколений нет, а оставшиеся от прерванных
+        пересборок удаляются вместе с поколениями вне псевдонима
+        """
+        pattern = re.compile(rf"^{re.escape(self.collection_name)}\.g(\d+)$")
+        alias = self._load_alias()
+        self._apply_alias(alias)
+        names = self._list_collection_names()
+        keep = {self.active.collection_name}
+        if self.previous:
+            keep.add(self.previous.collection_name)
+        generations = [int(m.group(1)) for m in map(pattern.match, names) if m]
+        stale_generations = {
+            f"{self.collection_name}.g{number}" for number in generations
+        } - keep
+        if time.time() - alias.get("updated_at", 0) < 2 * self.alias_ttl:
+            # Воркеры могли еще не перечитать псевдоним и обслуживать прежние поколения
+            stale_generations.clear()
+        for stale in stale_generations:
+            self._drop_generation(stale)
+
+        generation_name = f"{self.collection_name}.g{max(generations, default=0) + 1}"
+        logger.info(f"Создание теневого поколения {generation_name}")
+        return ChromaDBService(
+            chroma_db_host=self.chroma_db_host,
+            chroma_db_port=self.chroma_db_port,
+            chroma_db_collection_name=self.collection_name,
+            embedding_service=self.embedding_service,
+            generation_name=generation_name,
+            alias_ttl=self.alias_ttl,
+        )
+
+    def promote(self, shadow: VectorStoreServiceBase) -> None:
+        """Переключение запросов на теневое поколение одной заменой ссылки
+
+        Поколение, вышедшее из псевдонима, удаляется при следующей пересборке
+        """
+        if not isinstance(shadow, ChromaDBService) or shadow.collection_name != self.collection_name:
+            raise ValueError(f"Поколение не относится к коллекции '{self.collection_name}'")
+        self.refresh_alias(force=True)
+        self.previous, self.active = self.active, shadow.active
+        self._save_alias()
+        logger.info(
+            f"Коллекция '{self.collection_name}' переключена на поколение {self.active.collection_name}, "
+            f"для отката сохранено {self.previous.collection_name}"
+        )
+
+    def rollback(self) -> bool:
+        """Возврат к предыдущему поколению"""
+        self.refresh_alias(force=True)
+        if not self.previous:
+            logger.warning(f"Для коллекции '{self.collection_name}' нет поколения для отката")
+            return False
+        self.previous, self.active = self.active, self.previous
+        self._save_alias()
         logger.info(
-            f"Инициализирована ChromaDB с количеством документов: {self.chroma_db_interface._collection.count()}.",
+            f"Коллекция '{self.collection_name}' возвращена к поколению {self.active.collection_name}"
         )
+        return True
+
+    def _get_interface(self, partition: Optional[str] = None) -> Chroma:
+        if not partition:
+            return self.chroma_db_interface
+        if partition not in self.partitions:
+            logger.info(f"Создание раздела коллекции для '{partition}'")
+            self.partitions[partition] = self._create_interface(
+                self._partition_collection_name(partition),
+                {
+                    **self.collection_metadata,
+                    "parent_collection": self.active.collection_name,
+                    "partition": partition,
+                },
+            )
+        return self.partitions[partition]
 
     async def add_documents(
         self,
         documents: list[str],
         ids: list[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        partition: Optional[str] = None,
     ) -> bool:
         """Добавление документов в коллекцию ChromaDB"""
         if not documents:
             logger.warning("Нет документов для добавления")
             return True
         try:
+            await self._arefresh_alias()
             logger.info(
                 f"Добавление документов ({len(documents)}) с ID: {ids[:3]}{'...' if len(ids) > 3 else ''}"
             )
-            self.chroma_db_interface.add_texts(
-                texts=documents,
-                ids=ids,
-            )
+            with trace_stage("embedding"):
+                embeddings = await self.embedding_service.embed_documents(documents)
+            with trace_stage("upsert"):
+                await asyncio.to_thread(
+                    self._get_interface(partition)._collection.upsert,
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas,
+                )
             logger.info(f"Документы ({len(documents)}) успешно добавлены в коллекцию")
             return True
         except Exception as e:
@@ -75,39 +335,61 @@ class ChromaDBService:
             )
             return False
 
-    async def search(
+    async def search_by_vector(
         self,
-        query: str,
+        embedding: list[float],
         limit: int = 4,
+        where: Optional[dict[str, Any]] = None,
+        partitions: Optional[list[str]] = None,
     ) -> list[dict[str, Any]]:
-        """Поиск похожих документов в коллекции ChromaDB"""
-        if not query.strip():
-            logger.warning("Текст запроса не указан")
-            return []
+        """Поиск похожих документов в коллекции ChromaDB
 
+        Если указаны разделы, поиск выполняется параллельно только по ним
+        """
         try:
-            logger.info(f"Поиск по запросу: '{query}'")
-            results = self.chroma_db_interface.similarity_search_with_relevance_scores(
-                query=query,
-                k=limit,
-            )
-            if results:
-                formatted_results = [
-                    {
-                        "id": doc.id,
-                        "content": doc.page_content,
-                        "similarity_score": score,
-                    }
-                    for doc, score in results
+            await self._arefresh_alias()
+            active = self.active
+            if partitions:
+                interfaces = [
+                    active.partitions[partition]
+                    for partition in partitions
+                    if partition in active.partitions
                 ]
-                formatted_results.sort(
-                    key=lambda x: x["similarity_score"], reverse=True
-                )
-                logger.info(
-                    f"Возврат {len(formatted_results)} результатов. Наивысший similarity_score: {formatted_results[0]['similarity_score'] if formatted_results else 'N/A'}"
+                if not interfaces:
+                    logger.warning(f"Разделы {partitions} не найдены")
+                    return []
+            else:
+                interfaces = [active.interface]
+
+            partition_results = await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        self._search_by_vector, interface, embedding, limit, where
+                    )
+                    for interface in interfaces
                 )
-                return formatted_results
-            return []
+            )
+            formatted_results = [
+                {
+                    "id": doc.id,
+                    "content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "similarity_score": score,
+                }
+                for results in partition_results
+                for doc, score in results
+            ]
+            if not formatted_results:
+                return []
+
+            formatted_results.sort(key=lambda x: x["similarity_score"], reverse=True)
+            formatted_results = formatted_results[:limit]
+            logger.debug(
+                "Возврат %d результатов. Наивысший similarity_score: %s",
+                len(formatted_results),
+                formatted_results[0]["similarity_score"],
+            )
+            return formatted_results
         except Exception as e:
             logger.error(
                 f"При поиске документов произошла ошибка: {e}",
@@ -115,13 +397,40 @@ class ChromaDBService:
             )
             return []
 
+    @staticmethod
+    def _search_by_vector(
+        interface: Chroma,
+        embedding: list[float],
+        limit: int,
+        where: Optional[dict[str, Any]],
+    ) -> list[tuple[Any, float]]:
+        relevance_score_fn = interface._select_relevance_score_fn()
+        return [
+            (doc, relevance_score_fn(distance))
+            for doc, distance in interface.similarity_search_by_vector_with_relevance_scores(
+                embedding=embedding,
+                k=limit,
+                filter=where,
+            )
+        ]
+
     def get_collection_info(self) -> dict[str, Any]:
         """Получение информации о коллекции ChromaDB"""
         try:
+            self.refresh_alias()
+            active = self.active
             return {
-                "name": self.chroma_db_interface._collection_name,
-                "documents_count": self.chroma_db_interface._collection.count(),
-                "metadata": self.chroma_db_interface._collection_metadata,
+                "name": self.collection_name,
+                "documents_count": active.interface._collection.count(),
+                "metadata": active.interface._collection_metadata,
+                "partitions": {
+                    partition: interface._collection.count()
+                    for partition, interface in active.partitions.items()
+                },
+                "generation": active.collection_name,
+                "previous_generation": (
+                    self.previous.collection_name if self.previous else None
+                ),
             }
         except Exception as e:
             logger.error(
@@ -130,16 +439,96 @@ class ChromaDBService:
             )
             return {"error": str(e)}
 
-    def clear_collection(self) -> bool:
-        """Очистка коллекции ChromaDB"""
-        try:
-            logger.info(
-                f"Попытка очистить коллецию: {self.chroma_db_interface._collection_name}"
-            )
-            self.chroma_db_interface.reset_collection()
-            logger.info(
-                f"Коллекция {self.chroma_db_interface._collection_name} очищена"
+    async def delete_by_source(
+        self,
+        source: str,
+        partition: Optional[str] = None,
+        keep_ids: Optional[list[str]] = None,
+    ) -> int:
+        """Удаление чанков документа из коллекции ChromaDB или ее раздела"""
+        await self._arefresh_alias()
+        if partition and partition not in self.partitions:
+            return 0
+        collection = self._get_interface(partition)._collection
+        found = await asyncio.to_thread(
+            collection.get, where={"source": source}, include=[]
+        )
+        keep = set(keep_ids or [])
+        ids = [record_id for record_id in found["ids"] if record_id not in keep]
+        if not ids:
+            return 0
+        await asyncio.to_thread(collection.delete, ids=ids)
+        logger.info(
+            f"Из коллекции {collection.name} удалено чанков документа {source}: {len(ids)}"
+        )
+        return len(ids)
+
+    async def get_source_hashes(
+        self, source: str, partition: Optional[str] = None
+    ) -> dict[str, str]:
+        await self._arefresh_alias()
+        if partition and partition not in self.partitions:
+            return {}
+        found = await asyncio.to_thread(
+            self._get_interface(partition)._collection.get,
+            where={"source": source},
+            include=["metadatas"],
+        )
+        return {
+            record_id: (metadata or {}).get("content_hash", "")
+            for record_id, metadata in zip(found["ids"], found["metadatas"])
+        }
+
+    def count(self, partition: Optional[str] = None) -> int:
+        self.refresh_alias()
+        if partition and partition not in self.partitions:
+            return 0
+        return self._get_interface(partition)._collection.count()
+
+    def iter_records(
+        self,
+        batch_size: int = 500,
+        partition: Optional[str] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Постраничное чтение записей коллекции ChromaDB вместе с векторами"""
+        collection = self._get_interface(partition)._collection
+        for offset in range(0, collection.count(), batch_size):
+            batch = collection.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset,
             )
+            if not batch["ids"]:
+                break
+            yield {
+                "ids": batch["ids"],
+                "documents": batch["documents"],
+                "metadatas": [metadata or {} for metadata in batch["metadatas"]],
+                "embeddings": np.asarray(batch["embeddings"], dtype=np.float32),
+            }
+
+    def upsert_records(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: np.ndarray,
+        partition: Optional[str] = None,
+    ) -> None:
+        self._get_interface(partition)._collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            documents=documents,
+            metadatas=[metadata or None for metadata in metadatas],
+        )
+
+    def clear_collection(self, partition: Optional[str] = None) -> bool:
+        """Очистка коллекции ChromaDB или ее раздела"""
+        try:
+            interface = self._get_interface(partition)
+            logger.info(f"Попытка очистить коллецию: {interface._collection_name}")
+            interface.reset_collection()
+            logger.info(f"Коллекция {interface._collection_name} очищена")
             return True
         except Exception as e:
             logger.error(
@@ -148,6 +537,15 @@ class ChromaDBService:
             )
             return False
 
+    def close(self) -> None:
+        """Закрытие HTTP-соединений с ChromaDB
+
+        Клиент общий для всех коллекций одного сервера, повторный вызов безопасен
+        """
+        session = getattr(self.client._server, "_session", None)
+        if session is not None:
+            session.close()
+
     async def health_check(self) -> bool:
         """Проверка работоспособности сервиса"""
         try:
@@ -163,18 +561,3 @@ class ChromaDBService:
                 exc_info=True,
             )
             return False
-
-    async def get_embedding_service_info(self) -> dict[str, Any]:
-        """Получение информации о сервисе эмбеддингов"""
-        try:
-            service_info = self.embedding_service.get_service_info()
-            health_check = await self.embedding_service.health_check()
-            return {
-                **service_info,
-                "health_status": "OK" if health_check else "DOWN",
-            }
-        except Exception as e:
-            logger.error(f"Произошла ошибка: {e}")
-            return {
-                "error": str(e),
-            }
@@ -0,0 +1,151 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+import asyncio
+import hashlib
+import logging
+
+from app.services.rag_service import RAGService
+from app.services.upstream_scheduler import background_priority
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentWatcher:
+    """Загрузка изменений каталога документов без перезапуска приложения
+
+    Пачки событий файловой системы собираются watchfiles за debounce_ms,
+    по каждому .txt файлу учитывается только последнее состояние: новые и
+    измененные файлы перезаписываются в коллекцию (устаревшие чанки удаляются),
+    удаленные — удаляются. Файлы с прежним содержимым не векторизуются заново.
+    Одновременно обрабатывается не более max_concurrency файлов.
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        directory: str = "./documents",
+        debounce_ms: int = 1600,
+        max_concurrency: int = 2,
+    ):
+        self.rag_service = rag_service
+        self.directory = Path(directory)
+        self.debounce_ms = debounce_ms
+        self.files: dict[str, dict[str, Any]] = {}
+        self._hashes: dict[str, str] = {}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._file_locks: dict[str, asyncio.Lock] = {}
+        self._pending: set[asyncio.Task] = set()
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск наблюдения; текущие файлы считаются уже загруженными"""
+        if not self.directory.is_dir():
+            logger.warning(
+                f"Каталог документов {self.directory.resolve()} не найден, наблюдение не запущено"
+            )
+            return
+        for path in sorted(self.directory.glob("*.txt")):
+            self._hashes[path.name] = self._file_hash(path)
+            self.files[path.name] = {"state": "unchanged"}
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._watch())
+        logger.info(
+            f"Наблюдение за каталогом документов {self.directory.resolve()} "
+            f"(файлов: {len(self.files)})"
+        )
+
+    async def stop(self, timeout: float) -> None:
+        """Остановка наблюдения с ожиданием начатой обработки файлов"""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        if self._pending:
+            _, pending = await asyncio.wait(set(self._pending), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @property
+    def status(self) -> dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "files": self.files,
+        }
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        return hashlib.sha256(path.read_text(encoding="utf-8").encode("utf-8")).hexdigest()
+
+    def _is_document(self, path: Path) -> bool:
+        return path.suffix == ".txt" and path.parent.resolve() == self.directory.resolve()
+
+    async def _watch(self) -> None:
+        from watchfiles import awatch
+
+        try:
+            async for changes in awatch(
+                self.directory,
+                debounce=self.debounce_ms,
+                stop_event=self._stop_event,
+                recursive=False,
+            ):
+                # В пачке важно только итоговое состояние файла
+                paths = {
+                    Path(path).name: Path(path)
+                    for _, path in changes
+                    if self._is_document(Path(path))
+                }
+                for filename, path in sorted(paths.items()):
+                    self.files.setdefault(filename, {})["state"] = "queued"
+                    task = asyncio.create_task(self._sync_file(filename, path))
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+        except Exception as e:
+            logger.error(
+                f"Наблюдение за каталогом документов остановлено из-за ошибки: {e}",
+                exc_info=True,
+            )
+
+    async def _sync_file(self, filename: str, path: Path) -> None:
+        # События одного файла обрабатываются по порядку
+        lock = self._file_locks.setdefault(filename, asyncio.Lock())
+        async with lock, self._slots:
+            status = self.files.setdefault(filename, {})
+            status["state"] = "indexing"
+            try:
+                with background_priority():
+                    if path.exists():
+                        await self._upsert(filename, path, status)
+                    else:
+                        await self._delete(filename, status)
+                status.pop("error", None)
+            except Exception as e:
+                logger.error(
+                    f"При обработке изменения файла {filename} произошла ошибка: {e}",
+                    exc_info=True,
+                )
+                status.update(state="failed", error=str(e))
+            status["updated_at"] = datetime.now().isoformat(timespec="seconds")
+
+    async def _upsert(self, filename: str, path: Path, status: dict[str, Any]) -> None:
+        content = await asyncio.to_thread(path.read_text, encoding="utf-8")
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if self._hashes.get(filename) == content_hash:
+            status["state"] = "unchanged"
+            return
+        if not await self.rag_service.add_document(content, filename):
+            raise RuntimeError("Не удалось добавить документ в векторное хранилище")
+        self._hashes[filename] = content_hash
+        chunks, _, _ = self.rag_service.split_document(content, filename)
+        status.update(state="indexed", chunks=len(chunks))
+        logger.info(f"Документ {filename} обновлен из каталога документов")
+
+    async def _delete(self, filename: str, status: dict[str, Any]) -> None:
+        deleted = await self.rag_service.delete_document(filename)
+        self._hashes.pop(filename, None)
+        status.update(state="deleted", chunks=0, deleted_chunks=deleted)
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Any, Optional
+import hashlib
+import json
+import logging
+
+from app.services.retrieval.retriever import RetrievalStrategy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ExperimentArm:
+    """Вариант эксперимента
+
+    strategy — стратегия поиска (None — обычный поиск хранилища), collection —
+    коллекция с другим разбиением на чанки (chunk_size, chunk_overlap; по умолчанию
+    текущие), context_chunks — число чанков в контексте, prompt_variant — шаблон
+    промпта LLM-сервиса
+    """
+
+    name: str
+    weight: float = 1.0
+    strategy: Optional[RetrievalStrategy] = None
+    collection: Optional[str] = None
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    context_chunks: Optional[int] = None
+    prompt_variant: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, config: dict[str, Any]) -> "ExperimentArm":
+        retrieval = config.get("retrieval")
+        return cls(
+            name=config["name"],
+            weight=config.get("weight", 1.0),
+            strategy=(
+                RetrievalStrategy(**{"name": config["name"], **retrieval})
+                if retrieval
+                else None
+            ),
+            collection=config.get("collection"),
+            chunk_size=config.get("chunk_size"),
+            chunk_overlap=config.get("chunk_overlap"),
+            context_chunks=config.get("context_chunks"),
+            prompt_variant=config.get("prompt_variant"),
+        )
+
+
+class Experiment:
+    """Детерминированное распределение запросов по вариантам пропорционально весам
+
+    Один и тот же ключ (клиент или текст вопроса) всегда попадает в один вариант,
+    у разных экспериментов распределения независимы
+    """
+
+    def __init__(self, name: str, arms: list[ExperimentArm]):
+        if not arms or any(arm.weight <= 0 for arm in arms):
+            raise ValueError(f"Эксперимент {name}: нужен хотя бы один вариант с весом > 0")
+        self.name = name
+        self.arms = arms
+        self.bounds = list(accumulate(arm.weight for arm in arms))
+
+    @classmethod
+    def from_file(cls, path: str) -> "Experiment":
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        experiment = cls(
+            config["name"], [ExperimentArm.from_dict(arm) for arm in config["arms"]]
+        )
+        logger.info(
+            f"Эксперимент {experiment.name}: варианты "
+            f"{[(arm.name, arm.weight) for arm in experiment.arms]}"
+        )
+        return experiment
+
+    def assign(self, key: str) -> ExperimentArm:
+        digest = hashlib.sha256(f"{self.name}:{key}".encode("utf-8")).digest()
+        point = int.from_bytes(digest[:8], "big") / 2**64 * self.bounds[-1]
+        for arm, bound in zip(self.arms, self.bounds):
+            if point < bound:
+                return arm
+        return self.arms[-1]
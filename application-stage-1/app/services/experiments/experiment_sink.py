@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Any
+import asyncio
+import logging
+import threading
+import time
+
+from app.services.cache.sqlite_cache import open_sqlite
+from app.services.tracing import STAGES, QueryTrace, rounded
+
+logger = logging.getLogger(__name__)
+
+
+class ExperimentSink:
+    """Журнал запросов эксперимента в локальном файле SQLite
+
+    По строке на запрос: вариант, время этапов, токены, уверенность, попадания
+    в кэши. База в режиме WAL, поэтому журнал общий для всех воркеров
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = open_sqlite(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS experiment_queries ("
+            "ts REAL NOT NULL, experiment TEXT NOT NULL, arm TEXT NOT NULL, "
+            "total_ms REAL NOT NULL, embedding_ms REAL, search_ms REAL, generation_ms REAL, "
+            "prompt_tokens INTEGER, completion_tokens INTEGER, confidence REAL, "
+            "answer_cache_hit INTEGER, embedding_cache_hit INTEGER, error INTEGER)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS experiment_queries_arm "
+            "ON experiment_queries (experiment, arm)"
+        )
+
+    def record(
+        self,
+        experiment: str,
+        arm: str,
+        total_ms: float,
+        confidence: float,
+        trace: QueryTrace,
+    ) -> None:
+        row = (
+            time.time(),
+            experiment,
+            arm,
+            total_ms,
+            *(trace.stages.get(stage) for stage in STAGES),
+            trace.prompt_tokens,
+            trace.completion_tokens,
+            confidence,
+            "answer" in trace.cache_hits,
+            "embedding" in trace.cache_hits,
+            trace.error,
+        )
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO experiment_queries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+
+    async def arecord(self, *args: Any, **kwargs: Any) -> None:
+        try:
+            await asyncio.to_thread(self.record, *args, **kwargs)
+        except Exception as e:
+            # Журнал эксперимента не должен влиять на ответ пользователю
+            logger.warning(f"Не удалось записать результат эксперимента: {e!r}")
+
+    def summary(self, experiment: str) -> list[dict[str, Any]]:
+        """Сводка по вариантам: задержки, токены, уверенность, доли попаданий в кэш и ошибок"""
+        with self._lock:
+            arms = self._connection.execute(
+                "SELECT arm, COUNT(*), AVG(total_ms), AVG(embedding_ms), AVG(search_ms), "
+                "AVG(generation_ms), AVG(prompt_tokens), AVG(completion_tokens), "
+                "AVG(confidence), AVG(answer_cache_hit), AVG(embedding_cache_hit), AVG(error) "
+                "FROM experiment_queries WHERE experiment = ? GROUP BY arm ORDER BY arm",
+                [experiment],
+            ).fetchall()
+            latencies = {
+                arm: [
+                    value
+                    for (value,) in self._connection.execute(
+                        "SELECT total_ms FROM experiment_queries "
+                        "WHERE experiment = ? AND arm = ? ORDER BY total_ms",
+                        [experiment, arm],
+                    )
+                ]
+                for arm, *_ in arms
+            }
+
+        summary = []
+        for arm, count, *averages in arms:
+            values = latencies[arm]
+            summary.append(
+                {
+                    "arm": arm,
+                    "queries": count,
+                    "latency_ms": {
+                        "mean": rounded(averages[0], 1),
+                        "p50": rounded(values[int(len(values) * 0.5)], 1),
+                        "p95": rounded(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+                        **{
+                            stage: rounded(value, 1)
+                            for stage, value in zip(STAGES, averages[1:4])
+                        },
+                    },
+                    "prompt_tokens": rounded(averages[4], 1),
+                    "completion_tokens": rounded(averages[5], 1),
+                    "confidence": rounded(averages[6]),
+                    "answer_cache_hit_rate": rounded(averages[7]),
+                    "embedding_cache_hit_rate": rounded(averages[8]),
+                    "error_rate": rounded(averages[9]),
+                }
+            )
+        return summary
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -2,7 +2,6 @@ from typing import Any, Optional
 import logging
 
 from app.services.base.embedding_service_base import EmbeddingServiceBase
-from app.services.gigachat.gigachat_embedding_service import GigaChatEmbeddingService
 
 logger = logging.getLogger(__name__)
 
@@ -27,25 +26,22 @@ class EmbeddingServiceFactory:
 
         if not service_config:
             available_types = list(available_services.keys())
-            logger.error(
-                f"Embedding сервис не поддерживается: {api_provider}, доступные сервисы: {available_types}"
-            )
-            raise
+            message = f"Embedding сервис не поддерживается: {api_provider}, доступные сервисы: {available_types}"
+            logger.error(message)
+            raise ValueError(message)
 
         if service_config.get("requires_api_key", False) and not api_key:
-            logger.error(
-                f"Для работы Embedding сервиса {service_config['name']} необходим API ключ"
-            )
-            raise
+            message = f"Для работы Embedding сервиса {service_config['name']} необходим API ключ"
+            logger.error(message)
+            raise ValueError(message)
 
         if not EmbeddingServiceFactory._check_model_availability(
             api_provider, model, available_services
         ):
             available_models = service_config.get("models", [])
-            logger.error(
-                f"Модель '{model}' не поддерживается для Embedding сервиса '{api_provider}', доступные модели: {available_models}"
-            )
-            raise
+            message = f"Модель '{model}' не поддерживается для Embedding сервиса '{api_provider}', доступные модели: {available_models}"
+            logger.error(message)
+            raise ValueError(message)
 
         default_model = service_config["models"][0]
         actual_model = model or default_model
@@ -54,21 +50,42 @@ class EmbeddingServiceFactory:
         )
         if api_provider == "gigachat":
             if not api_key:
-                logger.error("Для работы Embedding сервиса GigaChat необходим API ключ")
-                raise
+                message = "Для работы Embedding сервиса GigaChat необходим API ключ"
+                logger.error(message)
+                raise ValueError(message)
+            from app.services.gigachat.gigachat_embedding_service import (
+                GigaChatEmbeddingService,
+            )
+
             return GigaChatEmbeddingService(
                 api_key=api_key,
                 model=actual_model,
                 ca_bundle_file=ca_bundle_file,
                 verify_ssl_certs=verify_ssl_certs,
-                **kwargs,
+                upstream_lane=kwargs.get("upstream_lane"),
+                resilience=kwargs.get("resilience"),
+                session=kwargs.get("session"),
+            )
+        elif api_provider == "local":
+            from app.services.local.local_embedding_service import LocalEmbeddingService
+
+            return LocalEmbeddingService(
+                model=actual_model,
+                model_path=kwargs.get("local_model_path"),
+                max_length=kwargs.get("local_max_length", 512),
+                threads=kwargs.get("local_threads", 0),
+                int8=kwargs.get("local_int8", False),
+                max_batch_size=kwargs.get("local_max_batch_size", 32),
+                batch_wait_ms=kwargs.get("local_batch_wait_ms", 0.0),
+                query_prefix=kwargs.get("local_query_prefix", ""),
+                document_prefix=kwargs.get("local_document_prefix", ""),
+                hashing_dimension=kwargs.get("local_hashing_dimension", 1024),
             )
         else:
             available_types = list(available_services.keys())
-            logger.error(
-                f"Embedding сервис не поддерживается: {api_provider}, доступные сервисы: {available_types}"
-            )
-            raise
+            message = f"Embedding сервис не поддерживается: {api_provider}, доступные сервисы: {available_types}"
+            logger.error(message)
+            raise ValueError(message)
 
     @staticmethod
     def get_available_services() -> dict[str, dict[str, Any]]:
@@ -78,6 +95,11 @@ class EmbeddingServiceFactory:
                 "models": ["Embeddings", "EmbeddingsGigaR"],
                 "requires_api_key": True,
             },
+            "local": {
+                "name": "Local (ONNX / hashing)",
+                "models": ["onnx", "hashing"],
+                "requires_api_key": False,
+            },
         }
 
     @staticmethod
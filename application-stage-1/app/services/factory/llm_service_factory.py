@@ -2,7 +2,6 @@ from typing import Any, Optional
 import logging
 
 from app.services.base.llm_service_base import LLMServiceBase
-from app.services.gigachat.gigachat_llm_service import GigaChatLLMService
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +55,8 @@ class LLMServiceFactory:
             if not api_key:
                 logger.error("Для работы LLM сервиса GigaChat необходим API ключ")
                 raise
+            from app.services.gigachat.gigachat_llm_service import GigaChatLLMService
+
             return GigaChatLLMService(
                 api_key=api_key,
                 model=actual_model,
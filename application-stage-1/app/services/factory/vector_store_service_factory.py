@@ -0,0 +1,83 @@
+from typing import Any
+import logging
+
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreServiceFactory:
+    """Фабрика для создания векторных хранилищ"""
+
+    @staticmethod
+    def create_service(
+        provider: str,
+        collection_name: str,
+        embedding_service: EmbeddingServiceBase,
+        **kwargs,
+    ) -> VectorStoreServiceBase:
+        provider = provider.lower()
+
+        available_services = VectorStoreServiceFactory.get_available_services()
+        service_config = available_services.get(provider)
+
+        if not service_config:
+            available_types = list(available_services.keys())
+            logger.error(
+                f"Векторное хранилище не поддерживается: {provider}, доступные хранилища: {available_types}"
+            )
+            raise ValueError(f"Векторное хранилище не поддерживается: {provider}")
+
+        if provider == "chroma" and kwargs.get("quantization", "none") != "none":
+            logger.warning(
+                "Квантование поддерживается только встроенным хранилищем, для ChromaDB параметр игнорируется"
+            )
+
+        logger.info(
+            f"Создание векторного хранилища {service_config['name']} с коллекцией: {collection_name}"
+        )
+        # Модули хранилищ импортируются только для выбранного провайдера:
+        # chromadb и langchain_chroma заметно увеличивают время запуска и память
+        if provider == "chroma":
+            from app.services.chroma_db_service import ChromaDBService
+
+            return ChromaDBService(
+                chroma_db_host=kwargs["chroma_db_host"],
+                chroma_db_port=kwargs["chroma_db_port"],
+                chroma_db_collection_name=collection_name,
+                embedding_service=embedding_service,
+                alias_ttl=kwargs.get("alias_ttl", 5.0),
+            )
+        else:
+            from app.services.in_memory.in_memory_vector_store_service import (
+                InMemoryVectorStoreService,
+            )
+
+            return InMemoryVectorStoreService(
+                collection_name=collection_name,
+                embedding_service=embedding_service,
+                persist_directory=kwargs.get("persist_directory"),
+                dtype=kwargs.get("dtype", "float32"),
+                hnsw_threshold=kwargs.get("hnsw_threshold", 0),
+                quantization=kwargs.get("quantization", "none"),
+                pq_subvectors=kwargs.get("pq_subvectors", 64),
+                rescore_factor=kwargs.get("rescore_factor", 10),
+                checkpoint_interval=kwargs.get("checkpoint_interval", 30.0),
+            )
+
+    @staticmethod
+    def get_available_services() -> dict[str, dict[str, Any]]:
+        return {
+            "chroma": {
+                "name": "ChromaDB",
+                "requires_server": True,
+            },
+            "in_memory": {
+                "name": "In-memory (numpy)",
+                "requires_server": False,
+            },
+        }
+
+
+create_vector_store_service = VectorStoreServiceFactory.create_service
@@ -1,9 +1,14 @@
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
 import logging
 
 from langchain_gigachat.embeddings import GigaChatEmbeddings
+from langchain_gigachat.embeddings.gigachat import MAX_BATCH_SIZE_PARTS
 
 from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.resilience import ResilientCaller
+from app.services.gigachat.gigachat_session import GigaChatSession
+from app.services.upstream_scheduler import UpstreamLane
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +29,13 @@ class GigaChatEmbeddingService(EmbeddingServiceBase):
         verify_ssl_certs: bool = False,
         scope: str = "GIGACHAT_API_PERS",
         timeout: float = 10.0,
+        upstream_lane: Optional[UpstreamLane] = None,
+        resilience: Optional[ResilientCaller] = None,
+        session: Optional[GigaChatSession] = None,
     ):
         self.model = model
+        self.upstream_lane = upstream_lane
+        self.resilience = resilience
         self.verify_ssl_certs = verify_ssl_certs
         self.scope = scope
         self.timeout = timeout
@@ -48,6 +58,9 @@ class GigaChatEmbeddingService(EmbeddingServiceBase):
                 timeout=self.timeout,
                 prefix_query=""
             )
+            if session:
+                # Общие с другими сервисами пул соединений и токен, модель передается в запросе
+                self.client.__dict__["_client"] = session.attach(self.timeout)
         except Exception as e:
             logger.error(
                 f"При инициализации Embedding сервиса GigaChat произошла ошибка: {e}",
@@ -55,9 +68,41 @@ class GigaChatEmbeddingService(EmbeddingServiceBase):
             )
             raise
 
+    async def _call(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Вызов API через очередь планировщика и слой повторов, если они заданы"""
+
+        if self.resilience:
+            return await self.resilience.call(call, self.upstream_lane)
+        if self.upstream_lane:
+            return await self.upstream_lane.run(call)
+        return await call()
+
+    async def embed_query(self, text: str) -> list[float]:
+        return await self._call(lambda: self.client.aembed_query(text))
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Запросы векторизуются как документы, с префиксом запроса, если он включен"""
+        if self.client.use_prefix_query:
+            texts = [self.client.prefix_query + text for text in texts]
+        return await self.embed_documents(texts)
+
+    async def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Пачки по MAX_BATCH_SIZE_PARTS текстов — по одному запросу к API на пачку"""
+        batches = [
+            texts[start : start + MAX_BATCH_SIZE_PARTS]
+            for start in range(0, len(texts), MAX_BATCH_SIZE_PARTS)
+        ]
+        results = await asyncio.gather(
+            *(
+                self._call(lambda batch=batch: self.client.aembed_documents(batch))
+                for batch in batches
+            )
+        )
+        return [embedding for result in results for embedding in result]
+
     async def health_check(self) -> bool:
         try:
-            embedding = await self.client.aembed_query("Проверка")
+            embedding = await self.embed_query("Проверка")
             return bool(embedding) and len(embedding) > 0
         except Exception as e:
             logger.error(f"При проверке работоспособности Embedding сервиса GigaChat произошла ошибка: {e}")
@@ -1,10 +1,18 @@
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 import logging
 
 from langchain_gigachat import GigaChat
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
 from app.services.base.llm_service_base import LLMServiceBase
+from app.services.resilience import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+)
+from app.services.gigachat.gigachat_session import GigaChatSession
+from app.services.tracing import record_token_usage
+from app.services.upstream_scheduler import UpstreamLane
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +20,32 @@ logger = logging.getLogger(__name__)
 class GigaChatLLMService(LLMServiceBase):
     """Сервис для работы с GigaChat API через Langchain"""
 
+    DEFAULT_SYSTEM_PROMPT = "Ты - помощник студентов Уральского Федерального университета. Отвечай кратко и по делу на русском языке."
+    SYSTEM_PROMPTS = {
+        "academic": "Ты - помощник студентов УрФУ по учебным вопросам: расписание, сессия, экзамены. Отвечай кратко на русском языке.",
+        "administrative": "Ты - помощник студентов УрФУ по административным вопросам: справки, стипендии, общежитие, контакты. Отвечай кратко на русском языке.",
+    }
+    PROMPT_VARIANTS = {
+        "default": """
+Контекст из документов университета:
+{context}
+
+Вопрос студента: {prompt}
+
+Ответь на вопрос, используя только информацию из предоставленного контекста. 
+Если информации недостаточно, скажи о том, что не обладаешь такой информацией и что студенту необходимо связаться с представителем университета напрямую.
+""",
+        "concise": """
+Контекст из документов университета:
+{context}
+
+Вопрос студента: {prompt}
+
+Ответь одним-двумя предложениями, используя только информацию из контекста.
+Если ответа в контексте нет, посоветуй связаться с представителем университета.
+""",
+    }
+
     def __init__(
         self,
         api_key: Optional[str],
@@ -20,8 +54,13 @@ class GigaChatLLMService(LLMServiceBase):
         verify_ssl_certs: bool = False,
         scope: str = "GIGACHAT_API_PERS",
         timeout: float = 10.0,
+        upstream_lane: Optional[UpstreamLane] = None,
+        resilience: Optional[ResilientCaller] = None,
+        session: Optional[GigaChatSession] = None,
     ):
         self.model = model
+        self.upstream_lane = upstream_lane
+        self.resilience = resilience
         self.verify_ssl_certs = verify_ssl_certs
         self.scope = scope
         self.timeout = timeout
@@ -37,6 +76,9 @@ class GigaChatLLMService(LLMServiceBase):
                 scope=self.scope,
                 timeout=self.timeout,
             )
+            if session:
+                # Общие с другими сервисами пул соединений и токен, модель передается в запросе
+                self.client.__dict__["_client"] = session.attach(self.timeout)
         except Exception as e:
             logger.error(
                 f"При инициализации LLM сервиса GigaChat произошла ошибка: {e}",
@@ -44,36 +86,66 @@ class GigaChatLLMService(LLMServiceBase):
             )
             raise
 
+    async def _call(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Вызов API через очередь планировщика и слой повторов, если они заданы"""
+
+        if self.resilience:
+            return await self.resilience.call(call, self.upstream_lane)
+        if self.upstream_lane:
+            return await self.upstream_lane.run(call)
+        return await call()
+
     async def generate_response(
-        self, prompt: str, context: str
+        self,
+        prompt: str,
+        context: str,
+        query_class: Optional[str] = None,
+        prompt_variant: Optional[str] = None,
+        history: Optional[list[tuple[str, str]]] = None,
     ) -> str | list[str | dict]:
-        """Генерация ответа через GigaChat с использованием Langchain"""
-        full_prompt = self._create_prompt(prompt, context)
+        """Генерация ответа через GigaChat с использованием Langchain
 
-        messages = [
+        История диалога передается короткими репликами без контекста прошлых ходов
+        """
+        full_prompt = self._create_prompt(prompt, context, prompt_variant)
+
+        messages: list[BaseMessage] = [
             SystemMessage(
-                content="Ты - помощник студентов Уральского Федерального университета. Отвечай кратко и по делу на русском языке."
-            ),
-            HumanMessage(content=full_prompt),
+                content=self.SYSTEM_PROMPTS.get(
+                    query_class or "", self.DEFAULT_SYSTEM_PROMPT
+                )
+            )
         ]
+        for question, answer in history or []:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        messages.append(HumanMessage(content=full_prompt))
 
         try:
-            response = await self.client.ainvoke(
-                messages, max_tokens=500, temperature=0.7
+            response = await self._call(
+                lambda: self.client.ainvoke(
+                    messages, model=self.model, max_tokens=500, temperature=0.7
+                )
             )
+            usage = getattr(response, "usage_metadata", None)
+            if usage:
+                record_token_usage(usage["input_tokens"], usage["output_tokens"])
             if hasattr(response, "content"):
                 return response.content
             else:
                 logger.error(f"Неверный формат ответа от API: {response}")
                 return "При обработке ответа произошла ошибка"
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            logger.warning(f"Вызов LLM сервиса GigaChat не выполнен: {e}")
+            return self.UNAVAILABLE_ANSWER
         except Exception as e:
-            logger.error(f"Произошла ошибка в LLM сервисе GigaChat: {e}")
-            return "Сервис временно недоступен"
+            logger.error(f"Произошла ошибка в LLM сервисе GigaChat: {e!r}")
+            return self.UNAVAILABLE_ANSWER
 
     async def health_check(self) -> bool:
         """Проверка доступности GigaChat API через Langchain"""
         try:
-            await self.client.ainvoke("Привет")
+            await self._call(lambda: self.client.ainvoke("Привет", model=self.model))
             return True
         except Exception as e:
             logger.error(
@@ -81,14 +153,9 @@ class GigaChatLLMService(LLMServiceBase):
             )
             return False
 
-    def _create_prompt(self, prompt: str, context: str) -> str:
-        """Создание промпта с контекстом"""
-        return f"""
-Контекст из документов университета:
-{context}
-
-Вопрос студента: {prompt}
-
-Ответь на вопрос, используя только информацию из предоставленного контекста. 
-Если информации недостаточно, скажи о том, что не обладаешь такой информацией и что студенту необходимо связаться с представителем университета напрямую.
-"""
+    def _create_prompt(
+        self, prompt: str, context: str, variant: Optional[str] = None
+    ) -> str:
+        """Создание промпта с контекстом по шаблону варианта"""
+        template = self.PROMPT_VARIANTS.get(variant or "", self.PROMPT_VARIANTS["default"])
+        return template.format(context=context, prompt=prompt)
@@ -0,0 +1,113 @@
+from typing import Optional
+import asyncio
+import importlib.util
+import logging
+import time
+
+import gigachat
+import httpx
+from gigachat.client import _get_kwargs
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RETRY_DELAY = 5.0
+
+
+class GigaChatSession:
+    """Общее подключение к GigaChat API для всех сервисов с одним ключом
+
+    Один пул keep-alive соединений (HTTP/2, если установлен пакет h2) и один
+    OAuth-токен. Токен обновляется в фоне за token_refresh_margin секунд до
+    истечения, поэтому запросы не ждут повторной авторизации. Модель в настройках
+    общего клиента не задается: каждый сервис передает свою модель в запросе.
+    """
+
+    def __init__(
+        self,
+        credentials: str,
+        scope: str = "GIGACHAT_API_PERS",
+        ca_bundle_file: Optional[str] = None,
+        verify_ssl_certs: bool = False,
+        timeout: float = 10.0,
+        max_connections: int = 16,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 60.0,
+        http2: bool = False,
+        token_refresh_margin: float = 60.0,
+    ):
+        self.scope = scope
+        self.token_refresh_margin = token_refresh_margin
+        self.client = gigachat.GigaChat(
+            credentials=credentials,
+            scope=scope,
+            ca_bundle_file=ca_bundle_file,
+            verify_ssl_certs=verify_ssl_certs if ca_bundle_file is None else True,
+            timeout=timeout,
+        )
+
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("Пакет h2 не установлен, подключение к GigaChat будет по HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        # Клиент SDK еще не открывал соединений, его можно просто заменить
+        self.client._aclient = httpx.AsyncClient(
+            **{
+                **_get_kwargs(self.client._settings),
+                "limits": httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                "http2": http2,
+            }
+        )
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._token_lock = asyncio.Lock()
+
+    def attach(self, timeout: float) -> gigachat.GigaChat:
+        """Общий клиент SDK для сервиса с таймаутом timeout
+
+        Таймаут пула соединений — наибольший из таймаутов подключенных сервисов
+        """
+        if timeout > self.client._settings.timeout:
+            self.client._settings.timeout = timeout
+            self.client._aclient.timeout = httpx.Timeout(timeout)
+        return self.client
+
+    async def start(self) -> None:
+        """Получение токена и запуск его фонового обновления"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        await self.client.aclose()
+
+    async def refresh_token(self) -> None:
+        """Получение нового токена; старый действует, пока новый не получен"""
+        async with self._token_lock:
+            await self.client._aupdate_token()
+        logger.info(
+            f"Токен GigaChat обновлен, следующее обновление через {self._seconds_until_refresh():.0f} с"
+        )
+
+    def _seconds_until_refresh(self) -> float:
+        token = self.client._access_token
+        if token is None or not token.expires_at:
+            return 0.0
+        # expires_at приходит в миллисекундах
+        return max(0.0, token.expires_at / 1000 - time.time() - self.token_refresh_margin)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._seconds_until_refresh())
+            try:
+                await self.refresh_token()
+            except Exception as e:
+                logger.warning(
+                    f"Не удалось обновить токен GigaChat: {e!r}, повтор через {TOKEN_RETRY_DELAY} с"
+                )
+                await asyncio.sleep(TOKEN_RETRY_DELAY)
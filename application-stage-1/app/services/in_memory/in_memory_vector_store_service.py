@@ -0,0 +1,508 @@
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.in_memory.vector_index import VectorIndex
+from app.services.tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+ALIAS_FILE_SUFFIX = ".alias.json"
+
+
+class InMemoryGeneration(NamedTuple):
+    """Поколение коллекции: основной индекс и разделы"""
+
+    name: str
+    directory: Optional[Path]
+    index: VectorIndex
+    partitions: dict[str, VectorIndex]
+
+
+class InMemoryVectorStoreService(VectorStoreServiceBase):
+    """Встроенное векторное хранилище на numpy (без сетевых обращений)
+
+    Как и ChromaDBService, обслуживает запросы из активного поколения коллекции,
+    переключаемого через create_shadow / promote / rollback. Изменения пишутся
+    на диск контрольной точкой не позже чем через checkpoint_interval секунд
+    после первого несохраненного изменения (0 — после каждого изменения), а
+    также при flush и close. При сбое теряются изменения с последней точки:
+    документы из каталога загружаются заново при следующем запуске, а
+    загруженные через API сохраняются через flush до ответа.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_service: EmbeddingServiceBase,
+        persist_directory: Optional[str] = None,
+        dtype: str = "float32",
+        hnsw_threshold: int = 0,
+        quantization: str = "none",
+        pq_subvectors: int = 64,
+        rescore_factor: int = 10,
+        checkpoint_interval: float = 30.0,
+        generation_name: Optional[str] = None,
+    ):
+        self.embedding_service = embedding_service
+        embedding_service_info = self.embedding_service.get_service_info()
+
+        self.collection_name = collection_name
+        self.dtype = dtype
+        self.hnsw_threshold = hnsw_threshold
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.rescore_factor = rescore_factor
+        self.checkpoint_interval = checkpoint_interval
+        self._unsaved: set[VectorIndex] = set()
+        self._checkpoint_timer: Optional[threading.Timer] = None
+        self._checkpoint_lock = threading.Lock()
+        self.collection_metadata = {
+            "description": "Коллекция документов УрФУ",
+            "embedding_service": embedding_service_info.get("service", "Unknown"),
+            "embedding_model": embedding_service_info.get("model", "Unknown"),
+            "backend": "in_memory",
+            "dtype": dtype,
+            "quantization": quantization,
+        }
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+
+        self.previous: Optional[InMemoryGeneration] = None
+        if generation_name:
+            self.active = self._open_generation(generation_name)
+        else:
+            alias = self._load_alias()
+            self.active = self._open_generation(alias.get("active", collection_name))
+            if alias.get("previous"):
+                self.previous = self._open_generation(alias["previous"])
+        logger.info(
+            f"Инициализировано встроенное хранилище '{collection_name}' (поколение {self.active.name}) с количеством документов: {len(self.index)}, разделов: {len(self.partitions)}."
+        )
+
+    @property
+    def index(self) -> VectorIndex:
+        return self.active.index
+
+    @property
+    def partitions(self) -> dict[str, VectorIndex]:
+        return self.active.partitions
+
+    @property
+    def directory(self) -> Optional[Path]:
+        return self.active.directory
+
+    def _create_index(self, name: str, directory: Optional[Path]) -> VectorIndex:
+        return VectorIndex(
+            name=name,
+            dtype=self.dtype,
+            directory=directory,
+            hnsw_threshold=self.hnsw_threshold,
+            quantization=self.quantization,
+            pq_subvectors=self.pq_subvectors,
+            rescore_factor=self.rescore_factor,
+        )
+
+    def _partition_directory(self, partition: str) -> Optional[Path]:
+        if not self.directory:
+            return None
+        slug = re.sub(r"[^a-z0-9]+", "-", partition.lower()).strip("-")
+        if not slug or not partition.isascii():
+            slug = hashlib.sha1(partition.encode("utf-8")).hexdigest()[:12]
+        return self.directory / "partitions" / slug
+
+    def _load_partitions(self, directory: Optional[Path]) -> dict[str, VectorIndex]:
+        partitions = {}
+        if not directory or not (directory / "partitions").exists():
+            return partitions
+        for partition_directory in (directory / "partitions").iterdir():
+            if (partition_directory / VectorIndex.INDEX_FILE).exists():
+                index = self._create_index(partition_directory.name, partition_directory)
+                partitions[index.name] = index
+        return partitions
+
+    def _open_generation(self, name: str) -> InMemoryGeneration:
+        directory = self.persist_directory / name if self.persist_directory else None
+        return InMemoryGeneration(
+            name=name,
+            directory=directory,
+            index=self._create_index(name, directory),
+            partitions=self._load_partitions(directory),
+        )
+
+    def _alias_path(self) -> Optional[Path]:
+        if not self.persist_directory:
+            return None
+        return self.persist_directory / f"{self.collection_name}{ALIAS_FILE_SUFFIX}"
+
+    def _load_alias(self) -> dict[str, Any]:
+        alias_path = self._alias_path()
+        if not alias_path or not alias_path.exists():
+            return {}
+        with open(alias_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_alias(self) -> None:
+        alias_path = self._alias_path()
+        if not alias_path:
+            return
+        alias = {"active": self.active.name}
+        if self.previous:
+            alias["previous"] = self.previous.name
+        temporary_path = alias_path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(alias, f, ensure_ascii=False)
+        os.replace(temporary_path, alias_path)
+
+    def _drop_generation(self, name: str) -> None:
+        if self.persist_directory:
+            logger.info(f"Удаление поколения {name}")
+            shutil.rmtree(self.persist_directory / name, ignore_errors=True)
+
+    def create_shadow(self) -> "InMemoryVectorStoreService":
+        """Создание пустого теневого поколения для пересборки"""
+        pattern = re.compile(rf"^{re.escape(self.collection_name)}\.g(\d+)$")
+        keep = {self.active.name, *([self.previous.name] if self.previous else [])}
+        names = set(keep)
+        if self.persist_directory and self.persist_directory.exists():
+            names.update(path.name for path in self.persist_directory.iterdir())
+        generations = [int(m.group(1)) for m in map(pattern.match, names) if m]
+        for stale in {f"{self.collection_name}.g{number}" for number in generations} - keep:
+            self._drop_generation(stale)
+
+        generation_name = f"{self.collection_name}.g{max(generations, default=0) + 1}"
+        logger.info(f"Создание теневого поколения {generation_name}")
+        return InMemoryVectorStoreService(
+            collection_name=self.collection_name,
+            embedding_service=self.embedding_service,
+            persist_directory=str(self.persist_directory) if self.persist_directory else None,
+            dtype=self.dtype,
+            hnsw_threshold=self.hnsw_threshold,
+            quantization=self.quantization,
+            pq_subvectors=self.pq_subvectors,
+            rescore_factor=self.rescore_factor,
+            checkpoint_interval=self.checkpoint_interval,
+            generation_name=generation_name,
+        )
+
+    def promote(self, shadow: VectorStoreServiceBase) -> None:
+        """Переключение запросов на теневое поколение одной заменой ссылки"""
+        if (
+            not isinstance(shadow, InMemoryVectorStoreService)
+            or shadow.collection_name != self.collection_name
+        ):
+            raise ValueError(f"Поколение не относится к коллекции '{self.collection_name}'")
+        dropped = self.previous
+        self.previous, self.active = self.active, shadow.active
+        self._save_alias()
+        logger.info(
+            f"Коллекция '{self.collection_name}' переключена на поколение {self.active.name}, "
+            f"для отката сохранено {self.previous.name}"
+        )
+        if dropped and dropped.name not in (self.active.name, self.previous.name):
+            self._drop_generation(dropped.name)
+
+    def rollback(self) -> bool:
+        """Возврат к предыдущему поколению"""
+        if not self.previous:
+            logger.warning(f"Для коллекции '{self.collection_name}' нет поколения для отката")
+            return False
+        self.previous, self.active = self.active, self.previous
+        self._save_alias()
+        logger.info(
+            f"Коллекция '{self.collection_name}' возвращена к поколению {self.active.name}"
+        )
+        return True
+
+    def _get_index(self, partition: Optional[str] = None) -> VectorIndex:
+        if not partition:
+            return self.index
+        if partition not in self.partitions:
+            logger.info(f"Создание раздела коллекции для '{partition}'")
+            self.partitions[partition] = self._create_index(
+                partition, self._partition_directory(partition)
+            )
+        return self.partitions[partition]
+
+    async def add_documents(
+        self,
+        documents: list[str],
+        ids: list[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        partition: Optional[str] = None,
+    ) -> bool:
+        """Добавление документов во встроенное хранилище"""
+        if not documents:
+            logger.warning("Нет документов для добавления")
+            return True
+        try:
+            logger.info(
+                f"Добавление документов ({len(documents)}) с ID: {ids[:3]}{'...' if len(ids) > 3 else ''}"
+            )
+            with trace_stage("embedding"):
+                embeddings = await self.embedding_service.embed_documents(documents)
+            index = self._get_index(partition)
+            with trace_stage("upsert"):
+                await asyncio.to_thread(
+                    self._upsert_and_save,
+                    index,
+                    ids,
+                    documents,
+                    metadatas or [{} for _ in documents],
+                    np.asarray(embeddings, dtype=np.float32),
+                )
+            logger.info(f"Документы ({len(documents)}) успешно добавлены в коллекцию")
+            return True
+        except Exception as e:
+            logger.error(
+                f"При добавлении документов в коллецию произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return False
+
+    def _upsert_and_save(
+        self,
+        index: VectorIndex,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: np.ndarray,
+    ) -> None:
+        index.upsert(ids, documents, metadatas, embeddings)
+        self._schedule_checkpoint(index)
+
+    def _schedule_checkpoint(self, index: VectorIndex) -> None:
+        """Сохранение индекса ближайшей контрольной точкой"""
+        if not index.directory:
+            return
+        if self.checkpoint_interval <= 0:
+            index.save()
+            return
+        with self._checkpoint_lock:
+            self._unsaved.add(index)
+            if self._checkpoint_timer is None:
+                self._checkpoint_timer = threading.Timer(
+                    self.checkpoint_interval, self._checkpoint
+                )
+                self._checkpoint_timer.daemon = True
+                self._checkpoint_timer.start()
+
+    def _checkpoint(self) -> None:
+        with self._checkpoint_lock:
+            indexes, self._unsaved = self._unsaved, set()
+            self._checkpoint_timer = None
+        for index in indexes:
+            try:
+                if index.dirty:
+                    index.save()
+            except Exception as e:
+                logger.error(
+                    f"Не удалось сохранить индекс {index.name}: {e}", exc_info=True
+                )
+                self._schedule_checkpoint(index)
+
+    async def search_by_vector(
+        self,
+        embedding: list[float],
+        limit: int = 4,
+        where: Optional[dict[str, Any]] = None,
+        partitions: Optional[list[str]] = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск похожих документов во встроенном хранилище"""
+        try:
+            active = self.active
+            if partitions:
+                indexes = [
+                    active.partitions[partition]
+                    for partition in partitions
+                    if partition in active.partitions
+                ]
+                if not indexes:
+                    logger.warning(f"Разделы {partitions} не найдены")
+                    return []
+            else:
+                indexes = [active.index]
+
+            query = np.asarray(embedding, dtype=np.float32)
+            index_results = await asyncio.gather(
+                *(
+                    asyncio.to_thread(index.search, query, limit, where)
+                    for index in indexes
+                )
+            )
+            formatted_results = [
+                {
+                    "id": hit.id,
+                    "content": hit.document,
+                    "metadata": hit.metadata,
+                    "similarity_score": hit.score,
+                }
+                for results in index_results
+                for hit in results
+            ]
+            if not formatted_results:
+                return []
+
+            formatted_results.sort(key=lambda x: x["similarity_score"], reverse=True)
+            formatted_results = formatted_results[:limit]
+            logger.debug(
+                "Возврат %d результатов. Наивысший similarity_score: %s",
+                len(formatted_results),
+                formatted_results[0]["similarity_score"],
+            )
+            return formatted_results
+        except Exception as e:
+            logger.error(
+                f"При поиске документов произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return []
+
+    async def delete_by_source(
+        self,
+        source: str,
+        partition: Optional[str] = None,
+        keep_ids: Optional[list[str]] = None,
+    ) -> int:
+        """Удаление чанков документа из встроенной коллекции или ее раздела"""
+        if partition and partition not in self.partitions:
+            return 0
+        index = self._get_index(partition)
+        keep = set(keep_ids or [])
+        ids = [
+            record_id
+            for record_id, metadata in zip(index.ids, index.metadatas)
+            if metadata.get("source") == source and record_id not in keep
+        ]
+        if not ids:
+            return 0
+        deleted = await asyncio.to_thread(self._delete_and_save, index, ids)
+        logger.info(f"Из коллекции {index.name} удалено чанков документа {source}: {deleted}")
+        return deleted
+
+    async def get_source_hashes(
+        self, source: str, partition: Optional[str] = None
+    ) -> dict[str, str]:
+        if partition and partition not in self.partitions:
+            return {}
+        index = self._get_index(partition)
+        return {
+            record_id: metadata.get("content_hash", "")
+            for record_id, metadata in zip(index.ids, index.metadatas)
+            if metadata.get("source") == source
+        }
+
+    def _delete_and_save(self, index: VectorIndex, ids: list[str]) -> int:
+        deleted = index.delete(ids)
+        self._schedule_checkpoint(index)
+        return deleted
+
+    def get_collection_info(self) -> dict[str, Any]:
+        """Получение информации о встроенной коллекции"""
+        try:
+            active = self.active
+            return {
+                "name": self.collection_name,
+                "documents_count": len(active.index),
+                "metadata": {
+                    **self.collection_metadata,
+                    "memory_bytes": active.index.nbytes,
+                },
+                "partitions": {
+                    partition: len(index) for partition, index in active.partitions.items()
+                },
+                "generation": active.name,
+                "previous_generation": self.previous.name if self.previous else None,
+            }
+        except Exception as e:
+            logger.error(
+                f"При получении информации о коллекции произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return {"error": str(e)}
+
+    def count(self, partition: Optional[str] = None) -> int:
+        if partition and partition not in self.partitions:
+            return 0
+        return len(self._get_index(partition))
+
+    def iter_records(
+        self,
+        batch_size: int = 500,
+        partition: Optional[str] = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Постраничное чтение записей встроенной коллекции вместе с векторами"""
+        index = self._get_index(partition)
+        for start in range(0, len(index), batch_size):
+            end = min(start + batch_size, len(index))
+            yield {
+                "ids": index.ids[start:end],
+                "documents": index.documents[start:end],
+                "metadatas": index.metadatas[start:end],
+                "embeddings": np.asarray(index.vectors[start:end], dtype=np.float32),
+            }
+
+    def upsert_records(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: np.ndarray,
+        partition: Optional[str] = None,
+    ) -> None:
+        self._get_index(partition).upsert(
+            ids, documents, metadatas, np.asarray(embeddings, dtype=np.float32)
+        )
+
+    def flush(self) -> None:
+        """Сохранение несохраненных изменений основной коллекции и разделов на диск"""
+        with self._checkpoint_lock:
+            if self._checkpoint_timer is not None:
+                self._checkpoint_timer.cancel()
+                self._checkpoint_timer = None
+            indexes, self._unsaved = self._unsaved, set()
+        for index in {*indexes, self.index, *self.partitions.values()}:
+            if index.dirty:
+                index.save()
+
+    def close(self) -> None:
+        """Контрольная точка при остановке приложения"""
+        self.flush()
+
+    def clear_collection(self, partition: Optional[str] = None) -> bool:
+        """Очистка встроенной коллекции или ее раздела"""
+        try:
+            index = self._get_index(partition)
+            logger.info(f"Попытка очистить коллецию: {index.name}")
+            index.clear()
+            index.save()
+            logger.info(f"Коллекция {index.name} очищена")
+            return True
+        except Exception as e:
+            logger.error(
+                f"При очистке коллекции произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return False
+
+    async def health_check(self) -> bool:
+        """Проверка работоспособности сервиса"""
+        try:
+            logger.info("Проверка работоспособности сервисов")
+            return await self.embedding_service.health_check()
+        except Exception as e:
+            logger.error(
+                f"При проверке работоспособности сервисов произошла ошибка: {e}",
+                exc_info=True,
+            )
+            return False
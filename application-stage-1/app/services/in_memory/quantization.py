@@ -0,0 +1,174 @@
+from typing import Any, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCORE_BLOCK_SIZE = 1024
+PQ_BLOCK_SIZE = 16384
+
+
+class ScalarQuantizer:
+    """Скалярное квантование в 8 бит (по диапазону каждой координаты)"""
+
+    name = "int8"
+
+    def __init__(self):
+        self.minimum: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.minimum is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        self.minimum = vectors.min(axis=0).astype(np.float32)
+        maximum = vectors.max(axis=0).astype(np.float32)
+        self.scale = np.maximum(maximum - self.minimum, 1e-12) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.minimum) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def code_size(self, dimension: int) -> int:
+        return dimension
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Приближенное скалярное произведение: x ~ minimum + codes * scale"""
+        weights = (query * self.scale).astype(np.float32)
+        offset = float(self.minimum @ query)
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        # Небольшой переиспользуемый буфер остается в кэше процессора
+        buffer = np.empty((SCORE_BLOCK_SIZE, codes.shape[1]), dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK_SIZE):
+            block = codes[start : start + SCORE_BLOCK_SIZE]
+            np.copyto(buffer[: len(block)], block, casting="unsafe")
+            scores[start : start + len(block)] = buffer[: len(block)] @ weights
+        return scores + offset
+
+    def state(self) -> dict[str, np.ndarray]:
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        self.minimum = np.asarray(state["minimum"], dtype=np.float32)
+        self.scale = np.asarray(state["scale"], dtype=np.float32)
+
+
+class ProductQuantizer:
+    """Продуктовое квантование: подпространства по 256 центроидов, 1 байт на подвектор"""
+
+    name = "pq"
+
+    def __init__(
+        self,
+        subvectors: int = 64,
+        iterations: int = 15,
+        sample_size: int = 8192,
+        seed: int = 42,
+    ):
+        self.subvectors = subvectors
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(N, D) -> (subvectors, N, D / subvectors)"""
+        count, dimension = vectors.shape
+        if dimension % self.subvectors:
+            raise ValueError(
+                f"Размерность {dimension} не делится на количество подвекторов {self.subvectors}"
+            )
+        return vectors.reshape(count, self.subvectors, -1).transpose(1, 0, 2)
+
+    def train(self, vectors: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[rng.choice(len(vectors), self.sample_size, replace=False)]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        clusters = min(256, len(vectors))
+
+        subspaces = self._split(vectors)
+        self.centroids = np.stack(
+            [self._kmeans(subspace, clusters, rng) for subspace in subspaces]
+        ).astype(np.float32)
+
+    def _kmeans(
+        self, points: np.ndarray, clusters: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        centroids = points[rng.choice(len(points), clusters, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignments = self._nearest(points, centroids)
+            membership = np.zeros((clusters, len(points)), dtype=np.float32)
+            membership[assignments, np.arange(len(points))] = 1.0
+            sums = membership @ points
+            counts = np.bincount(assignments, minlength=clusters)[:, None]
+            empty = counts[:, 0] == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.maximum(counts, 1))
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (
+            (points**2).sum(axis=1, keepdims=True)
+            - 2 * points @ centroids.T
+            + (centroids**2).sum(axis=1)
+        )
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subspaces = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for i, subspace in enumerate(subspaces):
+            codes[:, i] = self._nearest(subspace, self.centroids[i])
+        return codes
+
+    def code_size(self, dimension: int) -> int:
+        return self.subvectors
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Асимметричное расстояние: таблица скалярных произведений подвекторов с центроидами"""
+        query_subspaces = query.reshape(self.subvectors, -1)
+        lookup = np.einsum("mkd,md->mk", self.centroids, query_subspaces).astype(
+            np.float32
+        )
+        scores = np.zeros(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], PQ_BLOCK_SIZE):
+            block = np.ascontiguousarray(codes[start : start + PQ_BLOCK_SIZE].T)
+            block_scores = scores[start : start + PQ_BLOCK_SIZE]
+            for subvector, subvector_codes in enumerate(block):
+                block_scores += lookup[subvector].take(subvector_codes)
+        return scores
+
+    def state(self) -> dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        self.centroids = np.asarray(state["centroids"], dtype=np.float32)
+        self.subvectors = self.centroids.shape[0]
+
+
+QUANTIZERS = {
+    "none": None,
+    "int8": ScalarQuantizer,
+    "pq": ProductQuantizer,
+}
+
+
+def create_quantizer(
+    quantization: str,
+    pq_subvectors: int = 64,
+) -> Optional[ScalarQuantizer | ProductQuantizer]:
+    if quantization not in QUANTIZERS:
+        raise ValueError(
+            f"Тип квантования не поддерживается: {quantization}, доступные типы: {list(QUANTIZERS)}"
+        )
+    if quantization == "pq":
+        return ProductQuantizer(subvectors=pq_subvectors)
+    quantizer_class = QUANTIZERS[quantization]
+    return quantizer_class() if quantizer_class else None
@@ -0,0 +1,524 @@
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from app.services.in_memory.quantization import create_quantizer
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+}
+
+SCORE_BLOCK_SIZE = 65536
+
+
+def matches_where(metadata: dict[str, Any], where: dict[str, Any]) -> bool:
+    """Проверка метаданных на соответствие фильтру в формате ChromaDB"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > operand:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+                    if operator == "$lte" and not value <= operand:
+                        return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class SearchHit(NamedTuple):
+    """Найденная запись: позиция в индексе на момент поиска и данные записи"""
+
+    position: int
+    id: str
+    document: str
+    metadata: dict[str, Any]
+    score: float
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-нормализация векторов (косинусная близость сводится к скалярному произведению)"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """Непрерывная матрица нормированных векторов одной коллекции"""
+
+    VECTORS_FILE = "vectors.npy"
+    RECORDS_FILE = "records.jsonl"
+    INDEX_FILE = "index.json"
+    CODES_FILE = "codes.npy"
+    QUANTIZER_FILE = "quantizer.npz"
+
+    def __init__(
+        self,
+        name: str,
+        dtype: str = "float32",
+        directory: Optional[Path] = None,
+        hnsw_threshold: int = 0,
+        quantization: str = "none",
+        pq_subvectors: int = 64,
+        rescore_factor: int = 10,
+    ):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"Тип данных не поддерживается: {dtype}, доступные типы: {list(SUPPORTED_DTYPES)}"
+            )
+        self.name = name
+        self.dtype = dtype
+        self.directory = directory
+        self.hnsw_threshold = hnsw_threshold
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.rescore_factor = rescore_factor
+
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.metadatas: list[dict[str, Any]] = []
+        self.positions: dict[str, int] = {}
+
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._hnsw: Any = None
+        self._quantizer = create_quantizer(quantization, pq_subvectors)
+        self._codes: Optional[np.ndarray] = None
+        self._codes_size = 0
+        self._trained_size = 0
+        # Есть изменения, не сохраненные на диск
+        self.dirty = False
+        self._lock = threading.RLock()
+
+        if self.directory and (self.directory / self.INDEX_FILE).exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dimension(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=SUPPORTED_DTYPES[self.dtype])
+        return self._matrix[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Объем векторов в оперативной памяти (отображенные в память файлы не учитываются)"""
+        resident = 0 if isinstance(self._matrix, np.memmap) else self.vectors.nbytes
+        if self._codes is not None:
+            resident += self._codes[: self._size].nbytes
+        return int(resident)
+
+    def _reserve(self, rows: int, dimension: int) -> None:
+        """Выделение места под новые строки с удвоением емкости"""
+        if self._matrix is None:
+            self._matrix = np.empty(
+                (max(rows, 1024), dimension), dtype=SUPPORTED_DTYPES[self.dtype]
+            )
+            return
+        if self._matrix.shape[1] != dimension:
+            raise ValueError(
+                f"Размерность векторов {dimension} не совпадает с размерностью индекса {self._matrix.shape[1]}"
+            )
+        capacity = self._matrix.shape[0]
+        writable = not isinstance(self._matrix, np.memmap)
+        if self._size + rows <= capacity and writable:
+            return
+        new_capacity = max(self._size + rows, capacity * 2 if writable else capacity)
+        matrix = np.empty((new_capacity, dimension), dtype=self._matrix.dtype)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+
+    def upsert(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: np.ndarray,
+    ) -> None:
+        """Добавление или замена записей"""
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            new_rows = sum(
+                1 for record_id in dict.fromkeys(ids) if record_id not in self.positions
+            )
+            self._reserve(new_rows, vectors.shape[1])
+            for record_id, document, metadata, vector in zip(
+                ids, documents, metadatas, vectors
+            ):
+                position = self.positions.get(record_id)
+                if position is None:
+                    position = self._size
+                    self.positions[record_id] = position
+                    self.ids.append(record_id)
+                    self.documents.append(document)
+                    self.metadatas.append(metadata)
+                    self._size += 1
+                else:
+                    self.documents[position] = document
+                    self.metadatas[position] = metadata
+                    self._codes_size = min(self._codes_size, position)
+                self._matrix[position] = vector
+            self.dirty = True
+            self._update_codes()
+            self._update_hnsw(ids)
+
+    def _update_codes(self) -> None:
+        """Квантование новых строк; при удвоении индекса квантователь переобучается"""
+        if self._quantizer is None or self._size == 0:
+            return
+        if not self._quantizer.is_trained or self._size >= 2 * self._trained_size:
+            logger.info(
+                f"Обучение квантователя {self.quantization} для коллекции '{self.name}' ({self._size} векторов)"
+            )
+            self._quantizer.train(self.vectors.astype(np.float32))
+            self._trained_size = self._size
+            self._codes_size = 0
+
+        code_size = self._quantizer.code_size(self.dimension)
+        if self._codes is None or self._codes.shape[0] < self._size:
+            capacity = max(self._size, 2 * (0 if self._codes is None else self._codes.shape[0]))
+            codes = np.empty((capacity, code_size), dtype=np.uint8)
+            if self._codes is not None:
+                codes[: self._codes_size] = self._codes[: self._codes_size]
+            self._codes = codes
+
+        for start in range(self._codes_size, self._size, SCORE_BLOCK_SIZE):
+            end = min(start + SCORE_BLOCK_SIZE, self._size)
+            self._codes[start:end] = self._quantizer.encode(
+                self._matrix[start:end].astype(np.float32)
+            )
+        self._codes_size = self._size
+
+    def delete(self, ids: list[str]) -> int:
+        """Удаление записей с уплотнением матрицы (HNSW-граф и коды строятся заново)"""
+        with self._lock:
+            removed = {self.positions[record_id] for record_id in ids if record_id in self.positions}
+            if not removed:
+                return 0
+            keep = [position for position in range(self._size) if position not in removed]
+            if not keep:
+                self.clear()
+                return len(removed)
+            self.dirty = True
+            # Новые списки и матрица: поиск, начатый до удаления, работает со старыми
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self.ids = [self.ids[position] for position in keep]
+            self.documents = [self.documents[position] for position in keep]
+            self.metadatas = [self.metadatas[position] for position in keep]
+            self.positions = {record_id: position for position, record_id in enumerate(self.ids)}
+            self._size = len(keep)
+            self._hnsw = None
+            self._codes = None
+            self._codes_size = 0
+            self._update_codes()
+            self._update_hnsw(self.ids)
+            return len(removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.ids, self.documents, self.metadatas = [], [], []
+            self.positions = {}
+            self._matrix = None
+            self._size = 0
+            self._hnsw = None
+            self._quantizer = create_quantizer(self.quantization, self.pq_subvectors)
+            self._codes = None
+            self._codes_size = 0
+            self._trained_size = 0
+            self.dirty = True
+
+    def _scores(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Косинусная близость запроса со всеми векторами (накопление во float32)"""
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_SIZE):
+            block = matrix[start : start + SCORE_BLOCK_SIZE].astype(np.float32)
+            scores[start : start + SCORE_BLOCK_SIZE] = block @ query
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        where: Optional[dict[str, Any]] = None,
+    ) -> list[SearchHit]:
+        """Поиск top-k ближайших векторов
+
+        Позиции, идентификаторы, тексты и метаданные берутся из одного снимка
+        индекса: удаление с уплотнением во время поиска не смещает результаты
+        """
+        with self._lock:
+            size, matrix, hnsw = self._size, self.vectors, self._hnsw
+            ids, documents, metadatas = self.ids, self.documents, self.metadatas
+            quantizer, codes = self._quantizer, self._codes
+        if size == 0 or limit <= 0:
+            return []
+        return [
+            SearchHit(position, ids[position], documents[position], metadatas[position], score)
+            for position, score in self._search_positions(
+                size, matrix, hnsw, metadatas, quantizer, codes, query, limit, where
+            )
+        ]
+
+    def _search_positions(
+        self,
+        size: int,
+        matrix: np.ndarray,
+        hnsw: Any,
+        metadatas: list[dict[str, Any]],
+        quantizer: Any,
+        codes: Optional[np.ndarray],
+        query: np.ndarray,
+        limit: int,
+        where: Optional[dict[str, Any]],
+    ) -> list[tuple[int, float]]:
+        """Пары (позиция, близость) по снимку индекса"""
+
+        query = normalize(np.asarray(query, dtype=np.float32))
+        mask = None
+        if where:
+            mask = np.fromiter(
+                (matches_where(metadata, where) for metadata in metadatas[:size]),
+                dtype=bool,
+                count=size,
+            )
+            if not mask.any():
+                return []
+
+        if hnsw is not None:
+            return self._search_hnsw(hnsw, query, limit, mask)
+
+        if quantizer is not None and codes is not None:
+            return self._search_quantized(
+                quantizer, codes[:size], matrix, query, limit, mask
+            )
+
+        scores = self._scores(matrix, query)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        top = self._top_k(scores, limit)
+        return [(int(i), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _search_quantized(
+        self,
+        quantizer: Any,
+        codes: np.ndarray,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        limit: int,
+        mask: Optional[np.ndarray],
+    ) -> list[tuple[int, float]]:
+        """Отбор кандидатов по квантованным кодам и точный пересчет во float32"""
+        approximate_scores = quantizer.scores(codes, query)
+        if mask is not None:
+            approximate_scores = np.where(mask, approximate_scores, -np.inf)
+        shortlist = self._top_k(approximate_scores, limit * self.rescore_factor)
+        shortlist = np.sort(shortlist[np.isfinite(approximate_scores[shortlist])])
+        if len(shortlist) == 0:
+            return []
+
+        exact_scores = matrix[shortlist].astype(np.float32) @ query
+        top = self._top_k(exact_scores, limit)
+        return [(int(shortlist[i]), float(exact_scores[i])) for i in top]
+
+    def _search_hnsw(
+        self,
+        hnsw: Any,
+        query: np.ndarray,
+        limit: int,
+        mask: Optional[np.ndarray],
+    ) -> list[tuple[int, float]]:
+        k = min(limit, hnsw.get_current_count())
+        if mask is not None:
+            k = min(k, int(mask.sum()))
+        hnsw.set_ef(max(64, k * 4))
+        labels, distances = hnsw.knn_query(
+            query,
+            k=k,
+            filter=(lambda label: bool(mask[label])) if mask is not None else None,
+        )
+        return [
+            (int(label), float(1.0 - distance))
+            for label, distance in zip(labels[0], distances[0])
+        ]
+
+    def _update_hnsw(self, ids: list[str]) -> None:
+        """Построение или дополнение HNSW-графа, если индекс превысил порог"""
+        if self._quantizer is not None:
+            return
+        if not self.hnsw_threshold or self._size < self.hnsw_threshold:
+            return
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning(
+                "Пакет hnswlib не установлен, поиск выполняется полным перебором"
+            )
+            self.hnsw_threshold = 0
+            return
+
+        if self._hnsw is None:
+            logger.info(f"Построение HNSW-графа для коллекции '{self.name}' ({self._size} векторов)")
+            hnsw = hnswlib.Index(space="cosine", dim=self.dimension)
+            hnsw.init_index(max_elements=max(self._size * 2, 1024), ef_construction=200, M=16)
+            hnsw.add_items(
+                self.vectors.astype(np.float32), np.arange(self._size)
+            )
+            self._hnsw = hnsw
+            return
+
+        if self._size > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(self._size * 2)
+        positions = np.array([self.positions[record_id] for record_id in ids])
+        self._hnsw.add_items(
+            self._matrix[positions].astype(np.float32), positions
+        )
+
+    def save(self) -> None:
+        """Сохранение индекса на диск (атомарная замена файлов)
+
+        Файлы переписываются целиком, поэтому вызывающий код объединяет
+        изменения и сохраняет их контрольными точками, а не после каждой записи
+        """
+        if not self.directory:
+            return
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            vectors_path = self.directory / self.VECTORS_FILE
+            records_path = self.directory / self.RECORDS_FILE
+            index_path = self.directory / self.INDEX_FILE
+
+            with open(f"{vectors_path}.tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(self.vectors))
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+
+            with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+                for record_id, document, metadata in zip(
+                    self.ids, self.documents, self.metadatas
+                ):
+                    f.write(
+                        json.dumps(
+                            {"id": record_id, "document": document, "metadata": metadata},
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+            os.replace(f"{records_path}.tmp", records_path)
+
+            if self._quantizer is not None and self._quantizer.is_trained:
+                codes_path = self.directory / self.CODES_FILE
+                with open(f"{codes_path}.tmp", "wb") as f:
+                    np.save(f, self._codes[: self._size])
+                os.replace(f"{codes_path}.tmp", codes_path)
+
+                quantizer_path = self.directory / self.QUANTIZER_FILE
+                with open(f"{quantizer_path}.tmp", "wb") as f:
+                    np.savez(f, **self._quantizer.state())
+                os.replace(f"{quantizer_path}.tmp", quantizer_path)
+
+            with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "name": self.name,
+                        "dtype": self.dtype,
+                        "count": self._size,
+                        "dimension": self.dimension,
+                        "quantization": self.quantization,
+                        "trained_size": self._trained_size,
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(f"{index_path}.tmp", index_path)
+            self.dirty = False
+
+            if self._quantizer is not None and self._size:
+                # Полные векторы нужны только для пересчета кандидатов,
+                # поэтому остаются на диске и отображаются в память
+                self._matrix = np.load(vectors_path, mmap_mode="r")
+
+    def load(self) -> None:
+        """Загрузка индекса с диска, векторы отображаются в память (mmap)"""
+        with open(self.directory / self.INDEX_FILE, "r", encoding="utf-8") as f:
+            index_info = json.load(f)
+        count = index_info["count"]
+        self.name = index_info.get("name", self.name)
+        if index_info["dtype"] != self.dtype:
+            logger.warning(
+                f"Индекс '{self.name}' сохранен в {index_info['dtype']}, используется этот тип данных"
+            )
+            self.dtype = index_info["dtype"]
+        quantization = index_info.get("quantization", "none")
+        if quantization != self.quantization:
+            logger.warning(
+                f"Индекс '{self.name}' сохранен с квантованием {quantization}, используется этот тип квантования"
+            )
+            self.quantization = quantization
+        self._quantizer = create_quantizer(self.quantization, self.pq_subvectors)
+
+        self.ids, self.documents, self.metadatas = [], [], []
+        with open(self.directory / self.RECORDS_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if len(self.ids) >= count:
+                    break
+                record = json.loads(line)
+                self.ids.append(record["id"])
+                self.documents.append(record["document"])
+                self.metadatas.append(record["metadata"])
+        self.positions = {record_id: i for i, record_id in enumerate(self.ids)}
+        self._size = count
+        self._matrix = (
+            np.load(self.directory / self.VECTORS_FILE, mmap_mode="r") if count else None
+        )
+        if self._quantizer is not None and count:
+            if (self.directory / self.QUANTIZER_FILE).exists():
+                with np.load(self.directory / self.QUANTIZER_FILE) as state:
+                    self._quantizer.load_state(state)
+                self._codes = np.load(self.directory / self.CODES_FILE)
+                self._codes_size = min(count, len(self._codes))
+                self._trained_size = index_info.get("trained_size", count)
+            self._update_codes()
+        self._update_hnsw(self.ids)
+        logger.info(f"Загружен индекс '{self.name}' ({count} векторов) из {self.directory}")
@@ -0,0 +1,171 @@
+from pathlib import Path
+from typing import Optional
+import logging
+import re
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    """Эмбеддинги без файлов модели: хэширование слов и символьных n-грамм
+
+    Признаки — слова и n-граммы слов с границами (устойчивы к окончаниям),
+    веса — сублинейная частота со знаком по хэшу. Хэш CRC32 не зависит
+    от процесса, поэтому векторы совпадают во всех воркерах и после перезапуска
+    """
+
+    def __init__(self, dimension: int = 1024, ngram: int = 3):
+        self.dimension = dimension
+        self.ngram = ngram
+
+    def _features(self, text: str) -> list[str]:
+        features = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            features.append(token)
+            padded = f"<{token}>"
+            features.extend(
+                padded[i : i + self.ngram] for i in range(len(padded) - self.ngram + 1)
+            )
+        return features
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                dtype=np.uint32,
+            )
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            vectors[row] = np.bincount(
+                hashes % self.dimension, weights=signs, minlength=self.dimension
+            )
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize(vectors)
+
+
+class OnnxEmbedder:
+    """Эмбеддинги локальной ONNX-модели (экспорт sentence-transformers / Optimum)
+
+    Каталог модели содержит tokenizer.json и model.onnx (или onnx/model.onnx).
+    Если модель возвращает скрытые состояния токенов, вектор текста —
+    их среднее по маске внимания
+    """
+
+    INT8_MODEL_FILE = "model_quantized.onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        max_length: int = 512,
+        threads: int = 0,
+        int8: bool = False,
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_path = Path(model_path)
+        self.max_length = max_length
+        self.threads = threads
+        self.model_file = self._model_file(int8)
+
+        tokenizer_file = self._find("tokenizer.json")
+        if tokenizer_file is None:
+            raise FileNotFoundError(f"В каталоге {self.model_path} нет tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_file))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        if self.tokenizer.padding is None:
+            pad_token = next(
+                (
+                    token
+                    for token in ("[PAD]", "<pad>")
+                    if self.tokenizer.token_to_id(token) is not None
+                ),
+                None,
+            )
+            self.tokenizer.enable_padding(
+                pad_id=self.tokenizer.token_to_id(pad_token) if pad_token else 0,
+                pad_token=pad_token or "[PAD]",
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Пачки выполняются по одной, параллелизм — внутри операторов
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        dimension = self.session.get_outputs()[0].shape[-1]
+        if not isinstance(dimension, int):
+            dimension = self.embed(["test"]).shape[1]
+        self.dimension = dimension
+        logger.info(
+            f"Локальная модель эмбеддингов загружена: {self.model_file}, размерность {self.dimension}"
+        )
+
+    def _find(self, filename: str) -> Optional[Path]:
+        for path in (self.model_path / filename, self.model_path / "onnx" / filename):
+            if path.exists():
+                return path
+        return None
+
+    def _model_file(self, int8: bool) -> Path:
+        model_file = self._find("model.onnx")
+        if int8:
+            quantized = self._find(self.INT8_MODEL_FILE)
+            if quantized:
+                return quantized
+            if model_file:
+                quantized = self._quantize(model_file)
+                if quantized:
+                    return quantized
+        if model_file is None:
+            raise FileNotFoundError(f"В каталоге {self.model_path} нет model.onnx")
+        return model_file
+
+    def _quantize(self, model_file: Path) -> Optional[Path]:
+        """Динамическое квантование весов в int8 (нужен пакет onnx)"""
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            logger.warning(
+                f"Для квантования модели в int8 необходим пакет onnx, "
+                f"используется {model_file.name}; либо положите {self.INT8_MODEL_FILE} в каталог модели"
+            )
+            return None
+        quantized = model_file.with_name(self.INT8_MODEL_FILE)
+        logger.info(f"Квантование модели эмбеддингов в int8: {quantized}")
+        quantize_dynamic(str(model_file), str(quantized), weight_type=QuantType.QInt8)
+        return quantized
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array(
+            [encoding.attention_mask for encoding in encodings], dtype=np.int64
+        )
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array(
+                [encoding.type_ids for encoding in encodings], dtype=np.int64
+            )
+        outputs = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        if outputs.ndim == 3:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            outputs = (outputs * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return normalize(outputs.astype(np.float32))
@@ -0,0 +1,233 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+import asyncio
+import itertools
+import logging
+
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+from app.services.base.embedding_service_base import EmbeddingServiceBase
+from app.services.local.embedders import HashingEmbedder, OnnxEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Динамическое объединение одновременных запросов эмбеддингов в пачки
+
+    Пока модель считает пачку, новые тексты копятся в очереди и уходят
+    следующей пачкой, поэтому одиночный запрос не ждет. max_wait добавляет
+    ожидание добора пачки (выше пропускная способность, выше задержка).
+    Запросы пользователей обгоняют в очереди тексты загружаемых документов
+    """
+
+    QUERY_PRIORITY = 0
+    DOCUMENT_PRIORITY = 1
+
+    def __init__(
+        self,
+        embed: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait: float = 0.0,
+    ):
+        self.embed_batch = embed
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-embeddings")
+        self.queue: asyncio.PriorityQueue[tuple[int, int, str, asyncio.Future]] = (
+            asyncio.PriorityQueue()
+        )
+        self.sequence = itertools.count()
+        self.worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.texts = 0
+
+    async def embed(self, texts: list[str], priority: int = DOCUMENT_PRIORITY) -> np.ndarray:
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            self.queue.put_nowait((priority, next(self.sequence), text, future))
+        return np.stack(await asyncio.gather(*futures))
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return [(text, future) for _, _, text, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor, self.embed_batch, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self) -> None:
+        if self.worker:
+            self.worker.cancel()
+            await asyncio.gather(self.worker, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+
+class LocalEmbeddings(Embeddings):
+    """Интерфейс LangChain к локальной модели (нужен Chroma как embedding_function)"""
+
+    def __init__(
+        self,
+        embedder: Union[OnnxEmbedder, HashingEmbedder],
+        batcher: EmbeddingBatcher,
+        query_prefix: str = "",
+        document_prefix: str = "",
+    ):
+        self.embedder = embedder
+        self.batcher = batcher
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedder.embed([self.document_prefix + text for text in texts]).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embedder.embed([self.query_prefix + text])[0].tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        vectors = await self.batcher.embed([self.document_prefix + text for text in texts])
+        return vectors.tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        vectors = await self.batcher.embed(
+            [self.query_prefix + text for text in texts],
+            priority=EmbeddingBatcher.QUERY_PRIORITY,
+        )
+        return vectors.tolist()
+
+
+class LocalEmbeddingService(EmbeddingServiceBase):
+    """Сервис эмбеддингов на CPU без обращения к внешнему API
+
+    Модель onnx — локальная ONNX-модель из model_path; если файлов модели нет,
+    используется хэширование признаков (модель hashing)
+    """
+
+    def __init__(
+        self,
+        model: str = "onnx",
+        model_path: Optional[str] = None,
+        max_length: int = 512,
+        threads: int = 0,
+        int8: bool = False,
+        max_batch_size: int = 32,
+        batch_wait_ms: float = 0.0,
+        query_prefix: str = "",
+        document_prefix: str = "",
+        hashing_dimension: int = 1024,
+    ):
+        self.model = model
+        self.model_path = model_path
+        self.int8 = int8
+
+        embedder: Union[OnnxEmbedder, HashingEmbedder]
+        if model == "onnx" and model_path and Path(model_path).exists():
+            try:
+                embedder = OnnxEmbedder(
+                    model_path, max_length=max_length, threads=threads, int8=int8
+                )
+            except Exception as e:
+                logger.error(
+                    f"При загрузке локальной модели эмбеддингов произошла ошибка: {e}",
+                    exc_info=True,
+                )
+                raise
+        else:
+            if model == "onnx":
+                logger.warning(
+                    f"Файлы локальной модели эмбеддингов не найдены ({model_path}), "
+                    f"используется хэширование признаков"
+                )
+                self.model = "hashing"
+            embedder = HashingEmbedder(dimension=hashing_dimension)
+        self.embedder = embedder
+        # Имя модели входит в ключи кэша эмбеддингов и метаданные коллекций
+        if isinstance(embedder, OnnxEmbedder):
+            self.model_name = f"onnx:{embedder.model_path.name}"
+            if embedder.model_file.name == OnnxEmbedder.INT8_MODEL_FILE:
+                self.model_name += ":int8"
+        else:
+            self.model_name = f"hashing:{embedder.dimension}"
+
+        self.client = LocalEmbeddings(
+            embedder,
+            EmbeddingBatcher(
+                embedder.embed,
+                max_batch_size=max_batch_size,
+                max_wait=batch_wait_ms / 1000,
+            ),
+            query_prefix=query_prefix if self.model == "onnx" else "",
+            document_prefix=document_prefix if self.model == "onnx" else "",
+        )
+
+    async def health_check(self) -> bool:
+        try:
+            embedding = await self.embed_query("Проверка")
+            return len(embedding) == self.get_embedding_dimension()
+        except Exception as e:
+            logger.error(
+                f"При проверке работоспособности локального Embedding сервиса произошла ошибка: {e}"
+            )
+            return False
+
+    async def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return await self.client.aembed_queries(texts)
+
+    def get_embedding_dimension(self) -> int:
+        return self.embedder.dimension
+
+    def get_service_info(self) -> dict[str, Any]:
+        batcher = self.client.batcher
+        return {
+            "service": "Local Embedding Service",
+            "model": self.model_name,
+            "model_file": str(getattr(self.embedder, "model_file", "")),
+            "dimension": str(self.get_embedding_dimension()),
+            "batches": str(batcher.batches),
+            "texts": str(batcher.texts),
+        }
+
+    async def close(self) -> None:
+        await self.client.batcher.close()
@@ -0,0 +1,274 @@
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Iterator, Optional
+import asyncio
+import io
+import logging
+import sys
+import threading
+import time
+
+from app.logging_config import request_id_var
+from app.services.tracing import QueryTrace, start_trace
+
+logger = logging.getLogger(__name__)
+
+
+def frame_label(frame: FrameType) -> str:
+    path = Path(frame.f_code.co_filename)
+    return f"{frame.f_code.co_name} ({path.parent.name}/{path.name}:{frame.f_lineno})"
+
+
+def fold_stack(frames: list[FrameType]) -> str:
+    """Стек в свернутом формате flamegraph: от внешнего вызова к внутреннему через ';'"""
+    return ";".join(frame_label(frame) for frame in frames)
+
+
+def thread_stack(frame: Optional[FrameType], max_depth: int) -> list[FrameType]:
+    frames = []
+    while frame is not None and len(frames) < max_depth:
+        frames.append(frame)
+        frame = frame.f_back
+    return frames[::-1]
+
+
+def await_stack(task: asyncio.Task, max_depth: int) -> list[FrameType]:
+    """Цепочка await приостановленной задачи: место, где запрос ожидает"""
+    frames = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None and len(frames) < max_depth:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+    return frames
+
+
+def top_stacks(samples: Counter, limit: int) -> list[dict[str, Any]]:
+    return [{"stack": stack, "count": count} for stack, count in samples.most_common(limit)]
+
+
+@dataclass
+class ActiveRequest:
+    name: str
+    request_id: Optional[str]
+    started: float
+    trace: QueryTrace
+    task: Optional[asyncio.Task]
+    thread_id: int
+    # Где ожидал запрос и чем в это время был занят цикл событий
+    await_samples: Counter = field(default_factory=Counter)
+    loop_samples: Counter = field(default_factory=Counter)
+
+
+class SlowRequestProfiler:
+    """Разбивка по этапам и выборочный профиль стеков для медленных запросов
+
+    Стеки запроса снимаются потоком-сэмплером каждые sample_interval_ms, начиная
+    с sample_after_ms (по умолчанию половина порога) от начала запроса. Пока нет
+    запросов дольше sample_after_ms, поток спит и запросы не замедляет. Запросы
+    дольше threshold_ms попадают в reports (последние max_reports) и в лог
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        sample_interval_ms: float = 10.0,
+        sample_after_ms: Optional[float] = None,
+        max_reports: int = 50,
+        max_depth: int = 64,
+        top_stacks: int = 20,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_interval_ms / 1000
+        self.sample_after = (
+            sample_after_ms / 1000 if sample_after_ms is not None else self.threshold / 2
+        )
+        self.max_depth = max_depth
+        self.top_stacks = top_stacks
+        self.reports: deque[dict[str, Any]] = deque(maxlen=max_reports)
+        self._active: dict[int, ActiveRequest] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[QueryTrace]:
+        """Учет запроса; этапы внутри блока попадают в его трассировку"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="slow-request-sampler", daemon=True
+            )
+            self._thread.start()
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        with start_trace() as trace:
+            request = ActiveRequest(
+                name=name,
+                request_id=request_id_var.get(),
+                started=time.perf_counter(),
+                trace=trace,
+                task=task,
+                thread_id=threading.get_ident(),
+            )
+            key = id(request)
+            # Сначала запрос, потом сигнал: проснувшийся сэмплер должен его увидеть
+            self._active[key] = request
+            self._wakeup.set()
+            try:
+                yield trace
+            finally:
+                del self._active[key]
+                duration = time.perf_counter() - request.started
+                if duration >= self.threshold:
+                    self._report(request, duration)
+
+    def _report(self, request: ActiveRequest, duration: float) -> None:
+        stages = {name: round(ms, 1) for name, ms in request.trace.stages.items()}
+        self.reports.append(
+            {
+                "name": request.name,
+                "request_id": request.request_id,
+                "started_at": datetime.fromtimestamp(time.time() - duration).isoformat(
+                    timespec="milliseconds"
+                ),
+                "duration_ms": round(duration * 1000, 1),
+                "stages": stages,
+                "cache_hits": sorted(request.trace.cache_hits),
+                "samples": sum(request.await_samples.values()),
+                "await_stacks": top_stacks(request.await_samples, self.top_stacks),
+                "loop_stacks": top_stacks(request.loop_samples, self.top_stacks),
+            }
+        )
+        logger.warning(
+            "Медленный запрос %s: %.0f мс",
+            request.name,
+            duration * 1000,
+            extra={"stages": stages},
+        )
+
+    def _run(self) -> None:
+        while True:
+            active = list(self._active.values())
+            if not active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            now = time.perf_counter()
+            due = [request for request in active if now - request.started >= self.sample_after]
+            if due:
+                self._sample(due)
+                time.sleep(self.sample_interval)
+            else:
+                # До момента, когда самый старый запрос станет кандидатом в медленные
+                time.sleep(min(request.started for request in active) + self.sample_after - now)
+
+    def _sample(self, requests: list[ActiveRequest]) -> None:
+        thread_frames = sys._current_frames()
+        for request in requests:
+            loop_frames = thread_stack(thread_frames.get(request.thread_id), self.max_depth)
+            loop_busy = bool(loop_frames) and not loop_frames[-1].f_code.co_filename.endswith(
+                "selectors.py"
+            )
+            if request.task is not None and request.task.get_coro().cr_running:
+                # Запрос выполняется прямо сейчас: полный стек потока
+                request.await_samples[fold_stack(loop_frames)] += 1
+                continue
+            if request.task is not None:
+                request.await_samples[fold_stack(await_stack(request.task, self.max_depth))] += 1
+            if loop_busy:
+                # Запрос готов продолжить, но цикл событий занят другой работой
+                request.loop_samples[fold_stack(loop_frames)] += 1
+
+
+class ProcessProfiler:
+    """Профилирование работающего процесса в течение заданного времени
+
+    Одновременно выполняется не более одного профилирования: повторный запуск
+    отклоняется RuntimeError, пока предыдущее не завершится (в том числе поток
+    выборки стеков, продолжающий работу после отмены запроса)
+    """
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._running = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def _start(self) -> None:
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("Профилирование уже выполняется")
+
+    async def cprofile(self, seconds: float, output_format: str = "pstats") -> bytes:
+        """cProfile цикла событий: все обработчики и задачи, выполнявшиеся за seconds
+
+        Returns:
+            bytes: Статистика в формате pstats (для snakeviz, pstats.Stats) или текстом
+        """
+        import cProfile
+        import marshal
+        import pstats
+
+        self._start()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(min(seconds, self.max_seconds))
+        finally:
+            profile.disable()
+            self._running.release()
+        if output_format == "text":
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(100)
+            return stream.getvalue().encode("utf-8")
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+
+    async def sample(self, seconds: float, interval_ms: float = 5.0) -> bytes:
+        """Выборка стеков всех потоков процесса
+
+        Returns:
+            bytes: Стеки в свернутом формате flamegraph ("поток;стек количество")
+        """
+        self._start()
+        try:
+            # Поток снимает блокировку сам: отмена запроса не прерывает выборку
+            future = asyncio.get_running_loop().run_in_executor(
+                None, self._sample_threads, min(seconds, self.max_seconds), interval_ms / 1000
+            )
+        except BaseException:
+            self._running.release()
+            raise
+        return await future
+
+    def _sample_threads(self, seconds: float, interval: float) -> bytes:
+        try:
+            return self._collect_samples(seconds, interval)
+        finally:
+            self._running.release()
+
+    @staticmethod
+    def _collect_samples(seconds: float, interval: float) -> bytes:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = fold_stack(thread_stack(frame, max_depth=128))
+                samples[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            time.sleep(interval)
+        return "".join(
+            f"{stack} {count}\n" for stack, count in samples.most_common()
+        ).encode("utf-8")
@@ -1,54 +1,296 @@
+import asyncio
+import contextlib
 import time
+import hashlib
+import json
 import logging
-from typing import Any
+import re
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
 
-from langchain.text_splitter import (
-    RecursiveCharacterTextSplitter,
-)
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.models.schemas import QueryResponse
+from app.models.schemas import QueryRequest, QueryResponse
 from app.services.base.llm_service_base import LLMServiceBase
-from app.services.chroma_db_service import ChromaDBService
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.cache.sqlite_cache import SQLiteCache
+from app.services.tracing import (
+    current_trace,
+    record_cache_hit,
+    record_retrieved,
+    start_trace,
+    trace_stage,
+)
+
+if TYPE_CHECKING:
+    from app.services.analytics.precomputed_answers import PrecomputedAnswers
+    from app.services.analytics.query_log import QueryLog
+    from app.services.experiments.experiment import Experiment, ExperimentArm
+    from app.services.experiments.experiment_sink import ExperimentSink
+    from app.services.retrieval.lexical_index import BM25Index
+    from app.services.retrieval.parent_store import ParentStore
+    from app.services.router.query_router import QueryRouter
+    from app.services.session_store import PreparedTurn, SessionStore
 
 
 logger = logging.getLogger(__name__)
 
+SECTION_HEADING_PATTERN = re.compile(
+    r"^(?=[^\n]*[A-ZА-ЯЁ]{3})([^a-zа-яё\n]+?):?[ \t]*$", re.MULTILINE
+)
+
 
 class RAGService:
     """Сервис для работы с RAG"""
 
+    CHITCHAT_ANSWER = (
+        "Я помощник студентов Уральского Федерального университета и отвечаю на вопросы "
+        "об учебе и административных процедурах. Задайте, пожалуйста, вопрос по этим темам."
+    )
+
     def __init__(
         self,
-        chroma_db: ChromaDBService,
+        vector_store: VectorStoreServiceBase,
         llm_service: LLMServiceBase,
+        query_router: Optional["QueryRouter"] = None,
+        routed_collections: Optional[dict[str, VectorStoreServiceBase]] = None,
+        answer_cache: Optional[SQLiteCache] = None,
+        context_chunks: int = 3,
+        experiment: Optional["Experiment"] = None,
+        experiment_sink: Optional["ExperimentSink"] = None,
+        experiment_collections: Optional[dict[str, VectorStoreServiceBase]] = None,
+        lexical_indexes: Optional[dict[str, "BM25Index"]] = None,
+        parent_store: Optional["ParentStore"] = None,
+        parent_splitter: Optional[RecursiveCharacterTextSplitter] = None,
+        query_log: Optional["QueryLog"] = None,
+        precomputed_answers: Optional["PrecomputedAnswers"] = None,
+        session_store: Optional["SessionStore"] = None,
     ):
-        self.chroma_db = chroma_db
+        self.vector_store = vector_store
         self.llm_service = llm_service
+        self.query_router = query_router
+        self.routed_collections = routed_collections or {}
+        self.answer_cache = answer_cache
+        self.context_chunks = context_chunks
+        self.experiment = experiment
+        self.experiment_sink = experiment_sink
+        self.experiment_collections = experiment_collections or {}
+        # Лексические индексы для гибридного поиска по имени варианта эксперимента
+        self.lexical_indexes = lexical_indexes or {}
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=250,
             chunk_overlap=50,
             length_function=len,
         )
+        # Поиск small-to-big: чанки text_splitter нарезаются внутри разделов
+        # parent_splitter, в контекст LLM попадают разделы из parent_store
+        self.parent_store = parent_store
+        self.parent_splitter = parent_splitter
+        self.query_log = query_log
+        # Ответы на частые вопросы, подготовленные HotQuestionService
+        self.precomputed_answers = precomputed_answers
+        self.session_store = session_store
+        # Теневое поколение во время пересборки: новые документы пишутся и в него
+        self.rebuild_target: Optional[
+            tuple[VectorStoreServiceBase, RecursiveCharacterTextSplitter]
+        ] = None
+        self._ingestion_tasks: set[asyncio.Task] = set()
+
+    async def process_query(
+        self,
+        prompt: str,
+        source: Optional[str] = None,
+        audience: Optional[str] = None,
+        faculties: Optional[list[str]] = None,
+        embedding: Optional[list[float]] = None,
+        generation_slots: Optional[asyncio.Semaphore] = None,
+        assignment_key: Optional[str] = None,
+        precompute: bool = False,
+        session_id: Optional[str] = None,
+    ) -> QueryResponse:
+        """Обработка запроса пользователя
+
+        Готовый эмбеддинг запроса (embedding) избавляет от обращения к сервису
+        эмбеддингов, generation_slots ограничивает число одновременных генераций.
+        При включенном эксперименте вариант выбирается по assignment_key (клиенту),
+        без него — по тексту запроса, результат пишется в журнал эксперимента.
+        precompute — подготовка ответа заранее: кэши не читаются, эксперимент
+        и журнал запросов не используются. С session_id запрос обрабатывается
+        как ход диалога: уточняющий вопрос ищется вместе с темой диалога (или
+        по чанкам предыдущего хода), LLM получает сжатую историю, а ответ не
+        кэшируется
+        """
+        arm = None
+        if self.experiment and not precompute:
+            arm = self.experiment.assign(assignment_key or self._normalize_prompt(prompt))
+        session = None
+        turn = None
+        if self.session_store and session_id and not precompute:
+            session = self.session_store.get(session_id)
+            turn = self.session_store.prepare(
+                session,
+                prompt,
+                filters={
+                    "source": source,
+                    "audience": audience,
+                    "faculties": sorted(faculties or []),
+                },
+            )
+        start_time = time.time()
+        with start_trace() as trace:
+            response = await self._process_query(
+                prompt,
+                source=source,
+                audience=audience,
+                faculties=faculties,
+                embedding=embedding,
+                generation_slots=generation_slots,
+                arm=arm,
+                use_cache=not precompute,
+                turn=turn,
+            )
+        if session and turn and not trace.error:
+            self.session_store.add_turn(session, prompt, turn, response.answer)
+        if self.query_log and not precompute:
+            self.query_log.append(
+                self._normalize_prompt(turn.search_query if turn else prompt),
+                self.query_log.encode_filters(source, audience, faculties),
+                (time.time() - start_time) * 1000,
+                response.confidence,
+                trace,
+            )
+        if arm and self.experiment_sink:
+            await self.experiment_sink.arecord(
+                self.experiment.name,
+                arm.name,
+                (time.time() - start_time) * 1000,
+                response.confidence,
+                trace,
+            )
+        return response
 
-    async def process_query(self, prompt: str) -> QueryResponse:
-        """Обработка запроса пользователя"""
+    async def _process_query(
+        self,
+        prompt: str,
+        source: Optional[str] = None,
+        audience: Optional[str] = None,
+        faculties: Optional[list[str]] = None,
+        embedding: Optional[list[float]] = None,
+        generation_slots: Optional[asyncio.Semaphore] = None,
+        arm: Optional["ExperimentArm"] = None,
+        use_cache: bool = True,
+        turn: Optional["PreparedTurn"] = None,
+    ) -> QueryResponse:
         start_time = time.time()
+        search_prompt = turn.search_query if turn else prompt
 
         try:
-            logger.info(f"Процессинг запроса: '{prompt}'")
-            search_results = await self.chroma_db.search(prompt)
-            logger.info(f"Найдено {len(search_results)} результатов из ChromaDB")
-
-            context_text = self._prepare_context(search_results)
-            logger.debug(f"Подготовлен контекст для LLM: {context_text[:500]}...")
-
-            answer = await self.llm_service.generate_response(prompt, context_text)
-            logger.info(f"Длина сгенерированного ответа: {len(answer)} символов")
+            logger.debug("Процессинг запроса: %r", prompt)
+            cache_key = None
+            # Ответ на уточнение зависит от истории диалога и не кэшируется
+            if (self.answer_cache or self.precomputed_answers) and not (
+                turn and turn.follow_up
+            ):
+                cache_key = self._answer_cache_key(
+                    prompt, source, audience, faculties, arm=arm.name if arm else None
+                )
+            if cache_key and use_cache:
+                cached = await self._get_cached_answer(cache_key, arm)
+                if cached is not None:
+                    return QueryResponse(
+                        **json.loads(cached),
+                        processing_time=time.time() - start_time,
+                    )
+
+            query_class = None
+            vector_store = self.vector_store
+            routed_store = None
+            if self.query_router:
+                route = self.query_router.classify(search_prompt)
+                logger.debug(
+                    "Класс запроса: %s (уверенность %.3f)",
+                    route.query_class,
+                    route.confidence,
+                )
+                if route.skip_retrieval:
+                    return QueryResponse(
+                        answer=self.CHITCHAT_ANSWER,
+                        confidence=0.0,
+                        processing_time=time.time() - start_time,
+                    )
+                query_class = route.query_class
+                routed_store = self.routed_collections.get(query_class)
+                vector_store = routed_store or self.vector_store
+            if arm and arm.collection:
+                vector_store = self.experiment_collections.get(
+                    arm.collection, vector_store
+                )
 
+            if turn and turn.reused:
+                search_results = turn.results
+                record_cache_hit("session")
+                logger.debug("Использованы результаты поиска предыдущего хода диалога")
+            else:
+                where = self._build_filter(source=source, audience=audience)
+                search_results = await self._retrieve(
+                    search_prompt,
+                    vector_store,
+                    where=where,
+                    faculties=faculties,
+                    embedding=embedding,
+                    arm=arm,
+                )
+                if not search_results and vector_store is routed_store:
+                    # В коллекцию класса еще не загружены документы по теме запроса
+                    logger.debug("Коллекция класса %s ничего не нашла, поиск в основной", query_class)
+                    search_results = await self._retrieve(
+                        search_prompt,
+                        self.vector_store,
+                        where=where,
+                        faculties=faculties,
+                        embedding=embedding,
+                        arm=arm,
+                    )
+            if turn:
+                turn.results = search_results
+
+            context_text = self._prepare_context(
+                search_results, limit=arm.context_chunks if arm else None
+            )
+            logger.debug("Подготовлен контекст для LLM: %.500s...", context_text)
+
+            async with generation_slots or contextlib.nullcontext():
+                with trace_stage("generation"):
+                    answer = await self.llm_service.generate_response(
+                        prompt,
+                        context_text,
+                        query_class=query_class,
+                        prompt_variant=arm.prompt_variant if arm else None,
+                        history=turn.history if turn else None,
+                    )
             confidence = self._calculate_confidence(search_results, answer)
-            logger.info(f"Рассчитанная уверенность в ответе: {confidence}")
+
+            if answer == self.llm_service.UNAVAILABLE_ANSWER:
+                self._mark_trace_error()
+            elif cache_key and self.answer_cache:
+                await self.answer_cache.aset(
+                    cache_key,
+                    json.dumps(
+                        {"answer": answer, "confidence": confidence}, ensure_ascii=False
+                    ).encode("utf-8"),
+                )
 
             processing_time = time.time() - start_time
+            logger.info(
+                "Запрос обработан за %.3f с",
+                processing_time,
+                extra={
+                    "results": len(search_results),
+                    "answer_length": len(answer),
+                    "confidence": confidence,
+                    "query_class": query_class,
+                    "arm": arm.name if arm else None,
+                },
+            )
 
             return QueryResponse(
                 answer=answer,
@@ -58,6 +300,7 @@ class RAGService:
 
         except Exception as e:
             logger.error(f"Ошибка при обработке запроса: {e}", exc_info=True)
+            self._mark_trace_error()
             processing_time = time.time() - start_time
             return QueryResponse(
                 answer="При обработке запроса произошла ошибка.",
@@ -65,32 +308,334 @@ class RAGService:
                 processing_time=processing_time,
             )
 
-    def _prepare_context(self, search_results: list[dict[str, Any]]) -> str:
-        """Подготовка контекста из результатов поиска"""
+    async def _retrieve(
+        self,
+        prompt: str,
+        vector_store: VectorStoreServiceBase,
+        where: Optional[dict[str, Any]] = None,
+        faculties: Optional[list[str]] = None,
+        embedding: Optional[list[float]] = None,
+        arm: Optional["ExperimentArm"] = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск контекста: стратегия варианта эксперимента или векторный поиск,
+        затем замена чанков их разделами"""
+        if arm and arm.strategy:
+            from app.services.retrieval.retriever import Retriever
+
+            search_results = await Retriever(
+                vector_store, lexical_index=self.lexical_indexes.get(arm.name)
+            ).retrieve(
+                prompt,
+                arm.strategy,
+                embedding=embedding,
+                where=where,
+                partitions=faculties,
+            )
+        elif embedding is None:
+            search_results = await vector_store.search(
+                prompt, where=where, partitions=faculties
+            )
+        else:
+            with trace_stage("search"):
+                search_results = await vector_store.search_by_vector(
+                    embedding, where=where, partitions=faculties
+                )
+        logger.debug("Найдено %d результатов в векторном хранилище", len(search_results))
+        record_retrieved(search_results)
+        if self.parent_store:
+            search_results = self.parent_store.resolve(search_results)
+            logger.debug("Найденные чанки относятся к %d разделам", len(search_results))
+        return search_results
+
+    async def process_batch(
+        self, queries: list[QueryRequest], max_concurrency: int = 4
+    ) -> AsyncIterator[tuple[int, QueryResponse]]:
+        """Обработка пачки запросов с выдачей результатов по мере готовности
+
+        Эмбеддинги всех вопросов запрашиваются одним вызовом, поиск выполняется
+        параллельно, генерация ответов — не более max_concurrency одновременно.
+        Каждый результат отдается вместе с индексом запроса в пачке
+        """
+        embeddings: list[Optional[list[float]]] = [None] * len(queries)
+        try:
+            embeddings = await self.vector_store.embedding_service.embed_queries(
+                [query.prompt for query in queries]
+            )
+        except Exception as e:
+            logger.warning(
+                f"Не удалось получить эмбеддинги пачки запросов: {e!r}, запросы будут векторизованы по одному"
+            )
+        generation_slots = asyncio.Semaphore(max_concurrency)
+
+        async def run(index: int) -> tuple[int, QueryResponse]:
+            query = queries[index]
+            return index, await self.process_query(
+                query.prompt,
+                source=query.source,
+                audience=query.audience,
+                faculties=query.faculties,
+                embedding=embeddings[index],
+                generation_slots=generation_slots,
+            )
+
+        tasks = [asyncio.create_task(run(index)) for index in range(len(queries))]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # Клиент мог отключиться, не дочитав ответ
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _mark_trace_error() -> None:
+        trace = current_trace()
+        if trace is not None:
+            trace.error = True
+
+    @staticmethod
+    def _normalize_prompt(prompt: str) -> str:
+        """Запрос без учета регистра и лишних пробелов"""
+        return " ".join(prompt.lower().split())
+
+    @classmethod
+    def _answer_cache_key(
+        cls,
+        prompt: str,
+        source: Optional[str],
+        audience: Optional[str],
+        faculties: Optional[list[str]],
+        arm: Optional[str] = None,
+    ) -> str:
+        """Ключ кэша ответов: нормализованный запрос вместе с фильтрами
+
+        Ответы вариантов эксперимента кэшируются отдельно, ключи без эксперимента
+        не меняются
+        """
+        fields = [cls._normalize_prompt(prompt), source, audience, sorted(faculties or [])]
+        if arm:
+            fields.append(arm)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _get_cached_answer(
+        self, cache_key: str, arm: Optional["ExperimentArm"]
+    ) -> Optional[bytes]:
+        """Ответ из кэша ответов или из подготовленных ответов на частые вопросы
+
+        Подготовленные ответы не зависят от варианта эксперимента и выдаются
+        только без него
+        """
+        if self.answer_cache:
+            cached = await self.answer_cache.aget(cache_key)
+            if cached is not None:
+                logger.info("Ответ найден в кэше")
+                record_cache_hit("answer")
+                return cached
+        if self.precomputed_answers and arm is None:
+            cached = await self.precomputed_answers.aget(cache_key)
+            if cached is not None:
+                logger.info("Найден подготовленный ответ на частый вопрос")
+                record_cache_hit("precomputed")
+                return cached
+        return None
+
+    def invalidate_answer_cache(self, source: Optional[str] = None) -> None:
+        """Сброс кэша ответов после изменения базы знаний
+
+        Подготовленные ответы помечаются устаревшими, только если зависят от
+        измененного документа source (без него — все)
+        """
+        if self.answer_cache:
+            self.answer_cache.clear()
+        if self.precomputed_answers:
+            self.precomputed_answers.invalidate(source)
+
+    @staticmethod
+    def _build_filter(
+        source: Optional[str] = None,
+        audience: Optional[str] = None,
+    ) -> Optional[dict[str, Any]]:
+        """Построение фильтра по метаданным чанков"""
+        conditions: list[dict[str, Any]] = []
+        if source:
+            conditions.append({"source": source})
+        if audience:
+            conditions.append({"audience": {"$in": [audience, "all"]}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def _prepare_context(
+        self, search_results: list[dict[str, Any]], limit: Optional[int] = None
+    ) -> str:
+        """Подготовка контекста из не более limit (по умолчанию context_chunks) результатов поиска"""
         if not search_results:
             return "Информация не найдена в базе знаний."
 
         context_parts = []
-        for _, result in enumerate(search_results[:3], 1):
+        for _, result in enumerate(search_results[: limit or self.context_chunks], 1):
             content = result.get("content", "")
             similarity = result.get("similarity_score", 0.0)
 
             context_parts.append(f"Релевантность: {similarity:.3f}:\n{content}\n")
         context = "\n---\n".join(context_parts)
-        logger.info(
-            f"Подготовлен контекст из {len(search_results[:3])} источников. Длина контекста: {len(context)}"
+        logger.debug(
+            "Подготовлен контекст из %d источников. Длина контекста: %d",
+            len(context_parts),
+            len(context),
         )
         return context
 
+    @staticmethod
+    def _detect_sections(content: str) -> list[tuple[int, str]]:
+        """Поиск заголовков разделов документа (строки в верхнем регистре)"""
+        return [
+            (match.start(), match.group(1).strip())
+            for match in SECTION_HEADING_PATTERN.finditer(content)
+        ]
+
+    def _build_chunk_metadatas(
+        self,
+        content: str,
+        chunks: list[str],
+        filename: str,
+        audience: Optional[str] = None,
+        faculty: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        """Формирование метаданных чанков документа"""
+        sections = self._detect_sections(content)
+        ingested_at = int(time.time())
+
+        metadatas = []
+        cursor = 0
+        for chunk in chunks:
+            position = content.find(chunk, cursor)
+            if position >= 0:
+                cursor = position
+            section = ""
+            for section_start, heading in sections:
+                if section_start > cursor:
+                    break
+                section = heading
+
+            metadata = {
+                "source": filename,
+                "section": section,
+                "audience": audience or "all",
+                "ingested_at": ingested_at,
+                "content_hash": hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
+            }
+            if faculty:
+                metadata["faculty"] = faculty
+            metadatas.append(metadata)
+        return metadatas
+
+    def split_document(
+        self,
+        content: str,
+        filename: str,
+        text_splitter: Optional[RecursiveCharacterTextSplitter] = None,
+    ) -> tuple[list[str], list[Optional[str]], dict[str, str]]:
+        """Разбиение документа на чанки для векторного хранилища
+
+        Returns:
+            tuple: Чанки, id раздела каждого чанка и тексты разделов по id
+            (без хранилища разделов id равны None, разделов нет)
+        """
+        text_splitter = text_splitter or self.text_splitter
+        if not (self.parent_store and self.parent_splitter):
+            chunks = text_splitter.split_text(content)
+            return chunks, [None] * len(chunks), {}
+
+        chunks: list[str] = []
+        chunk_parents: list[Optional[str]] = []
+        parents: dict[str, str] = {}
+        for i, section in enumerate(self.parent_splitter.split_text(content)):
+            digest = hashlib.sha256(section.encode("utf-8")).hexdigest()[:12]
+            parent_id = f"{filename}#{i}:{digest}"
+            parents[parent_id] = section
+            section_chunks = text_splitter.split_text(section)
+            chunks.extend(section_chunks)
+            chunk_parents.extend([parent_id] * len(section_chunks))
+        return chunks, chunk_parents, parents
+
     async def add_document(
         self,
         content: str,
         filename: str,
+        audience: Optional[str] = None,
+        faculty: Optional[str] = None,
+        vector_store: Optional[VectorStoreServiceBase] = None,
+        text_splitter: Optional[RecursiveCharacterTextSplitter] = None,
+        query_class: Optional[str] = None,
+        durable: bool = False,
     ) -> bool:
-        """Добавление документа в систему"""
+        """Добавление документа в систему
+
+        Документы с указанным факультетом сохраняются в отдельный раздел коллекции,
+        с классом запросов query_class — в коллекцию этого класса (QUERY_ROUTER_COLLECTIONS).
+        По умолчанию документ пишется в основное хранилище текущим text_splitter.
+        С durable документ сохраняется на диск до возврата (загрузка через API),
+        иначе — ближайшей контрольной точкой хранилища (наблюдатель за каталогом и
+        загрузка при старте, где документы можно прочитать заново).
+        Начатая запись не прерывается вместе с запросом, при остановке приложения
+        ее дожидается wait_for_ingestion
+        """
+        if query_class and query_class not in self.routed_collections:
+            raise ValueError(f"Для класса запросов '{query_class}' не задана коллекция")
+        task = asyncio.create_task(
+            self._add_document(
+                content,
+                filename,
+                audience=audience,
+                faculty=faculty,
+                vector_store=vector_store,
+                text_splitter=text_splitter,
+                query_class=query_class,
+                durable=durable,
+            )
+        )
+        self._ingestion_tasks.add(task)
+        task.add_done_callback(self._ingestion_tasks.discard)
+        return await asyncio.shield(task)
+
+    async def wait_for_ingestion(self, timeout: float) -> int:
+        """Ожидание начатых записей документов
+
+        Returns:
+            int: Количество записей, не завершившихся за timeout
+        """
+        if not self._ingestion_tasks:
+            return 0
+        _, pending = await asyncio.wait(set(self._ingestion_tasks), timeout=timeout)
+        return len(pending)
+
+    async def _add_document(
+        self,
+        content: str,
+        filename: str,
+        audience: Optional[str] = None,
+        faculty: Optional[str] = None,
+        vector_store: Optional[VectorStoreServiceBase] = None,
+        text_splitter: Optional[RecursiveCharacterTextSplitter] = None,
+        query_class: Optional[str] = None,
+        durable: bool = False,
+    ) -> bool:
+        # Запись в хранилище, которое обслуживает запросы (не в теневое поколение)
+        live = vector_store is None
+        if live and query_class:
+            vector_store = self.routed_collections[query_class]
+        store = vector_store or self.vector_store
         try:
             logger.info(f"Добавление документа: {filename}")
-            chunks = self.text_splitter.split_text(content)
+            with trace_stage("split"):
+                chunks, chunk_parents, parents = self.split_document(
+                    content, filename, text_splitter
+                )
             logger.info(f"Документ '{filename}' разделен на {len(chunks)} чанков.")
 
             if not chunks:
@@ -101,16 +646,69 @@ class RAGService:
 
             ids = [f"{filename}_{i}" for i in range(len(chunks))]
 
-            success = await self.chroma_db.add_documents(
+            metadatas = self._build_chunk_metadatas(
+                content, chunks, filename, audience=audience, faculty=faculty
+            )
+            previous_hashes = (
+                await store.get_source_hashes(filename, partition=faculty)
+                if live
+                else None
+            )
+            if parents:
+                for metadata, parent_id in zip(metadatas, chunk_parents):
+                    metadata["parent_id"] = parent_id
+                # Разделы пишутся до чанков, чтобы найденный чанк всегда имел раздел
+                with trace_stage("parent_store"):
+                    await asyncio.to_thread(self.parent_store.put, filename, parents)
+                logger.info(f"Документ '{filename}' разделен на {len(parents)} разделов.")
+
+            success = await store.add_documents(
                 documents=chunks,
                 ids=ids,
+                metadatas=metadatas,
+                partition=faculty,
             )
             if success:
                 logger.info(
                     f"Документ {filename} успешно добавлен (Кол-во чанков: {len(chunks)})."
                 )
+                # Чанки прошлой версии документа, не перезаписанные новой
+                with trace_stage("delete_stale"):
+                    await store.delete_by_source(
+                        filename, partition=faculty, keep_ids=ids
+                    )
+                if durable:
+                    with trace_stage("flush"):
+                        await asyncio.to_thread(store.flush)
             else:
-                logger.error(f"Не удалось добавить документ {filename} в ChromaDB.")
+                logger.error(
+                    f"Не удалось добавить документ {filename} в векторное хранилище."
+                )
+
+            # Повторная загрузка того же текста (например, при старте) не сбрасывает ответы
+            if (
+                success
+                and live
+                and previous_hashes
+                != {
+                    record_id: metadata["content_hash"]
+                    for record_id, metadata in zip(ids, metadatas)
+                }
+            ):
+                with trace_stage("cache_invalidation"):
+                    await asyncio.to_thread(self.invalidate_answer_cache, filename)
+
+            # Пересобирается только основное хранилище
+            if success and live and not query_class and self.rebuild_target:
+                shadow, shadow_splitter = self.rebuild_target
+                await self._add_document(
+                    content,
+                    filename,
+                    audience=audience,
+                    faculty=faculty,
+                    vector_store=shadow,
+                    text_splitter=shadow_splitter,
+                )
             return success
 
         except Exception as e:
@@ -120,9 +718,25 @@ class RAGService:
             )
             return False
 
+    async def delete_document(self, filename: str, faculty: Optional[str] = None) -> int:
+        """Удаление документа из системы (и из теневого поколения во время пересборки)
+
+        Returns:
+            int: Количество удаленных чанков
+        """
+        deleted = await self.vector_store.delete_by_source(filename, partition=faculty)
+        if self.rebuild_target:
+            await self.rebuild_target[0].delete_by_source(filename, partition=faculty)
+        if self.parent_store:
+            await asyncio.to_thread(self.parent_store.delete_source, filename)
+        if deleted:
+            await asyncio.to_thread(self.invalidate_answer_cache, filename)
+        logger.info(f"Документ {filename} удален (Кол-во чанков: {deleted}).")
+        return deleted
+
     async def health_check(self):
         """Проверка работоспособности сервиса"""
-        chroma_db_healthy = await self.chroma_db.health_check()
+        chroma_db_healthy = await self.vector_store.health_check()
         llm_healthy = await self.llm_service.health_check()
 
         chroma_db_status = "healthy" if chroma_db_healthy else "unhealthy"
@@ -131,7 +745,7 @@ class RAGService:
         documents_count = 0
         if chroma_db_healthy:
             try:
-                db_info = self.chroma_db.get_collection_info()
+                db_info = self.vector_store.get_collection_info()
                 documents_count = db_info.get("documents_count", 0)
             except Exception as e:
                 logger.error(
@@ -196,9 +810,14 @@ class RAGService:
 
         final_confidence = max(0.0, min(confidence, 1.0))
 
-        logger.info(
-            f"Расчет уверенности в ответе: avg_sim={avg_similarity:.4f}, max_sim={max_similarity:.4f}, "
-            f"relevant_count={relevant_count}, uncertainty={has_uncertainty}, final={final_confidence:.4f}"
+        logger.debug(
+            "Расчет уверенности в ответе: avg_sim=%.4f, max_sim=%.4f, "
+            "relevant_count=%d, uncertainty=%s, final=%.4f",
+            avg_similarity,
+            max_similarity,
+            relevant_count,
+            has_uncertainty,
+            final_confidence,
         )
 
         return round(final_confidence, 3)
@@ -0,0 +1,238 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+import asyncio
+import logging
+import time
+
+from filelock import FileLock, Timeout
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.rag_service import RAGService
+from app.services.upstream_scheduler import Priority, request_priority
+
+logger = logging.getLogger(__name__)
+
+
+class RebuildService:
+    """Пересборка основной коллекции в теневое поколение с последующим переключением
+
+    Документы из documents_directory заново разбиваются и векторизуются с
+    ограничением скорости (чанков в секунду), остальные записи текущего поколения
+    (загруженные через API, разделы факультетов) копируются вместе с векторами.
+    Пока идет пересборка, новые документы пишутся в оба поколения. Пересборку и
+    откат одновременно выполняет только один воркер (файловая блокировка lock_path).
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        documents_directory: str = "./documents",
+        embedding_rate: float = 20.0,
+        min_documents_ratio: float = 0.9,
+        validation_queries: Optional[list[str]] = None,
+        lock_path: str = "./cache/rebuild.lock",
+    ):
+        self.rag_service = rag_service
+        self.documents_directory = Path(documents_directory)
+        self.embedding_rate = embedding_rate
+        self.min_documents_ratio = min_documents_ratio
+        self.validation_queries = validation_queries or []
+        self.status: dict[str, Any] = {"state": "idle"}
+        self._task: Optional[asyncio.Task] = None
+        self._previous_text_splitter: Optional[RecursiveCharacterTextSplitter] = None
+        Path(lock_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = FileLock(lock_path)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """Запуск пересборки в фоне
+
+        Args:
+            chunk_size (Optional[int]): Новый размер чанка, по умолчанию текущий
+            chunk_overlap (Optional[int]): Новое перекрытие чанков, по умолчанию текущее
+
+        Returns:
+            dict[str, Any]: Статус пересборки
+        """
+        if self.is_running:
+            raise RuntimeError("Пересборка уже выполняется")
+        current = self.rag_service.text_splitter
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size or current._chunk_size,
+            chunk_overlap=chunk_overlap if chunk_overlap is not None else current._chunk_overlap,
+            length_function=len,
+        )
+        self._acquire_lock()
+        self.status = {
+            "state": "running",
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "chunk_size": text_splitter._chunk_size,
+            "chunk_overlap": text_splitter._chunk_overlap,
+            "files_processed": 0,
+            "chunks_embedded": 0,
+            "records_copied": 0,
+        }
+        self._task = asyncio.create_task(self._run(text_splitter))
+        return self.status
+
+    async def stop(self, timeout: float) -> None:
+        """Ожидание пересборки при остановке приложения, по истечении timeout она прерывается
+
+        Прерванное теневое поколение не переключается и удаляется при следующей пересборке
+        """
+        if not self.is_running:
+            return
+        logger.info(f"Ожидание завершения пересборки коллекции (до {timeout:.0f} с)")
+        done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self.status["state"] = "cancelled"
+            logger.warning("Пересборка коллекции прервана остановкой приложения")
+
+    def rollback(self) -> bool:
+        """Возврат основной коллекции к предыдущему поколению"""
+        if self.is_running:
+            raise RuntimeError("Пересборка еще выполняется")
+        self._acquire_lock()
+        try:
+            if not self.rag_service.vector_store.rollback():
+                return False
+        finally:
+            self._lock.release()
+        if self._previous_text_splitter:
+            self.rag_service.text_splitter, self._previous_text_splitter = (
+                self._previous_text_splitter,
+                self.rag_service.text_splitter,
+            )
+        self.rag_service.invalidate_answer_cache()
+        return True
+
+    async def _run(self, text_splitter: RecursiveCharacterTextSplitter) -> None:
+        live = self.rag_service.vector_store
+        started = time.perf_counter()
+        request_priority.set(Priority.BACKGROUND)
+        try:
+            shadow = await asyncio.to_thread(live.create_shadow)
+            self.status["generation"] = shadow.get_collection_info().get("generation")
+            self.rag_service.rebuild_target = (shadow, text_splitter)
+
+            rebuilt_sources = await self._ingest_documents(shadow, text_splitter)
+            self.status["records_copied"] = await asyncio.to_thread(
+                self._copy_remaining, live, shadow, rebuilt_sources
+            )
+            await asyncio.to_thread(shadow.flush)
+
+            self.status["state"] = "validating"
+            await self._validate(live, shadow)
+
+            live.promote(shadow)
+            self._previous_text_splitter = self.rag_service.text_splitter
+            self.rag_service.text_splitter = text_splitter
+            await asyncio.to_thread(self.rag_service.invalidate_answer_cache)
+            self.status["state"] = "completed"
+        except Exception as e:
+            logger.error(f"Пересборка коллекции завершилась ошибкой: {e}", exc_info=True)
+            self.status["state"] = "failed"
+            self.status["error"] = str(e)
+        finally:
+            self._lock.release()
+            self.rag_service.rebuild_target = None
+            self.status["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            self.status["duration"] = round(time.perf_counter() - started, 2)
+            logger.info(f"Пересборка коллекции: {self.status}")
+
+    def _acquire_lock(self) -> None:
+        try:
+            self._lock.acquire(timeout=0)
+        except Timeout:
+            raise RuntimeError("Пересборка или откат уже выполняется в другом воркере")
+
+    async def _ingest_documents(
+        self,
+        shadow: VectorStoreServiceBase,
+        text_splitter: RecursiveCharacterTextSplitter,
+    ) -> set[str]:
+        """Векторизация документов каталога с ограничением скорости"""
+        files = sorted(self.documents_directory.glob("*.txt"))
+        self.status["files_total"] = len(files)
+        next_slot = time.monotonic()
+        for file_path in files:
+            content = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
+            chunks, _, _ = self.rag_service.split_document(
+                content, file_path.name, text_splitter
+            )
+            chunks_count = len(chunks)
+
+            delay = next_slot - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_slot = max(next_slot, time.monotonic()) + chunks_count / self.embedding_rate
+
+            success = await self.rag_service.add_document(
+                content,
+                file_path.name,
+                vector_store=shadow,
+                text_splitter=text_splitter,
+            )
+            if not success:
+                raise RuntimeError(f"Не удалось добавить документ {file_path.name}")
+            self.status["files_processed"] += 1
+            self.status["chunks_embedded"] += chunks_count
+        return {file_path.name for file_path in files}
+
+    @staticmethod
+    def _copy_remaining(
+        live: VectorStoreServiceBase,
+        shadow: VectorStoreServiceBase,
+        rebuilt_sources: set[str],
+    ) -> int:
+        """Перенос записей, которых нет в каталоге документов, без повторной векторизации"""
+        copied = 0
+        for partition in [None, *live.partitions]:
+            for batch in live.iter_records(partition=partition):
+                keep = [
+                    i
+                    for i, metadata in enumerate(batch["metadatas"])
+                    if partition or metadata.get("source") not in rebuilt_sources
+                ]
+                if not keep:
+                    continue
+                shadow.upsert_records(
+                    [batch["ids"][i] for i in keep],
+                    [batch["documents"][i] for i in keep],
+                    [batch["metadatas"][i] for i in keep],
+                    batch["embeddings"][keep],
+                    partition=partition,
+                )
+                copied += len(keep)
+        return copied
+
+    async def _validate(
+        self, live: VectorStoreServiceBase, shadow: VectorStoreServiceBase
+    ) -> None:
+        """Проверка теневого поколения перед переключением"""
+        live_count, shadow_count = await asyncio.to_thread(
+            lambda: (
+                sum(live.count(p) for p in [None, *live.partitions]),
+                sum(shadow.count(p) for p in [None, *shadow.partitions]),
+            )
+        )
+        self.status["live_count"] = live_count
+        self.status["shadow_count"] = shadow_count
+        if shadow_count < live_count * self.min_documents_ratio:
+            raise RuntimeError(
+                f"В новом поколении {shadow_count} записей, в текущем {live_count}"
+            )
+        for query in self.validation_queries:
+            if not await shadow.search(query):
+                raise RuntimeError(f"Новое поколение не нашло результатов по запросу '{query}'")
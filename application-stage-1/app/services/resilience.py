@@ -0,0 +1,282 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from app.services.upstream_scheduler import UpstreamLane, error_status_code
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+resilient_callers: dict[str, "ResilientCaller"] = {}
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен: внешний API недоступен, автомат разомкнут"""
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """Исчерпано время, отведенное на обработку запроса"""
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Сквозной дедлайн для всех вызовов внешних API внутри блока
+
+    Вложенный дедлайн не может продлить внешний
+    """
+    deadline = time.monotonic() + seconds
+    current = request_deadline.get()
+    token = request_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Оставшееся до дедлайна время в секундах (None если дедлайн не задан)"""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Повторяются таймауты, сетевые ошибки, 429 и ответы 5xx"""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return not isinstance(error, DeadlineExceededError)
+    status_code = error_status_code(error)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+class CircuitBreaker:
+    """Автомат отключения: после failure_threshold ошибок подряд вызовы отклоняются
+    recovery_timeout секунд, затем пропускается один пробный вызов. Пробный вызов,
+    не завершившийся за recovery_timeout, считается потерянным и заменяется новым"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def before_call(self) -> bool:
+        """Проверка перед вызовом
+
+        Returns:
+            bool: True, если вызов пробный и после него нужен record_* или release_probe
+        """
+        if self.state == "closed":
+            return False
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.recovery_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and (
+            not self._probe_in_flight or now - self._probe_started >= self.recovery_timeout
+        ):
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(f"Сервис {self.name} недоступен, вызов отклонен")
+
+    def release_probe(self, probe: bool) -> None:
+        """Пробный вызов завершился без ответа сервиса (отмена, дедлайн): следующий
+        вызов станет пробным"""
+        if probe:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Автомат {self.name} замкнут, сервис снова доступен")
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(
+                    f"Автомат {self.name} разомкнут после {self.failures} ошибок, пауза {self.recovery_timeout} с"
+                )
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def get_state(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientCaller:
+    """Вызов внешнего API с автоматом отключения, повторами и дедлайном
+
+    Повторы ждут по схеме decorrelated jitter: min(max_delay, U(base_delay, 3 * prev)).
+    Если hedge_enabled, то при отсутствии ответа дольше p95 успешных вызовов
+    (не меньше hedge_min_delay) параллельно отправляется второй запрос и
+    используется первый пришедший ответ.
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        attempt_timeout: float = 10.0,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 0.5,
+    ):
+        self.breaker = breaker
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.latencies: deque[float] = deque(maxlen=500)
+        self.hedged = 0
+        resilient_callers[breaker.name] = self
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < 20:
+            return max(self.hedge_min_delay, self.attempt_timeout / 2)
+        ordered = sorted(self.latencies)
+        return max(self.hedge_min_delay, ordered[int(len(ordered) * 0.95)])
+
+    def _attempt_timeout(self) -> float:
+        remaining = remaining_time()
+        if remaining is None:
+            return self.attempt_timeout
+        if remaining <= 0:
+            raise DeadlineExceededError("Время обработки запроса истекло")
+        return min(self.attempt_timeout, remaining)
+
+    async def call(
+        self, call: Callable[[], Awaitable[T]], lane: Optional[UpstreamLane] = None
+    ) -> T:
+        """Вызов с повторами; при lane каждая попытка сначала ждет разрешения в очереди
+
+        Ожидание в очереди ограничено только дедлайном запроса: в таймаут попытки
+        и в ошибки автомата отключения входит лишь сам запрос к сервису
+        """
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            probe = self.breaker.before_call()
+            try:
+                if self.hedge_enabled:
+                    result = await self._hedged(call, lane)
+                else:
+                    result = await self._attempt(call, lane)
+            except DeadlineExceededError:
+                # Время запроса истекло до обращения к сервису
+                self.breaker.release_probe(probe)
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable or isinstance(e, asyncio.TimeoutError):
+                    self.breaker.record_failure()
+                else:
+                    # Ошибка запроса (4xx), а не недоступность сервиса
+                    self.breaker.record_success()
+                if not retryable or attempt == self.max_attempts:
+                    raise
+                delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+                remaining = remaining_time()
+                if remaining is not None and remaining <= delay:
+                    raise
+                logger.warning(
+                    f"Ошибка вызова {self.breaker.name} (попытка {attempt}): {e!r}, повтор через {delay:.2f} с"
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Отмена вызова (пакет, проигравший hedged-запрос, остановка)
+                self.breaker.release_probe(probe)
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        raise RuntimeError("Недостижимо")
+
+    async def _acquire(self, lane: Optional[UpstreamLane]) -> None:
+        if lane is None:
+            return
+        try:
+            await lane.acquire(timeout=remaining_time())
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(
+                f"Время обработки запроса истекло в очереди {lane.name}"
+            ) from None
+
+    async def _send(self, call: Callable[[], Awaitable[T]], lane: Optional[UpstreamLane]) -> T:
+        """Запрос к сервису с таймаутом попытки; разрешение lane уже получено"""
+
+        async def timed() -> T:
+            timeout = self._attempt_timeout()
+            started = time.monotonic()
+            result = await asyncio.wait_for(call(), timeout)
+            self.latencies.append(time.monotonic() - started)
+            return result
+
+        if lane is None:
+            return await timed()
+        return await lane.run_acquired(timed)
+
+    async def _attempt(self, call: Callable[[], Awaitable[T]], lane: Optional[UpstreamLane]) -> T:
+        await self._acquire(lane)
+        return await self._send(call, lane)
+
+    async def _hedged(self, call: Callable[[], Awaitable[T]], lane: Optional[UpstreamLane]) -> T:
+        # Задержка второго запроса отсчитывается от отправки первого, а не от очереди
+        await self._acquire(lane)
+        tasks = {asyncio.ensure_future(self._send(call, lane))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done:
+                self.hedged += 1
+                tasks.add(asyncio.ensure_future(self._attempt(call, lane)))
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            **self.breaker.get_state(),
+            "hedged": self.hedged,
+            "hedge_delay": round(self.hedge_delay(), 3),
+        }
@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+from typing import Any, Optional
+import math
+import re
+
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def lexical_terms(text: str, stem_length: int = 5) -> list[str]:
+    """Токены текста, усеченные до stem_length символов (грубый стемминг для русского)"""
+    return [token[:stem_length] for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class BM25Index:
+    """Лексический индекс BM25 по чанкам коллекции для гибридного поиска"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, stem_length: int = 5):
+        self.k1 = k1
+        self.b = b
+        self.stem_length = stem_length
+        self.documents: dict[str, tuple[str, dict[str, Any]]] = {}
+        self.term_frequencies: dict[str, Counter[str]] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, set[str]] = defaultdict(set)
+        self.total_length = 0
+
+    @classmethod
+    def from_vector_store(
+        cls, vector_store: VectorStoreServiceBase, partition: Optional[str] = None, **kwargs
+    ) -> "BM25Index":
+        index = cls(**kwargs)
+        for batch in vector_store.iter_records(partition=partition):
+            index.add(batch["ids"], batch["documents"], batch["metadatas"])
+        return index
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+    ) -> None:
+        for i, (doc_id, document) in enumerate(zip(ids, documents)):
+            if doc_id in self.documents:
+                self.remove([doc_id])
+            frequencies = Counter(lexical_terms(document, self.stem_length))
+            self.documents[doc_id] = (document, metadatas[i] if metadatas else {})
+            self.term_frequencies[doc_id] = frequencies
+            self.lengths[doc_id] = sum(frequencies.values())
+            self.total_length += self.lengths[doc_id]
+            for term in frequencies:
+                self.postings[term].add(doc_id)
+
+    def remove(self, ids: list[str]) -> None:
+        for doc_id in ids:
+            frequencies = self.term_frequencies.pop(doc_id, None)
+            if frequencies is None:
+                continue
+            del self.documents[doc_id]
+            self.total_length -= self.lengths.pop(doc_id)
+            for term in frequencies:
+                self.postings[term].discard(doc_id)
+
+    def search(self, query: str, limit: int = 4) -> list[dict[str, Any]]:
+        """Поиск чанков по словам запроса
+
+        Returns:
+            list[dict[str, Any]]: Результаты с ключами id, content, metadata, lexical_score
+        """
+        if not self.documents:
+            return []
+        average_length = self.total_length / len(self.documents)
+        scores: dict[str, float] = defaultdict(float)
+        for term in set(lexical_terms(query, self.stem_length)):
+            matched = self.postings.get(term)
+            if not matched:
+                continue
+            idf = math.log(
+                1 + (len(self.documents) - len(matched) + 0.5) / (len(matched) + 0.5)
+            )
+            for doc_id in matched:
+                frequency = self.term_frequencies[doc_id][term]
+                length_norm = 1 - self.b + self.b * self.lengths[doc_id] / average_length
+                scores[doc_id] += (
+                    idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                )
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [
+            {
+                "id": doc_id,
+                "content": self.documents[doc_id][0],
+                "metadata": self.documents[doc_id][1],
+                "lexical_score": score,
+            }
+            for doc_id, score in ranked
+        ]
@@ -0,0 +1,119 @@
+from pathlib import Path
+from typing import Any, Optional
+import logging
+import threading
+
+from app.services.cache.sqlite_cache import open_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ParentStore:
+    """Родительские разделы документов для поиска small-to-big
+
+    В векторном хранилище индексируются только небольшие дочерние чанки,
+    в их метаданных хранится parent_id. Тексты разделов лежат в локальном
+    файле SQLite и в памяти (словарь id -> текст), поэтому подстановка
+    раздела вместо найденного чанка не требует запросов к хранилищу.
+    Идентификатор раздела включает хэш его текста: раздел, измененный
+    другим воркером, получает новый id и читается из файла
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._connection = open_sqlite(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            "id TEXT PRIMARY KEY, source TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS parents_source ON parents (source)"
+        )
+        self.parents: dict[str, str] = dict(
+            self._connection.execute("SELECT id, content FROM parents")
+        )
+        logger.info(f"Загружено родительских разделов: {len(self.parents)}")
+
+    def put(self, source: str, parents: dict[str, str]) -> None:
+        """Замена разделов документа source"""
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                stale = [
+                    parent_id
+                    for (parent_id,) in self._connection.execute(
+                        "SELECT id FROM parents WHERE source = ?", [source]
+                    )
+                    if parent_id not in parents
+                ]
+                self._connection.executemany(
+                    "DELETE FROM parents WHERE id = ?", [(parent_id,) for parent_id in stale]
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO parents (id, source, content) VALUES (?, ?, ?)",
+                    [(parent_id, source, content) for parent_id, content in parents.items()],
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            for parent_id in stale:
+                self.parents.pop(parent_id, None)
+            self.parents.update(parents)
+
+    def delete_source(self, source: str) -> int:
+        with self._lock:
+            ids = [
+                parent_id
+                for (parent_id,) in self._connection.execute(
+                    "SELECT id FROM parents WHERE source = ?", [source]
+                )
+            ]
+            self._connection.execute("DELETE FROM parents WHERE source = ?", [source])
+            for parent_id in ids:
+                self.parents.pop(parent_id, None)
+        return len(ids)
+
+    def get(self, parent_id: str) -> Optional[str]:
+        content = self.parents.get(parent_id)
+        if content is None:
+            # Раздел мог добавить другой воркер
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT content FROM parents WHERE id = ?", [parent_id]
+                ).fetchone()
+            if row:
+                content = self.parents[parent_id] = row[0]
+        return content
+
+    def resolve(self, results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Замена найденных чанков их разделами без повторов
+
+        Порядок задает лучший чанк раздела, similarity_score — его сходство.
+        Чанки без раздела (загруженные до включения режима) остаются как есть
+        """
+        resolved: dict[str, dict[str, Any]] = {}
+        for result in results:
+            parent_id = result.get("metadata", {}).get("parent_id")
+            content = self.get(parent_id) if parent_id else None
+            if content is None:
+                resolved.setdefault(result["id"], result)
+            elif parent_id in resolved:
+                resolved[parent_id]["matched_chunks"] += 1
+            else:
+                resolved[parent_id] = {
+                    **result,
+                    "id": parent_id,
+                    "content": content,
+                    "child_id": result["id"],
+                    "matched_chunks": 1,
+                }
+        return list(resolved.values())
+
+    def count(self) -> int:
+        return len(self.parents)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
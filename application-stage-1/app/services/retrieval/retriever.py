@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+import logging
+
+import numpy as np
+
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+from app.services.retrieval.lexical_index import BM25Index, lexical_terms
+from app.services.tracing import trace_stage
+
+logger = logging.getLogger(__name__)
+
+# Сглаживание в Reciprocal Rank Fusion (значение из исходной статьи)
+RRF_K = 60
+
+
+@dataclass(frozen=True)
+class RetrievalStrategy:
+    """Параметры поиска: число результатов и постобработка кандидатов
+
+    fetch_k — число кандидатов из векторного поиска для гибридного поиска,
+    переранжирования и MMR; hybrid объединяет векторный и BM25-поиск (RRF),
+    rerank переупорядочивает кандидатов по покрытию слов запроса,
+    mmr отбирает разнообразные чанки (mmr_lambda — вес релевантности)
+    """
+
+    name: str = "dense"
+    k: int = 4
+    fetch_k: int = 20
+    hybrid: bool = False
+    rerank: bool = False
+    rerank_weight: float = 0.5
+    mmr: bool = False
+    mmr_lambda: float = 0.7
+
+    @property
+    def needs_candidates(self) -> bool:
+        return self.hybrid or self.rerank or self.mmr
+
+
+class Retriever:
+    """Поиск чанков по стратегии поверх векторного хранилища"""
+
+    def __init__(
+        self,
+        vector_store: VectorStoreServiceBase,
+        lexical_index: Optional[BM25Index] = None,
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+
+    async def retrieve(
+        self,
+        query: str,
+        strategy: RetrievalStrategy,
+        embedding: Optional[list[float]] = None,
+        where: Optional[dict[str, Any]] = None,
+        partitions: Optional[list[str]] = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск чанков по запросу
+
+        Returns:
+            list[dict[str, Any]]: Не более strategy.k результатов в формате search_by_vector
+        """
+        if embedding is None:
+            with trace_stage("embedding"):
+                embedding = await self.vector_store.embedding_service.embed_query(query)
+        limit = max(strategy.k, strategy.fetch_k) if strategy.needs_candidates else strategy.k
+        # Постобработка кандидатов входит в этап поиска
+        with trace_stage("search"):
+            candidates = await self.vector_store.search_by_vector(
+                embedding, limit=limit, where=where, partitions=partitions
+            )
+
+            if strategy.hybrid:
+                if self.lexical_index is None or where or partitions:
+                    # Лексический индекс строится по основной коллекции без фильтров
+                    logger.debug("Гибридный поиск недоступен, используется векторный поиск")
+                else:
+                    candidates = self._fuse(
+                        candidates, self.lexical_index.search(query, limit=limit)
+                    )
+            if strategy.rerank:
+                candidates = self._rerank(query, candidates, strategy.rerank_weight)
+            if strategy.mmr and len(candidates) > strategy.k:
+                candidates = await self._mmr(
+                    embedding, candidates, strategy.k, strategy.mmr_lambda
+                )
+        return candidates[: strategy.k]
+
+    @staticmethod
+    def _fuse(
+        dense: list[dict[str, Any]], lexical: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Объединение списков Reciprocal Rank Fusion"""
+        results: dict[str, dict[str, Any]] = {}
+        scores: dict[str, float] = {}
+        for ranking in (dense, lexical):
+            for rank, result in enumerate(ranking):
+                results.setdefault(result["id"], {"similarity_score": 0.0, **result})
+                scores[result["id"]] = scores.get(result["id"], 0.0) + 1 / (RRF_K + rank + 1)
+        return [
+            {**results[doc_id], "fusion_score": score}
+            for doc_id, score in sorted(scores.items(), key=lambda item: -item[1])
+        ]
+
+    @staticmethod
+    def _rerank(
+        query: str, candidates: list[dict[str, Any]], weight: float
+    ) -> list[dict[str, Any]]:
+        """Переранжирование по доле слов запроса в чанке вместе со сходством векторов
+
+        Легковесная замена кросс-энкодера: не требует модели и внешних вызовов
+        """
+        query_terms = set(lexical_terms(query))
+        if not query_terms:
+            return candidates
+
+        def score(result: dict[str, Any]) -> float:
+            coverage = len(query_terms & set(lexical_terms(result["content"]))) / len(
+                query_terms
+            )
+            return (1 - weight) * result.get("similarity_score", 0.0) + weight * coverage
+
+        return sorted(candidates, key=score, reverse=True)
+
+    async def _mmr(
+        self,
+        embedding: list[float],
+        candidates: list[dict[str, Any]],
+        k: int,
+        mmr_lambda: float,
+    ) -> list[dict[str, Any]]:
+        """Maximal Marginal Relevance: релевантные и непохожие друг на друга чанки"""
+        vectors = np.asarray(
+            await self.vector_store.embedding_service.embed_documents(
+                [result["content"] for result in candidates]
+            ),
+            dtype=np.float32,
+        )
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        relevance = vectors @ query
+        selected: list[int] = []
+        redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+        while len(selected) < k:
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * np.where(
+                np.isinf(redundancy), 0.0, redundancy
+            )
+            scores[selected] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return [candidates[i] for i in selected]
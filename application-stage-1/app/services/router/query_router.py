@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+import json
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS_PATH = Path(__file__).with_name("query_router_weights.json")
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+CHITCHAT_CLASS = "chitchat"
+GENERAL_CLASS = "general"
+
+
+def extract_features(text: str, stem_length: int) -> set[str]:
+    """Извлечение признаков запроса: усеченные токены и их биграммы"""
+    tokens = [token[:stem_length] for token in TOKEN_PATTERN.findall(text.lower())]
+    features = {f"w:{token}" for token in tokens}
+    features.update(f"b:{left}_{right}" for left, right in zip(tokens, tokens[1:]))
+    return features
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    query_class: str
+    confidence: float
+
+    @property
+    def skip_retrieval(self) -> bool:
+        return self.query_class == CHITCHAT_CLASS
+
+
+class QueryRouter:
+    """Локальный классификатор запросов (логистическая регрессия на токенах)"""
+
+    def __init__(
+        self,
+        weights_path: Optional[str] = None,
+        min_confidence: float = 0.5,
+        chitchat_min_confidence: float = 0.9,
+    ):
+        self.weights_path = Path(weights_path) if weights_path else DEFAULT_WEIGHTS_PATH
+        self.min_confidence = min_confidence
+        self.chitchat_min_confidence = chitchat_min_confidence
+
+        try:
+            with open(self.weights_path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+        except Exception as e:
+            logger.error(
+                f"Не удалось загрузить веса маршрутизатора запросов из {self.weights_path}: {e}",
+                exc_info=True,
+            )
+            raise
+
+        self.classes: list[str] = model["classes"]
+        self.stem_length: int = model["stem_length"]
+        self.bias: list[float] = model["bias"]
+        self.weights: dict[str, list[float]] = model["weights"]
+        logger.info(
+            f"Маршрутизатор запросов загружен: классы {self.classes}, признаков: {len(self.weights)}"
+        )
+
+    def classify(self, prompt: str) -> RouteDecision:
+        """Классификация запроса без обращения к LLM"""
+        scores = list(self.bias)
+        matched_features = 0
+        for feature in extract_features(prompt, self.stem_length):
+            feature_weights = self.weights.get(feature)
+            if feature_weights is None:
+                continue
+            matched_features += 1
+            for i, weight in enumerate(feature_weights):
+                scores[i] += weight
+
+        if not matched_features:
+            return RouteDecision(query_class=GENERAL_CLASS, confidence=0.0)
+
+        max_score = max(scores)
+        exp_scores = [math.exp(score - max_score) for score in scores]
+        total = sum(exp_scores)
+        best = max(range(len(scores)), key=scores.__getitem__)
+        confidence = exp_scores[best] / total
+
+        query_class = self.classes[best]
+        threshold = (
+            self.chitchat_min_confidence
+            if query_class == CHITCHAT_CLASS
+            else self.min_confidence
+        )
+        if confidence < threshold:
+            return RouteDecision(query_class=GENERAL_CLASS, confidence=confidence)
+        return RouteDecision(query_class=query_class, confidence=confidence)
+
+    def get_service_info(self) -> dict[str, Any]:
+        return {
+            "classes": self.classes,
+            "features_count": len(self.weights),
+            "min_confidence": self.min_confidence,
+            "chitchat_min_confidence": self.chitchat_min_confidence,
+            "weights_path": str(self.weights_path),
+        }
@@ -0,0 +1,196 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import re
+import time
+
+from app.services.retrieval.lexical_index import lexical_terms
+
+# Начала и слова, по которым запрос считается уточнением предыдущего вопроса
+FOLLOW_UP_PREFIXES = ("а ", "и ", "а если", "а что", "еще ", "ещё ", "также ", "тогда ")
+FOLLOW_UP_WORDS = {
+    "он", "она", "оно", "они", "его", "ее", "её", "их", "него", "нее", "неё", "них",
+    "ему", "ей", "им", "ним", "ней", "это", "этот", "эта", "эти", "этого", "этой",
+    "там", "туда", "тот", "та", "те", "такой", "такая", "такие",
+}
+# Вопросительные и служебные слова не несут темы запроса
+STOP_TERMS = set(
+    lexical_terms(
+        "а и в во на по с со о об к у за из от до для ли же не как когда где куда "
+        "что кто какой какая какое какие сколько почему зачем можно нужно надо мне "
+        "я мы вы ты подробнее расскажи"
+    )
+)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    # Самостоятельный вопрос, к которому относится ход (для уточнений — исходный)
+    topic: str
+    results: list[dict[str, Any]]
+    # Фильтры поиска, с которыми найдены results
+    filters: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Session:
+    id: str
+    turns: deque[Turn]
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class PreparedTurn:
+    """Подготовленный ход диалога для RAGService
+
+    search_query — запрос для поиска (уточнение дополняется темой диалога),
+    history — сжатая история для LLM (только у уточнений). При reused поиск не
+    выполняется, используются results предыдущего хода; после обработки в
+    results — результаты поиска этого хода, найденные с фильтрами filters
+    """
+
+    topic: str
+    search_query: str
+    follow_up: bool = False
+    history: list[tuple[str, str]] = field(default_factory=list)
+    results: Optional[list[dict[str, Any]]] = None
+    reused: bool = False
+    filters: dict[str, Any] = field(default_factory=dict)
+
+
+def content_terms(text: str) -> set[str]:
+    return set(lexical_terms(text)) - STOP_TERMS
+
+
+def is_follow_up(prompt: str) -> bool:
+    """Уточнение: начинается с союза, ссылается местоимением или почти не содержит темы"""
+    text = " ".join(prompt.lower().split())
+    return (
+        text.startswith(FOLLOW_UP_PREFIXES)
+        or any(word in FOLLOW_UP_WORDS for word in WORD_PATTERN.findall(text))
+        or len(content_terms(text)) <= 1
+    )
+
+
+def compact_history(turns: list[Turn], budget_chars: int) -> list[tuple[str, str]]:
+    """Последние ходы диалога в пределах budget_chars символов
+
+    Ходы берутся от последнего к первому, ответ хода, не помещающийся целиком,
+    усекается, более ранние ходы отбрасываются
+    """
+    history = []
+    remaining = budget_chars
+    for turn in reversed(turns):
+        answer = turn.answer
+        if len(turn.question) + len(answer) > remaining:
+            keep = remaining - len(turn.question)
+            if keep < 100:
+                break
+            answer = answer[:keep].rstrip() + "…"
+        history.append((turn.question, answer))
+        remaining -= len(turn.question) + len(answer)
+    return history[::-1]
+
+
+class SessionStore:
+    """Диалоги пользователей в памяти воркера
+
+    Хранится не больше max_sessions диалогов: сессии без запросов дольше
+    ttl_seconds удаляются, при переполнении вытесняются давно неактивные.
+    В сессии — последние max_turns ходов с найденными чанками. Уточняющий
+    вопрос ищется вместе с темой диалога, а если его слова есть в чанках
+    предыдущего хода (доля не меньше reuse_threshold) и фильтры поиска не
+    изменились, поиск не выполняется.
+    История для LLM ограничена history_tokens токенами (по оценке chars_per_token
+    символов на токен). Сессии не разделяются между воркерами: без привязки
+    клиента к воркеру запрос в другой воркер начинает диалог заново
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 1800.0,
+        max_turns: int = 10,
+        history_tokens: int = 600,
+        chars_per_token: float = 3.0,
+        reuse_threshold: float = 0.6,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.history_chars = int(history_tokens * chars_per_token)
+        self.reuse_threshold = reuse_threshold
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.follow_ups = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        """Сессия по идентификатору; новая, если ее нет или она устарела"""
+        now = time.monotonic()
+        # Порядок словаря — порядок последних обращений, устаревшие в начале
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.updated_at < self.ttl_seconds:
+                break
+            self.sessions.popitem(last=False)
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = Session(session_id, deque(maxlen=self.max_turns))
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.sessions.move_to_end(session_id)
+        session.updated_at = now
+        return session
+
+    def prepare(
+        self, session: Session, prompt: str, filters: Optional[dict[str, Any]] = None
+    ) -> PreparedTurn:
+        filters = filters or {}
+        if not session.turns or not is_follow_up(prompt):
+            return PreparedTurn(topic=prompt, search_query=prompt, filters=filters)
+
+        previous = session.turns[-1]
+        self.follow_ups += 1
+        turn = PreparedTurn(
+            topic=previous.topic,
+            search_query=f"{previous.topic} {prompt}",
+            follow_up=True,
+            history=compact_history(list(session.turns), self.history_chars),
+            filters=filters,
+        )
+        if previous.filters != filters:
+            # Чанки предыдущего хода найдены с другими фильтрами (источник, аудитория, институты)
+            return turn
+        new_terms = content_terms(prompt) - content_terms(previous.topic)
+        if previous.results and new_terms:
+            context_terms = set().union(
+                *(content_terms(result["content"]) for result in previous.results)
+            )
+            covered = len(new_terms & context_terms) / len(new_terms)
+        else:
+            covered = 1.0 if previous.results else 0.0
+        if covered >= self.reuse_threshold:
+            turn.results = previous.results
+            turn.reused = True
+            self.reused += 1
+        return turn
+
+    def add_turn(self, session: Session, prompt: str, turn: PreparedTurn, answer: str) -> None:
+        session.turns.append(
+            Turn(prompt, answer, turn.topic, turn.results or [], turn.filters)
+        )
+
+    def get_metrics(self) -> dict[str, int]:
+        return {
+            "sessions": len(self.sessions),
+            "follow_ups": self.follow_ups,
+            "reused_context": self.reused,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,292 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+import zstandard
+
+from app.services.base.vector_store_service_base import VectorStoreServiceBase
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+SUPPORTED_SNAPSHOT_DTYPES = ("float32", "float16")
+
+
+class SnapshotService:
+    """Снимки коллекций: векторы в .npy, тексты и метаданные в jsonl со сжатием zstd
+
+    Структура снимка:
+        <name>/manifest.json
+        <name>/<collection>/<segment>.npy
+        <name>/<collection>/<segment>.jsonl.zst
+
+    Сегмент — основная коллекция или один из ее разделов. Восстановление
+    записывает сохраненные векторы напрямую, без обращения к сервису эмбеддингов.
+    """
+
+    def __init__(
+        self,
+        vector_stores: list[VectorStoreServiceBase],
+        snapshot_directory: str,
+        batch_size: int = 500,
+    ):
+        self.vector_stores = {store.collection_name: store for store in vector_stores}
+        self.directory = Path(snapshot_directory)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+    def _snapshot_path(self, name: str) -> Path:
+        if not SNAPSHOT_NAME_PATTERN.match(name) or name.startswith("."):
+            raise ValueError(f"Недопустимое имя снимка: {name}")
+        return self.directory / name
+
+    def list_snapshots(self) -> list[dict[str, Any]]:
+        """Список снимков (по убыванию даты создания)"""
+        if not self.directory.exists():
+            return []
+        manifests = []
+        for manifest_path in self.directory.glob(f"*/{MANIFEST_FILE}"):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        return sorted(manifests, key=lambda m: m["created_at"], reverse=True)
+
+    def export_snapshot(
+        self, name: Optional[str] = None, dtype: str = "float32"
+    ) -> dict[str, Any]:
+        """Выгрузка всех коллекций в снимок
+
+        Args:
+            name (Optional[str]): Имя снимка, по умолчанию текущие дата и время
+            dtype (str): Тип векторов в снимке (float16 вдвое компактнее)
+
+        Returns:
+            dict[str, Any]: Манифест снимка
+        """
+        if dtype not in SUPPORTED_SNAPSHOT_DTYPES:
+            raise ValueError(
+                f"Тип данных не поддерживается: {dtype}, доступные типы: {list(SUPPORTED_SNAPSHOT_DTYPES)}"
+            )
+        name = name or datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = self._snapshot_path(name)
+        if path.exists():
+            raise FileExistsError(f"Снимок {name} уже существует")
+
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Выгрузка или восстановление снимка уже выполняется")
+        try:
+            started = time.perf_counter()
+            logger.info(f"Создание снимка {name} в {path.resolve()}")
+            temporary_path = path.with_name(f".{name}.tmp")
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            temporary_path.mkdir(parents=True)
+
+            collections = [
+                self._export_collection(store, temporary_path, dtype)
+                for store in self.vector_stores.values()
+            ]
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "name": name,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "dtype": dtype,
+                "collections": collections,
+                "size_bytes": sum(
+                    f.stat().st_size for f in temporary_path.rglob("*") if f.is_file()
+                ),
+            }
+            with open(temporary_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(temporary_path, path)
+
+            logger.info(
+                f"Снимок {name} создан за {time.perf_counter() - started:.2f} с, "
+                f"записей: {sum(c['records_count'] for c in collections)}, "
+                f"размер: {manifest['size_bytes'] / 2**20:.1f} МиБ"
+            )
+            return manifest
+        finally:
+            self._lock.release()
+
+    def _export_collection(
+        self, store: VectorStoreServiceBase, snapshot_path: Path, dtype: str
+    ) -> dict[str, Any]:
+        collection_path = snapshot_path / store.collection_name
+        collection_path.mkdir()
+        segments = []
+        dimension = 0
+        for i, partition in enumerate([None, *store.partitions]):
+            segment_name = "main" if partition is None else f"partition-{i:03d}"
+            count, segment_dimension = self._export_segment(
+                store, partition, collection_path / segment_name, dtype
+            )
+            dimension = dimension or segment_dimension
+            segments.append(
+                {"partition": partition, "file": segment_name, "count": count}
+            )
+            logger.info(
+                f"Коллекция '{store.collection_name}', раздел {partition or '-'}: выгружено записей {count}"
+            )
+        return {
+            "name": store.collection_name,
+            "embedding_model": store.collection_metadata.get("embedding_model"),
+            "dimension": dimension,
+            "records_count": sum(segment["count"] for segment in segments),
+            "segments": segments,
+        }
+
+    def _export_segment(
+        self,
+        store: VectorStoreServiceBase,
+        partition: Optional[str],
+        segment_path: Path,
+        dtype: str,
+    ) -> tuple[int, int]:
+        """Потоковая запись сегмента; размер .npy берется из count() до начала выгрузки"""
+        import numpy as np
+
+        expected = store.count(partition)
+        vectors = None
+        written = 0
+        with open(segment_path.with_suffix(".jsonl.zst"), "wb") as raw:
+            with zstandard.ZstdCompressor(level=3).stream_writer(raw) as compressed:
+                for batch in store.iter_records(self.batch_size, partition):
+                    batch_size = min(len(batch["ids"]), expected - written)
+                    if batch_size <= 0:
+                        logger.warning(
+                            "Во время выгрузки в коллекцию добавлены записи, они не попадут в снимок"
+                        )
+                        break
+                    if vectors is None:
+                        vectors = np.lib.format.open_memmap(
+                            segment_path.with_suffix(".npy"),
+                            mode="w+",
+                            dtype=dtype,
+                            shape=(expected, batch["embeddings"].shape[1]),
+                        )
+                    vectors[written : written + batch_size] = batch["embeddings"][:batch_size]
+                    compressed.write(
+                        b"".join(
+                            json.dumps(
+                                {"id": record_id, "document": document, "metadata": metadata},
+                                ensure_ascii=False,
+                            ).encode("utf-8")
+                            + b"\n"
+                            for record_id, document, metadata in zip(
+                                batch["ids"][:batch_size],
+                                batch["documents"][:batch_size],
+                                batch["metadatas"][:batch_size],
+                            )
+                        )
+                    )
+                    written += batch_size
+        if vectors is None:
+            return 0, 0
+        vectors.flush()
+        return written, vectors.shape[1]
+
+    def restore_snapshot(self, name: str, force: bool = False) -> dict[str, Any]:
+        """Восстановление коллекций из снимка без повторного расчета эмбеддингов
+
+        Текущее содержимое коллекций и их разделов удаляется.
+
+        Args:
+            name (str): Имя снимка
+            force (bool): Восстановить, даже если модель эмбеддингов отличается
+
+        Returns:
+            dict[str, Any]: Количество восстановленных записей по коллекциям и длительность
+        """
+        path = self._snapshot_path(name)
+        if not (path / MANIFEST_FILE).exists():
+            raise FileNotFoundError(f"Снимок {name} не найден")
+        with open(path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Версия формата снимка не поддерживается: {manifest.get('format_version')}"
+            )
+
+        collections = []
+        for collection in manifest["collections"]:
+            store = self.vector_stores.get(collection["name"])
+            if store is None:
+                logger.warning(
+                    f"Коллекция '{collection['name']}' из снимка не подключена, пропуск"
+                )
+                continue
+            embedding_model = store.collection_metadata.get("embedding_model")
+            if not force and embedding_model != collection["embedding_model"]:
+                raise ValueError(
+                    f"Снимок коллекции '{collection['name']}' создан моделью "
+                    f"{collection['embedding_model']}, текущая модель: {embedding_model}"
+                )
+            collections.append((store, collection))
+
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Выгрузка или восстановление снимка уже выполняется")
+        try:
+            started = time.perf_counter()
+            logger.info(f"Восстановление снимка {name}")
+            restored = {}
+            for store, collection in collections:
+                for partition in [None, *store.partitions]:
+                    if not store.clear_collection(partition):
+                        raise RuntimeError(
+                            f"Не удалось очистить коллекцию '{collection['name']}' перед восстановлением"
+                        )
+                for segment in collection["segments"]:
+                    if segment["count"]:
+                        self._restore_segment(
+                            store,
+                            segment["partition"],
+                            path / collection["name"] / segment["file"],
+                            segment["count"],
+                        )
+                store.flush()
+                restored[collection["name"]] = collection["records_count"]
+
+            duration = time.perf_counter() - started
+            logger.info(
+                f"Снимок {name} восстановлен за {duration:.2f} с, записей: {sum(restored.values())}"
+            )
+            return {"name": name, "collections": restored, "duration": duration}
+        finally:
+            self._lock.release()
+
+    def _restore_segment(
+        self,
+        store: VectorStoreServiceBase,
+        partition: Optional[str],
+        segment_path: Path,
+        count: int,
+    ) -> None:
+        import numpy as np
+
+        vectors = np.load(segment_path.with_suffix(".npy"), mmap_mode="r")
+        records = self._read_records(segment_path.with_suffix(".jsonl.zst"))
+        for start in range(0, count, self.batch_size):
+            batch = [record for _, record in zip(range(self.batch_size), records)]
+            store.upsert_records(
+                [record["id"] for record in batch],
+                [record["document"] for record in batch],
+                [record["metadata"] for record in batch],
+                np.asarray(vectors[start : start + len(batch)], dtype=np.float32),
+                partition=partition,
+            )
+
+    @staticmethod
+    def _read_records(path: Path) -> Iterator[dict[str, Any]]:
+        with open(path, "rb") as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as decompressed:
+                for line in io.TextIOWrapper(decompressed, encoding="utf-8"):
+                    yield json.loads(line)
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+import time
+
+STAGES = ("embedding", "search", "generation")
+
+
+def rounded(value: Any, digits: int = 3) -> Any:
+    """Округление средних для сводок; None (нет данных) остается None"""
+    return round(value, digits) if value is not None else None
+
+
+@dataclass
+class QueryTrace:
+    """Разбивка обработки одного запроса: время этапов (мс), токены, попадания в кэши,
+    найденные чанки и их документы"""
+
+    stages: dict[str, float] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hits: set[str] = field(default_factory=set)
+    chunk_ids: list[str] = field(default_factory=list)
+    sources: set[str] = field(default_factory=set)
+    error: bool = False
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar(
+    "query_trace", default=None
+)
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace() -> Iterator[QueryTrace]:
+    """Трассировка запроса: этапы внутри блока (и запущенных из него задач) попадают в trace
+
+    Вложенная трассировка по завершении добавляется к внешней
+    """
+    parent = _current_trace.get()
+    trace = QueryTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if parent is not None:
+            for name, elapsed in trace.stages.items():
+                parent.stages[name] = parent.stages.get(name, 0.0) + elapsed
+            parent.prompt_tokens += trace.prompt_tokens
+            parent.completion_tokens += trace.completion_tokens
+            parent.cache_hits |= trace.cache_hits
+            parent.chunk_ids.extend(trace.chunk_ids)
+            parent.sources |= trace.sources
+            parent.error = parent.error or trace.error
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """Замер этапа; вне трассировки ничего не делает"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages[name] = (
+            trace.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+        )
+
+
+def record_cache_hit(cache: str) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.cache_hits.add(cache)
+
+
+def record_token_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.prompt_tokens += prompt_tokens
+        trace.completion_tokens += completion_tokens
+
+
+def record_retrieved(results: list[dict[str, Any]]) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        for result in results:
+            trace.chunk_ids.append(result["id"])
+            source = result.get("metadata", {}).get("source")
+            if source:
+                trace.sources.add(source)
@@ -0,0 +1,248 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Класс приоритета вызова: меньшее значение обслуживается раньше"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+request_priority: ContextVar[Priority] = ContextVar(
+    "request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Все вызовы внешних API внутри блока идут с фоновым приоритетом"""
+    token = request_priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """HTTP-статус ошибки (gigachat.exceptions.ResponseError хранит его вторым аргументом)"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and len(getattr(error, "args", ())) > 1:
+        status_code = error.args[1]
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return error_status_code(error) == 429
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    headers = error.args[3] if len(getattr(error, "args", ())) > 3 else None
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class UpstreamLane:
+    """Ограничитель вызовов одного внешнего API
+
+    Token bucket задает частоту запросов, max_concurrency — число одновременных
+    вызовов. Скорость подстраивается по AIMD: ответ 429 умножает ее на
+    decrease_factor, каждый успешный вызов прибавляет increase_step (не выше
+    исходной скорости). Ожидающие вызовы обслуживаются по приоритету, фоновым
+    доступна только доля background_share одновременных вызовов.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        background_share: float = 0.5,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.05,
+        min_rate: float = 0.2,
+    ):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.background_concurrency = max(1, math.floor(max_concurrency * background_share))
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_rate = min_rate
+
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self._updated_at = time.monotonic()
+        self._waiters: list[tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.wait_times: dict[Priority, deque[float]] = {
+            priority: deque(maxlen=1000) for priority in Priority
+        }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _concurrency_limit(self, priority: Priority) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.max_concurrency
+        return self.background_concurrency
+
+    def _dispatch(self) -> None:
+        """Выдача разрешений ожидающим в порядке приоритета"""
+        self._timer = None
+        self._refill()
+        while self._waiters:
+            priority, _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self._concurrency_limit(Priority(priority)):
+                return
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.tokens -= 1
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(
+        self, priority: Optional[Priority] = None, timeout: Optional[float] = None
+    ) -> None:
+        """Ожидание разрешения на вызов; asyncio.TimeoutError, если его нет за timeout"""
+        priority = request_priority.get() if priority is None else priority
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters, (int(priority), next(self._sequence), started, future)
+        )
+        if self._timer is None:
+            self._dispatch()
+        try:
+            if timeout is None:
+                await future
+            else:
+                await asyncio.wait_for(future, max(0.0, timeout))
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        self.wait_times[priority].append(time.monotonic() - started)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        self.rate_limited += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._refill()
+        # Пауза до Retry-After: бакет уходит в минус на нужное число токенов
+        self.tokens = min(self.tokens, 0.0) - (retry_after or 0.0) * self.rate
+        logger.warning(
+            f"Ограничение частоты запросов {self.name} (429), новая скорость: {self.rate:.2f} запросов/с"
+        )
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: Optional[Priority] = None,
+    ) -> T:
+        """Выполнение вызова внешнего API после получения разрешения"""
+        await self.acquire(priority)
+        return await self.run_acquired(call)
+
+    async def run_acquired(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Выполнение вызова по уже полученному (acquire) разрешению с его освобождением"""
+        self.calls += 1
+        try:
+            result = await call()
+        except Exception as e:
+            if is_rate_limited(e):
+                self.on_rate_limited(retry_after_seconds(e))
+            raise
+        finally:
+            self.release()
+        self.on_success()
+        return result
+
+    def oldest_wait(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        """Сколько ждет самый давний вызов с приоритетом не ниже указанного"""
+        now = time.monotonic()
+        return max(
+            (
+                now - enqueued_at
+                for waiter_priority, _, enqueued_at, future in self._waiters
+                if waiter_priority <= priority and not future.done()
+            ),
+            default=0.0,
+        )
+
+    def get_metrics(self) -> dict[str, Any]:
+        queue_depth = {priority.name.lower(): 0 for priority in Priority}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                queue_depth[Priority(priority).name.lower()] += 1
+        wait_time = {}
+        for priority, samples in self.wait_times.items():
+            ordered = sorted(samples)
+            wait_time[priority.name.lower()] = {
+                "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "p95": ordered[int(len(ordered) * 0.95)] if ordered else 0.0,
+                "max": ordered[-1] if ordered else 0.0,
+            }
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": queue_depth,
+            "wait_time_seconds": wait_time,
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class UpstreamScheduler:
+    """Общий планировщик вызовов внешних API: отдельная очередь на каждый API"""
+
+    def __init__(self, lanes: dict[str, UpstreamLane]):
+        self.lanes = lanes
+
+    def get_lane(self, name: str) -> Optional[UpstreamLane]:
+        return self.lanes.get(name)
+
+    def oldest_wait(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        return max((lane.oldest_wait(priority) for lane in self.lanes.values()), default=0.0)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {name: lane.get_metrics() for name, lane in self.lanes.items()}
@@ -0,0 +1,151 @@
+"""Задержка и пропускная способность эмбеддингов: локальная модель и GigaChat
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_embeddings.py --model hashing
+    python benchmarks/bench_embeddings.py --model onnx --model-path ./models/embeddings --int8 --threads 4
+    python benchmarks/bench_embeddings.py --model onnx --model-path ./models/embeddings --gigachat
+
+Задержка — последовательные одиночные запросы (embed_query), пропускная
+способность — одновременные запросы (динамическое объединение в пачки)
+и загрузка чанков документов. С --gigachat те же замеры выполняются для
+GigaChat с ключом и сертификатом из .env.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings  # noqa: E402
+from app.services.base.embedding_service_base import EmbeddingServiceBase  # noqa: E402
+from app.services.factory.embedding_service_factory import (  # noqa: E402
+    EmbeddingServiceFactory,
+)
+
+QUESTIONS = [
+    "Когда начинается зимняя сессия?",
+    "Как получить справку об обучении?",
+    "Где находится общежитие номер 5?",
+    "Сколько стоит обучение на платной основе?",
+    "Как перевестись на другой факультет?",
+]
+
+
+def percentiles(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    values = [
+        latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+        for p in (50, 95, 99)
+    ]
+    return (
+        f"mean={statistics.fmean(latencies):.2f} мс "
+        f"p50={values[0]:.2f} мс p95={values[1]:.2f} мс p99={values[2]:.2f} мс"
+    )
+
+
+def document_chunks(limit: int) -> list[str]:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=50)
+    chunks = [
+        chunk
+        for path in sorted(Path("documents").glob("*.txt"))
+        for chunk in splitter.split_text(path.read_text(encoding="utf-8"))
+    ]
+    return chunks[:limit]
+
+
+async def bench(
+    name: str,
+    service: EmbeddingServiceBase,
+    queries: int,
+    concurrency: int,
+    chunks: list[str],
+) -> None:
+    await service.embed_query(QUESTIONS[0])
+
+    latencies = []
+    for i in range(queries):
+        started = time.perf_counter()
+        await service.embed_query(QUESTIONS[i % len(QUESTIONS)])
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(f"{name}:")
+    print(f"  задержка запроса: {percentiles(latencies)}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(i: int) -> None:
+        async with semaphore:
+            await service.embed_query(f"{QUESTIONS[i % len(QUESTIONS)]} ({i})")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(embed(i) for i in range(queries)))
+    duration = time.perf_counter() - started
+    print(f"  запросов одновременно {concurrency}: {queries / duration:.0f} запросов/с")
+
+    if chunks:
+        started = time.perf_counter()
+        await service.embed_documents(chunks)
+        duration = time.perf_counter() - started
+        print(f"  чанков документов {len(chunks)}: {len(chunks) / duration:.0f} чанков/с")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["onnx", "hashing"], default="hashing")
+    parser.add_argument("--model-path", default=settings.local_embedding_model_path)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--threads", type=int, default=settings.local_embedding_threads)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--batch-wait-ms", type=float, default=0.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--gigachat", action="store_true")
+    args = parser.parse_args()
+
+    chunks = document_chunks(args.chunks)
+    services = [
+        (
+            f"local ({args.model})",
+            EmbeddingServiceFactory.create_service(
+                api_provider="local",
+                model=args.model,
+                local_model_path=args.model_path,
+                local_threads=args.threads,
+                local_int8=args.int8,
+                local_max_batch_size=args.max_batch_size,
+                local_batch_wait_ms=args.batch_wait_ms,
+                local_query_prefix=settings.local_embedding_query_prefix,
+                local_document_prefix=settings.local_embedding_document_prefix,
+            ),
+        )
+    ]
+    if args.gigachat:
+        services.append(
+            (
+                "GigaChat",
+                EmbeddingServiceFactory.create_service(
+                    api_provider="gigachat",
+                    model=settings.embedding_api_model or None,
+                    api_key=settings.embedding_api_key,
+                    verify_ssl_certs=settings.verify_ssl_certs,
+                    ca_bundle_file=settings.mincifry_cert_path,
+                ),
+            )
+        )
+
+    print(f"Запросов: {args.queries}, чанков: {len(chunks)}")
+    for name, service in services:
+        try:
+            await bench(name, service, args.queries, args.concurrency, chunks)
+        finally:
+            await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""Накладные расходы логирования на обработку запроса
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --queries 2000 --output /tmp/bench.log
+
+Запросы обрабатываются RAGService со встроенным хранилищем, локальными
+эмбеддингами (хэширование признаков) и генератором-заглушкой, который
+возвращает начало контекста, — в замер попадают поиск и логирование, но не
+сеть. Режимы:
+    off          — только WARNING и выше (нижняя граница)
+    sync-text    — прежняя схема: текстовый формат в потоке запроса, все
+                   подробные записи этапов (как до перевода их в DEBUG)
+    queue-json   — JSON через очередь, уровень INFO (по умолчанию в приложении)
+    queue-debug  — JSON через очередь, все подробные записи этапов
+    queue-sample — как queue-debug, подробные записи app.* сохраняются у 10% запросов
+Накладные расходы — разница средней задержки режима и режима off. Время
+«с записью» включает ожидание записи очереди в файл после последнего запроса.
+Режимы чередуются раундами (--rounds), чтобы фоновая нагрузка на машине
+одинаково влияла на все режимы.
+"""
+
+from pathlib import Path
+from typing import Optional
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.logging_config import configure_logging, request_id_var, stop_logging  # noqa: E402
+from app.services.base.llm_service_base import LLMServiceBase  # noqa: E402
+from app.services.factory.embedding_service_factory import (  # noqa: E402
+    EmbeddingServiceFactory,
+)
+from app.services.factory.vector_store_service_factory import (  # noqa: E402
+    VectorStoreServiceFactory,
+)
+from app.services.rag_service import RAGService  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+QUESTIONS = [
+    "Когда начинается зимняя сессия?",
+    "Как получить справку об обучении?",
+    "Где находится общежитие номер 5?",
+    "Кто является ректором университета?",
+    "Как перевестись на другой факультет?",
+]
+
+MODES = {
+    "off": dict(level="WARNING", log_format="json", use_queue=True),
+    "sync-text": dict(level="DEBUG", log_format="text", use_queue=False),
+    "queue-json": dict(level="INFO", log_format="json", use_queue=True),
+    "queue-debug": dict(level="DEBUG", log_format="json", use_queue=True),
+    "queue-sample": dict(
+        level="DEBUG", log_format="json", use_queue=True, sampling="app=0.1"
+    ),
+}
+
+
+class EchoLLMService(LLMServiceBase):
+    """Генерация без обращения к API: начало контекста вместо ответа"""
+
+    async def generate_response(
+        self,
+        prompt: str,
+        context: str,
+        query_class: Optional[str] = None,
+        prompt_variant: Optional[str] = None,
+        history: Optional[list[tuple[str, str]]] = None,
+    ) -> str:
+        return context[:300]
+
+    async def health_check(self) -> bool:
+        return True
+
+
+async def run_mode(
+    rag_service: RAGService, mode: str, queries: int, output: Path
+) -> tuple[list[float], float]:
+    with open(output, "a", encoding="utf-8") as stream:
+        configure_logging(stream=stream, **MODES[mode])
+        # Сторонние библиотеки не участвуют в сравнении
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        latencies = []
+        started = time.perf_counter()
+        for i in range(queries):
+            token = request_id_var.set(f"bench-{mode}-{i}")
+            request_started = time.perf_counter()
+            await rag_service.process_query(QUESTIONS[i % len(QUESTIONS)])
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            request_id_var.reset(token)
+        stop_logging()
+        total = time.perf_counter() - started
+    return latencies, total
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Файл лога, по умолчанию временный")
+    parser.add_argument(
+        "--modes", nargs="+", choices=list(MODES), default=list(MODES)
+    )
+    args = parser.parse_args()
+
+    output = args.output or Path(tempfile.mkstemp(suffix=".log")[1])
+    configure_logging(level="WARNING", stream=open(os.devnull, "w"))
+    embedding_service = EmbeddingServiceFactory.create_service(
+        api_provider="local", model="hashing"
+    )
+    vector_store = VectorStoreServiceFactory.create_service(
+        provider="in_memory",
+        collection_name="bench-logging",
+        embedding_service=embedding_service,
+        persist_directory=None,
+    )
+    rag_service = RAGService(vector_store, EchoLLMService(), answer_cache=None)
+    for path in sorted((ROOT / "documents").glob("*.txt")):
+        await rag_service.add_document(path.read_text(encoding="utf-8"), path.name)
+    for question in QUESTIONS:
+        await rag_service.process_query(question)
+
+    results: dict[str, tuple[list[float], float]] = {mode: ([], 0.0) for mode in args.modes}
+    for _ in range(args.rounds):
+        for mode in args.modes:
+            latencies, total = await run_mode(
+                rag_service, mode, args.queries // args.rounds, output
+            )
+            results[mode] = (results[mode][0] + latencies, results[mode][1] + total)
+
+    baseline = statistics.fmean(results["off"][0]) if "off" in results else None
+    print(f"Запросов на режим: {args.queries}, лог: {output} ({output.stat().st_size / 2**20:.1f} МиБ)")
+    print(f"{'режим':<14} {'mean, мс':>9} {'p50, мс':>8} {'p99, мс':>8} {'накладные, мкс':>15} {'с записью, с':>13}")
+    for mode, (latencies, total) in results.items():
+        latencies.sort()
+        mean = statistics.fmean(latencies)
+        overhead = f"{(mean - baseline) * 1000:>15.0f}" if baseline is not None else f"{'-':>15}"
+        print(
+            f"{mode:<14} {mean:>9.3f} {latencies[len(latencies) // 2]:>8.3f} "
+            f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:>8.3f} "
+            f"{overhead} {total:>13.2f}"
+        )
+    await embedding_service.close()
+    if not args.output:
+        output.unlink()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
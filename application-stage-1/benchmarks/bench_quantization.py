@@ -0,0 +1,148 @@
+"""Recall / задержка / память для вариантов квантования встроенного хранилища
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_quantization.py --size 200000
+    python benchmarks/bench_quantization.py --source documents
+
+В режиме documents чанки из ./documents векторизуются провайдером эмбеддингов из .env,
+запросами служат сами чанки. В режиме synthetic векторы порождаются низкоразмерным
+латентным пространством (как у реальных эмбеддингов) с небольшим шумом.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.in_memory.vector_index import VectorIndex, normalize  # noqa: E402
+
+
+def synthetic_vectors(
+    rng: np.random.Generator,
+    projection: np.ndarray,
+    count: int,
+    noise: float = 0.1,
+) -> np.ndarray:
+    latent = rng.standard_normal((count, projection.shape[0]), dtype=np.float32)
+    vectors = latent @ projection
+    vectors += rng.standard_normal(vectors.shape, dtype=np.float32) * noise
+    return normalize(vectors)
+
+
+async def document_vectors() -> np.ndarray:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from app.config import settings
+    from app.services.factory.embedding_service_factory import EmbeddingServiceFactory
+
+    embedding_service = EmbeddingServiceFactory.create_service(
+        api_provider=settings.embedding_api_provider,
+        model=settings.embedding_api_model,
+        api_key=settings.embedding_api_key,
+        verify_ssl_certs=settings.verify_ssl_certs,
+        ca_bundle_file=settings.mincifry_cert_path,
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=50)
+    chunks = [
+        chunk
+        for path in sorted(Path("documents").glob("*.txt"))
+        for chunk in splitter.split_text(path.read_text(encoding="utf-8"))
+    ]
+    embeddings = await embedding_service.embed_documents(chunks)
+    return normalize(np.asarray(embeddings, dtype=np.float32))
+
+
+def run_variant(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    exact_top: list[set[int]],
+    quantization: str,
+    limit: int,
+    pq_subvectors: int,
+    rescore_factor: int,
+) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorIndex(
+            name="bench",
+            directory=Path(directory),
+            quantization=quantization,
+            pq_subvectors=pq_subvectors,
+            rescore_factor=rescore_factor,
+        )
+        started = time.perf_counter()
+        index.upsert(
+            [str(i) for i in range(len(vectors))],
+            [""] * len(vectors),
+            [{}] * len(vectors),
+            vectors,
+        )
+        index.save()
+        build_time = time.perf_counter() - started
+
+        latencies, recalls = [], []
+        for query, expected in zip(queries, exact_top):
+            started = time.perf_counter()
+            found = index.search(query, limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len({hit.position for hit in found} & expected) / len(expected))
+
+        latencies.sort()
+        print(
+            f"  {quantization:>5}: recall@{limit}={statistics.fmean(recalls):.3f} "
+            f"p50={latencies[len(latencies) // 2]:.2f} мс "
+            f"p95={latencies[int(len(latencies) * 0.95)]:.2f} мс "
+            f"память={index.nbytes / 2**20:.1f} МиБ "
+            f"({index.nbytes / len(vectors):.0f} Б/вектор), построение {build_time:.1f} с"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", choices=["synthetic", "documents"], default="synthetic")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--latent-dimension", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--pq-subvectors", type=int, default=64)
+    parser.add_argument("--rescore-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.source == "documents":
+        vectors = await document_vectors()
+        queries = vectors
+    else:
+        projection = rng.standard_normal(
+            (args.latent_dimension, args.dimension), dtype=np.float32
+        ) / np.sqrt(args.latent_dimension)
+        vectors = synthetic_vectors(rng, projection, args.size)
+        queries = synthetic_vectors(rng, projection, args.queries)
+
+    exact_top = []
+    for query in queries:
+        scores = vectors @ query
+        exact_top.append(set(np.argsort(-scores)[: args.limit].tolist()))
+
+    print(f"Векторов: {len(vectors)}, размерность: {vectors.shape[1]}, запросов: {len(queries)}")
+    for quantization in ("none", "int8", "pq"):
+        run_variant(
+            vectors,
+            queries,
+            exact_top,
+            quantization,
+            args.limit,
+            args.pq_subvectors,
+            args.rescore_factor,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Бенчмарк задержки локального маршрутизатора запросов
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_query_router.py --iterations 20000
+"""
+
+from pathlib import Path
+import argparse
+import json
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.router.query_router import QueryRouter  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path(__file__).resolve().parents[1]
+        / "scripts"
+        / "data"
+        / "query_router_train.jsonl",
+    )
+    args = parser.parse_args()
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        prompts = [json.loads(line)["text"] for line in f if line.strip()]
+
+    started = time.perf_counter()
+    router = QueryRouter()
+    load_time = time.perf_counter() - started
+
+    latencies = []
+    for i in range(args.iterations):
+        prompt = prompts[i % len(prompts)]
+        started = time.perf_counter()
+        router.classify(prompt)
+        latencies.append((time.perf_counter() - started) * 1e6)
+
+    latencies.sort()
+    print(f"Загрузка весов: {load_time * 1000:.2f} мс")
+    print(f"Запросов: {len(latencies)}")
+    print(f"mean: {statistics.fmean(latencies):.1f} мкс")
+    for percentile in (50, 95, 99):
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        print(f"p{percentile}: {latencies[index]:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
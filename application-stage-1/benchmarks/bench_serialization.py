@@ -0,0 +1,126 @@
+"""Стоимость сериализации и сжатия ответов API
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_serialization.py --batch-size 500 --repeat 2000
+
+Сериализация сравнивается так, как ее выполняет FastAPI для эндпоинта
+с response_model: валидация возвращенной модели, затем JSONResponse (json.dumps)
+или ORJSONResponse. Для пачки сравниваются строки NDJSON через model_dump_json
+и через orjson. Сжатие замеряется для ответа пачки целиком.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import random
+import sys
+import time
+import zlib
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+import zstandard
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api.responses import ORJSONResponse, dump_json  # noqa: E402
+from app.models.schemas import BatchQueryResult, QueryResponse  # noqa: E402
+
+# Ответы собираются из слов этого текста, чтобы сжатие не было завышено повторами
+ANSWER = (
+    "Зимняя промежуточная аттестация начинается в конце декабря и длится "
+    "три недели, точные даты указаны в расписании вашего института. Пересдачи "
+    "проводятся в феврале по графику кафедры, заявление подается в личном "
+    "кабинете студента не позднее чем за три рабочих дня."
+)
+
+
+def per_call(func, repeat: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def random_answer(rng: random.Random) -> str:
+    words = ANSWER.split()
+    return " ".join(rng.choice(words) for _ in range(60))
+
+
+async def bench_query_response(response: QueryResponse, repeat: int) -> None:
+    field = create_model_field(name="response", type_=QueryResponse, mode="serialization")
+
+    async def render(response_class) -> bytes:
+        content = await serialize_response(
+            field=field, response_content=response, is_coroutine=True
+        )
+        return response_class(content).body
+
+    print(f"QueryResponse ({len(await render(ORJSONResponse))} байт):")
+    for name, response_class in [
+        ("JSONResponse", JSONResponse),
+        ("ORJSONResponse", ORJSONResponse),
+    ]:
+        await render(response_class)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await render(response_class)
+        duration = (time.perf_counter() - started) / repeat * 1e6
+        print(f"  {name:<16} {duration:8.1f} мкс")
+
+
+def bench_batch(rng: random.Random, batch_size: int, repeat: int) -> bytes:
+    results = [
+        BatchQueryResult(
+            index=i,
+            answer=random_answer(rng),
+            confidence=rng.random(),
+            processing_time=rng.random(),
+        )
+        for i in range(batch_size)
+    ]
+    print(f"Пачка NDJSON из {batch_size} ответов, на ответ:")
+    for name, dump in [
+        ("model_dump_json", lambda result: result.model_dump_json().encode()),
+        ("orjson", dump_json),
+    ]:
+        duration = per_call(
+            lambda: [dump(result) + b"\n" for result in results], repeat // 100 or 1
+        )
+        print(f"  {name:<16} {duration / batch_size:8.1f} мкс")
+    return b"".join(dump_json(result) + b"\n" for result in results)
+
+
+def bench_compression(payload: bytes, repeat: int) -> None:
+    print(f"Сжатие пачки ({len(payload) / 1024:.0f} КиБ):")
+    compressors = [
+        ("gzip 6", lambda: zlib.compress(payload, 6, wbits=16 + zlib.MAX_WBITS)),
+        ("zstd 3", lambda: zstandard.ZstdCompressor(level=3).compress(payload)),
+    ]
+    for name, compress in compressors:
+        size = len(compress())
+        duration = per_call(compress, repeat // 100 or 1)
+        print(
+            f"  {name:<16} {duration / 1000:8.2f} мс, "
+            f"{size / 1024:.0f} КиБ ({len(payload) / size:.1f}x)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    response = QueryResponse(answer=random_answer(rng), confidence=0.8, processing_time=1.2)
+    asyncio.run(bench_query_response(response, args.repeat))
+    payload = bench_batch(rng, args.batch_size, args.repeat)
+    bench_compression(payload, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
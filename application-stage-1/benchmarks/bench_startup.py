@@ -0,0 +1,125 @@
+"""Профиль импорта приложения, память процесса и время до первого ответа
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_startup.py --top 15
+    python benchmarks/bench_startup.py --serve
+
+Профиль строится по выводу python -X importtime. Память (max RSS) замеряется
+после импорта app.main и после импорта модулей провайдеров, которые фабрики
+загружают при выборе GigaChat и ChromaDB. С --serve приложение запускается
+через uvicorn (настройки из .env) и замеряется время до первого ответа на /.
+"""
+
+from collections import defaultdict
+from pathlib import Path
+import argparse
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROVIDER_MODULES = [
+    "app.services.gigachat.gigachat_embedding_service",
+    "app.services.gigachat.gigachat_llm_service",
+    "app.services.gigachat.gigachat_session",
+    "app.services.chroma_db_service",
+]
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_profile(module: str) -> list[tuple[int, int, str]]:
+    """Строки -X importtime: (собственное время, накопленное время, модуль) в мкс"""
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line.removeprefix("import time:").split("|")
+        rows.append((int(self_time), int(cumulative), name.strip()))
+    return rows
+
+
+def measure_import(modules: list[str]) -> tuple[float, float]:
+    """Время импорта (с) и max RSS процесса (МиБ)"""
+    code = (
+        "import resource, time\n"
+        "started = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "print(time.perf_counter() - started, "
+        "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    )
+    duration, max_rss = run_python(code).stdout.split()
+    return float(duration), int(max_rss) / 1024
+
+
+def time_to_first_request(app: str, port: int, timeout: float) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError("Приложение не запустилось")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    packages: dict[str, int] = defaultdict(int)
+    for self_time, _, name in rows:
+        packages[name.split(".")[0]] += self_time
+    total = sum(self_time for self_time, _, _ in rows)
+    print(f"Импорт {args.module}: {total / 1e6:.2f} с, модулей: {len(rows)}")
+    print(f"Пакеты по собственному времени импорта (топ {args.top}):")
+    for package, self_time in sorted(packages.items(), key=lambda p: -p[1])[: args.top]:
+        print(f"  {package:<32} {self_time / 1e3:8.1f} мс {self_time / total:6.1%}")
+
+    for title, modules in [
+        (args.module, [args.module]),
+        (f"{args.module} + модули GigaChat и ChromaDB", [args.module, *PROVIDER_MODULES]),
+    ]:
+        samples = [measure_import(modules) for _ in range(args.repeat)]
+        print(
+            f"{title}: время импорта {min(s[0] for s in samples):.2f} с, "
+            f"max RSS {min(s[1] for s in samples):.0f} МиБ"
+        )
+
+    if args.serve:
+        duration = time_to_first_request(args.app, args.port, args.startup_timeout)
+        print(f"Время до первого ответа: {duration:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Сравнение задержки поиска: встроенное хранилище (numpy) и ChromaDB по HTTP
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/bench_vector_store.py --sizes 10000 100000 1000000 --dtype float16
+    python benchmarks/bench_vector_store.py --sizes 10000 --chroma-host localhost --chroma-port 8000
+
+Векторы генерируются случайно, эмбеддинг запроса в замер не входит.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.in_memory.vector_index import VectorIndex  # noqa: E402
+
+
+def percentiles(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    values = [
+        latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+        for p in (50, 95, 99)
+    ]
+    return (
+        f"mean={statistics.fmean(latencies):.2f} мс "
+        f"p50={values[0]:.2f} мс p95={values[1]:.2f} мс p99={values[2]:.2f} мс"
+    )
+
+
+def random_vectors(rng: np.random.Generator, count: int, dimension: int) -> np.ndarray:
+    return rng.standard_normal((count, dimension), dtype=np.float32)
+
+
+def bench_in_memory(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    dtype: str,
+    limit: int,
+    hnsw_threshold: int,
+) -> None:
+    index = VectorIndex(name="bench", dtype=dtype, hnsw_threshold=hnsw_threshold)
+    started = time.perf_counter()
+    batch_size = 50000
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start : start + batch_size]
+        ids = [str(i) for i in range(start, start + len(batch))]
+        index.upsert(ids, [""] * len(batch), [{}] * len(batch), batch)
+    build_time = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(
+        f"  in_memory[{dtype}{', hnsw' if hnsw_threshold else ''}]: "
+        f"загрузка {build_time:.1f} с, память {index.nbytes / 2**20:.0f} МиБ, {percentiles(latencies)}"
+    )
+
+
+def bench_chroma(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    limit: int,
+    host: str,
+    port: int,
+) -> None:
+    import chromadb
+
+    client = chromadb.HttpClient(host=host, port=port)
+    collection = client.create_collection(
+        f"bench-{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}
+    )
+    try:
+        started = time.perf_counter()
+        batch_size = 500
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start : start + batch_size]
+            collection.add(
+                ids=[str(i) for i in range(start, start + len(batch))],
+                embeddings=batch,
+                documents=[""] * len(batch),
+            )
+        build_time = time.perf_counter() - started
+
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            collection.query(query_embeddings=[query], n_results=limit)
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"  chroma[http]: загрузка {build_time:.1f} с, {percentiles(latencies)}")
+    finally:
+        client.delete_collection(collection.name)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--hnsw-threshold", type=int, default=0)
+    parser.add_argument("--chroma-host", default=None)
+    parser.add_argument("--chroma-port", type=int, default=8000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = random_vectors(rng, args.queries, args.dimension)
+    for size in args.sizes:
+        print(f"Чанков: {size}, размерность: {args.dimension}")
+        vectors = random_vectors(rng, size, args.dimension)
+        bench_in_memory(vectors, queries, args.dtype, args.limit, args.hnsw_threshold)
+        if args.chroma_host:
+            await asyncio.to_thread(
+                bench_chroma, vectors, queries, args.limit, args.chroma_host, args.chroma_port
+            )
+        del vectors
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""Пропускная способность /api/v1/query в зависимости от числа воркеров uvicorn
+
+Пример запуска (из каталога application-stage-1, настройки берутся из .env):
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 2000 --concurrency 64
+
+Для каждого числа воркеров приложение запускается заново. Перед замером каждый
+вопрос отправляется один раз: ответы попадают в общий кэш SQLite, и замер
+показывает, как масштабируется обслуживание запросов без ожидания GigaChat.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_prompts(path: Path) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def start_server(app: str, workers: int, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env={**os.environ, "API_WORKERS": str(workers)},
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("Приложение не запустилось")
+
+
+async def run_load(
+    client: httpx.AsyncClient, queue: list[str], concurrency: int
+) -> tuple[float, list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while queue:
+            prompt = queue.pop()
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/query", json={"prompt": prompt})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+async def bench(args: argparse.Namespace, workers: int, prompts: list[str]) -> None:
+    process = start_server(args.app, workers, args.port)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            await wait_ready(client, args.startup_timeout)
+            # Прогрев: заполнение общего кэша и запуск всех воркеров
+            await run_load(client, list(prompts), args.concurrency)
+            duration, latencies, errors = await run_load(
+                client,
+                [random.choice(prompts) for _ in range(args.requests)],
+                args.concurrency,
+            )
+        latencies.sort()
+        print(
+            f"  воркеров: {workers}: {len(latencies) / duration:.0f} запросов/с, "
+            f"mean={statistics.fmean(latencies):.1f} мс "
+            f"p95={latencies[int(len(latencies) * 0.95)]:.1f} мс, ошибок: {errors}"
+        )
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=ROOT / "scripts" / "data" / "query_router_train.jsonl",
+    )
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.data)
+    print(f"Запросов: {args.requests}, одновременно: {args.concurrency}, вопросов: {len(prompts)}")
+    for workers in args.workers:
+        await bench(args, workers, prompts)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,236 @@
+"""Офлайн-оценка стратегий поиска: recall@k, MRR, задержка и размер промпта
+
+Пример запуска (из каталога application-stage-1):
+    python benchmarks/eval_retrieval.py
+    python benchmarks/eval_retrieval.py --embedding-model onnx --model-path ./models/embeddings
+    python benchmarks/eval_retrieval.py --backend chroma --chroma-host localhost --chroma-port 8000 \\
+        --output benchmarks/results/retrieval.jsonl
+
+Документы из documents/ индексируются заново для каждой пары размер чанка /
+перекрытие (RAGService.text_splitter), затем для каждой стратегии из
+--strategies выполняются вопросы из --data. Чанк считается релевантным, если
+он из ожидаемого файла и содержит не меньше --match-threshold слов ожидаемого
+фрагмента. По умолчанию эмбеддинги считаются локально (хэширование признаков),
+хранилище встроенное — оценка не требует сети и ключей. Стратегии
+с parent_chunk_size индексируют чанки внутри разделов этого размера и
+оценивают разделы, подставляемые в контекст (small-to-big). Токены промпта
+оцениваются по числу символов контекста и вопроса. С --output результаты
+дописываются в JSONL для отслеживания между запусками.
+"""
+
+from dataclasses import asdict, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.base.embedding_service_base import EmbeddingServiceBase  # noqa: E402
+from app.services.base.vector_store_service_base import VectorStoreServiceBase  # noqa: E402
+from app.services.factory.embedding_service_factory import (  # noqa: E402
+    EmbeddingServiceFactory,
+)
+from app.services.factory.vector_store_service_factory import (  # noqa: E402
+    VectorStoreServiceFactory,
+)
+from app.services.rag_service import RAGService  # noqa: E402
+from app.services.retrieval.lexical_index import BM25Index, lexical_terms  # noqa: E402
+from app.services.retrieval.parent_store import ParentStore  # noqa: E402
+from app.services.retrieval.retriever import Retriever, RetrievalStrategy  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+STRATEGY_FIELDS = {field.name for field in fields(RetrievalStrategy)}
+
+
+def load_jsonl(path: Path) -> list[dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    result = {"mean": statistics.fmean(latencies)}
+    for p in (50, 95, 99):
+        result[f"p{p}"] = latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+    return {name: round(value, 3) for name, value in result.items()}
+
+
+def is_relevant(result: dict[str, Any], sample: dict[str, Any], threshold: float) -> bool:
+    if result.get("metadata", {}).get("source") != sample["source"]:
+        return False
+    expected = set(lexical_terms(sample["expected"], stem_length=100))
+    found = set(lexical_terms(result["content"], stem_length=100))
+    return len(expected & found) / len(expected) >= threshold
+
+
+async def build_index(
+    args: argparse.Namespace,
+    embedding_service: EmbeddingServiceBase,
+    chunk_size: int,
+    chunk_overlap: int,
+    parent_chunk_size: int = 0,
+) -> tuple[RAGService, int]:
+    """Индексация документов с заданным разбиением на чанки"""
+    vector_store: VectorStoreServiceBase = VectorStoreServiceFactory.create_service(
+        provider=args.backend,
+        collection_name=f"retrieval-eval-{chunk_size}-{chunk_overlap}-{parent_chunk_size}",
+        embedding_service=embedding_service,
+        chroma_db_host=args.chroma_host,
+        chroma_db_port=args.chroma_port,
+    )
+    vector_store.clear_collection()
+    # Генерация ответов в оценке поиска не используется
+    rag_service = RAGService(vector_store=vector_store, llm_service=None)
+    if parent_chunk_size:
+        rag_service.parent_store = ParentStore()
+        rag_service.parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=parent_chunk_size, chunk_overlap=0
+        )
+    rag_service.text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
+    )
+    for path in sorted(args.documents.glob("*.txt")):
+        await rag_service.add_document(path.read_text(encoding="utf-8"), path.name)
+    return rag_service, vector_store.count()
+
+
+async def evaluate(
+    args: argparse.Namespace,
+    rag_service: RAGService,
+    retriever: Retriever,
+    strategy: RetrievalStrategy,
+    samples: list[dict[str, Any]],
+) -> dict[str, Any]:
+    hits = 0
+    reciprocal_ranks = []
+    latencies = []
+    prompt_tokens = []
+    for sample in samples:
+        started = time.perf_counter()
+        results = await retriever.retrieve(sample["question"], strategy)
+        if rag_service.parent_store:
+            results = rag_service.parent_store.resolve(results)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        rank = next(
+            (
+                position
+                for position, result in enumerate(results, 1)
+                if is_relevant(result, sample, args.match_threshold)
+            ),
+            None,
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        context = rag_service._prepare_context(results)
+        prompt_tokens.append(len(context + sample["question"]) / args.chars_per_token)
+
+    return {
+        "recall_at_k": round(hits / len(samples), 4),
+        "mrr": round(statistics.fmean(reciprocal_ranks), 4),
+        "latency_ms": percentiles(latencies),
+        "prompt_tokens": round(statistics.fmean(prompt_tokens), 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--data", type=Path, default=ROOT / "benchmarks" / "data" / "retrieval_eval.jsonl"
+    )
+    parser.add_argument(
+        "--strategies",
+        type=Path,
+        default=ROOT / "benchmarks" / "data" / "retrieval_strategies.json",
+    )
+    parser.add_argument("--documents", type=Path, default=ROOT / "documents")
+    parser.add_argument("--backend", choices=["in_memory", "chroma"], default="in_memory")
+    parser.add_argument("--chroma-host", default="localhost")
+    parser.add_argument("--chroma-port", default="8000")
+    parser.add_argument("--embedding-model", choices=["hashing", "onnx"], default="hashing")
+    parser.add_argument("--model-path", default=settings.local_embedding_model_path)
+    parser.add_argument("--match-threshold", type=float, default=0.6)
+    parser.add_argument("--chars-per-token", type=float, default=3.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    samples = load_jsonl(args.data)
+    with open(args.strategies, "r", encoding="utf-8") as f:
+        configs = json.load(f)
+    embedding_service = EmbeddingServiceFactory.create_service(
+        api_provider="local",
+        model=args.embedding_model,
+        local_model_path=args.model_path,
+        local_query_prefix=settings.local_embedding_query_prefix,
+        local_document_prefix=settings.local_embedding_document_prefix,
+    )
+    embedding_model = embedding_service.get_service_info()["model"]
+
+    indexes: dict[tuple[int, int, int], tuple[RAGService, Retriever, int]] = {}
+    records = []
+    print(f"Вопросов: {len(samples)}, хранилище: {args.backend}, эмбеддинги: {embedding_model}")
+    print(f"{'стратегия':<22} {'чанков':>6} {'recall@k':>9} {'MRR':>6} {'p50, мс':>8} {'p95, мс':>8} {'токенов':>8}")
+    for config in configs:
+        chunking = (
+            config.get("chunk_size", 250),
+            config.get("chunk_overlap", 50),
+            config.get("parent_chunk_size", 0),
+        )
+        if chunking not in indexes:
+            rag_service, chunks = await build_index(args, embedding_service, *chunking)
+            retriever = Retriever(
+                rag_service.vector_store,
+                lexical_index=BM25Index.from_vector_store(rag_service.vector_store),
+            )
+            indexes[chunking] = (rag_service, retriever, chunks)
+        rag_service, retriever, chunks = indexes[chunking]
+        rag_service.context_chunks = config.get("context_chunks", 3)
+
+        strategy = RetrievalStrategy(
+            **{key: value for key, value in config.items() if key in STRATEGY_FIELDS}
+        )
+        metrics = await evaluate(args, rag_service, retriever, strategy, samples)
+        print(
+            f"{strategy.name:<22} {chunks:>6} {metrics['recall_at_k']:>9.3f} {metrics['mrr']:>6.3f} "
+            f"{metrics['latency_ms']['p50']:>8.2f} {metrics['latency_ms']['p95']:>8.2f} "
+            f"{metrics['prompt_tokens']:>8.0f}"
+        )
+        records.append(
+            {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "dataset": args.data.name,
+                "questions": len(samples),
+                "backend": args.backend,
+                "embedding_model": embedding_model,
+                "chunk_size": chunking[0],
+                "chunk_overlap": chunking[1],
+                "parent_chunk_size": chunking[2],
+                "context_chunks": rag_service.context_chunks,
+                "chunks": chunks,
+                "strategy": asdict(strategy),
+                "metrics": metrics,
+            }
+        )
+
+    await embedding_service.close()
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Создание и восстановление снимков коллекций векторного хранилища
+
+Пример запуска (из каталога application-stage-1):
+    python scripts/snapshot.py export --name before-update --dtype float16
+    python scripts/snapshot.py list
+    python scripts/snapshot.py restore before-update
+
+Подключение к хранилищу берется из .env. Восстановление не обращается к сервису эмбеддингов.
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings  # noqa: E402
+from app.main import (  # noqa: E402
+    create_embedding_service,
+    create_snapshot_service,
+    create_vector_store_service,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--collections",
+        nargs="+",
+        help="Коллекции для снимка, по умолчанию основная и коллекции маршрутизатора",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--name")
+    export_parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    restore_parser = subparsers.add_parser("restore")
+    restore_parser.add_argument("name")
+    restore_parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    collections = args.collections or [
+        settings.chroma_db_collection_name,
+        *(
+            route.split("=", 1)[1].strip()
+            for route in filter(None, settings.query_router_collections.split(","))
+        ),
+    ]
+    embedding_service = create_embedding_service()
+    snapshot_service = create_snapshot_service(
+        [
+            create_vector_store_service(collection_name, embedding_service)
+            for collection_name in dict.fromkeys(collections)
+        ]
+    )
+
+    if args.command == "list":
+        for manifest in snapshot_service.list_snapshots():
+            counts = ", ".join(
+                f"{c['name']}={c['records_count']}" for c in manifest["collections"]
+            )
+            print(
+                f"{manifest['name']}  {manifest['created_at']}  {manifest['dtype']}  "
+                f"{manifest['size_bytes'] / 2**20:.1f} МиБ  {counts}"
+            )
+    elif args.command == "export":
+        manifest = snapshot_service.export_snapshot(args.name, args.dtype)
+        print(
+            f"Снимок {manifest['name']} создан: "
+            f"{sum(c['records_count'] for c in manifest['collections'])} записей, "
+            f"{manifest['size_bytes'] / 2**20:.1f} МиБ"
+        )
+    else:
+        result = snapshot_service.restore_snapshot(args.name, force=args.force)
+        print(
+            f"Снимок {result['name']} восстановлен за {result['duration']:.2f} с: {result['collections']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Обучение локального маршрутизатора запросов
+
+Пример запуска (из каталога application-stage-1):
+    python scripts/train_query_router.py --data scripts/data/query_router_train.jsonl
+"""
+
+from pathlib import Path
+import argparse
+import json
+import math
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.router.query_router import (  # noqa: E402
+    DEFAULT_WEIGHTS_PATH,
+    extract_features,
+)
+
+
+def load_dataset(path: Path) -> list[tuple[str, str]]:
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                samples.append((record["text"], record["label"]))
+    return samples
+
+
+def softmax(scores: list[float]) -> list[float]:
+    max_score = max(scores)
+    exp_scores = [math.exp(score - max_score) for score in scores]
+    total = sum(exp_scores)
+    return [score / total for score in exp_scores]
+
+
+def predict(
+    features: set[str],
+    bias: list[float],
+    weights: dict[str, list[float]],
+) -> list[float]:
+    scores = list(bias)
+    for feature in features:
+        for i, weight in enumerate(weights.get(feature, ())):
+            scores[i] += weight
+    return softmax(scores)
+
+
+def train(
+    samples: list[tuple[str, str]],
+    classes: list[str],
+    stem_length: int,
+    epochs: int,
+    learning_rate: float,
+    l2: float,
+    seed: int,
+) -> tuple[list[float], dict[str, list[float]]]:
+    """Мультиклассовая логистическая регрессия, SGD с L2-регуляризацией"""
+    rng = random.Random(seed)
+    encoded = [
+        (extract_features(text, stem_length), classes.index(label))
+        for text, label in samples
+    ]
+    bias = [0.0] * len(classes)
+    weights: dict[str, list[float]] = {}
+
+    for _ in range(epochs):
+        rng.shuffle(encoded)
+        for features, target in encoded:
+            probabilities = predict(features, bias, weights)
+            for i, probability in enumerate(probabilities):
+                gradient = probability - (1.0 if i == target else 0.0)
+                bias[i] -= learning_rate * gradient
+                for feature in features:
+                    feature_weights = weights.setdefault(feature, [0.0] * len(classes))
+                    feature_weights[i] -= learning_rate * (
+                        gradient + l2 * feature_weights[i]
+                    )
+    return bias, weights
+
+
+def evaluate(
+    samples: list[tuple[str, str]],
+    classes: list[str],
+    stem_length: int,
+    bias: list[float],
+    weights: dict[str, list[float]],
+) -> float:
+    if not samples:
+        return 0.0
+    correct = 0
+    for text, label in samples:
+        probabilities = predict(extract_features(text, stem_length), bias, weights)
+        if classes[probabilities.index(max(probabilities))] == label:
+            correct += 1
+    return correct / len(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=Path(__file__).parent / "data" / "query_router_train.jsonl",
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_WEIGHTS_PATH)
+    parser.add_argument("--stem-length", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--learning-rate", type=float, default=0.2)
+    parser.add_argument("--l2", type=float, default=0.001)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-weight", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    samples = load_dataset(args.data)
+    classes = sorted({label for _, label in samples})
+
+    shuffled = list(samples)
+    random.Random(args.seed).shuffle(shuffled)
+    holdout_size = int(len(shuffled) * args.holdout)
+    holdout, train_part = shuffled[:holdout_size], shuffled[holdout_size:]
+
+    bias, weights = train(
+        train_part,
+        classes,
+        args.stem_length,
+        args.epochs,
+        args.learning_rate,
+        args.l2,
+        args.seed,
+    )
+    holdout_accuracy = evaluate(holdout, classes, args.stem_length, bias, weights)
+    print(f"Точность на отложенной выборке ({len(holdout)}): {holdout_accuracy:.3f}")
+
+    bias, weights = train(
+        samples,
+        classes,
+        args.stem_length,
+        args.epochs,
+        args.learning_rate,
+        args.l2,
+        args.seed,
+    )
+    train_accuracy = evaluate(samples, classes, args.stem_length, bias, weights)
+    print(f"Точность на обучающей выборке ({len(samples)}): {train_accuracy:.3f}")
+
+    pruned_weights = {
+        feature: [round(weight, 4) for weight in feature_weights]
+        for feature, feature_weights in sorted(weights.items())
+        if max(abs(weight) for weight in feature_weights) >= args.min_weight
+    }
+    model = {
+        "classes": classes,
+        "stem_length": args.stem_length,
+        "bias": [round(value, 4) for value in bias],
+        "weights": pruned_weights,
+        "training": {
+            "samples": len(samples),
+            "holdout_accuracy": round(holdout_accuracy, 4),
+            "train_accuracy": round(train_accuracy, 4),
+        },
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, indent=1)
+    print(f"Веса сохранены в {args.output} (признаков: {len(pruned_weights)})")
+
+
+if __name__ == "__main__":
+    main()
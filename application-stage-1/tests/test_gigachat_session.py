@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import httpx
+
+from app.services.gigachat.gigachat_session import GigaChatSession
+
+AUTH_URL = "https://auth.test/api/v2/oauth"
+
+
+def create_session(handler) -> GigaChatSession:
+    session = GigaChatSession(credentials="Y3JlZGVudGlhbHM=", token_refresh_margin=60.0)
+    session.client._settings.auth_url = AUTH_URL
+    # Клиент авторизации SDK создается лениво, до первого запроса его можно заменить
+    session.client.__dict__["_auth_aclient"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    return session
+
+
+def test_refresh_token_updates_shared_client_token():
+    requests = []
+    expires_at = int((time.time() + 1800) * 1000)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={"access_token": f"token-{len(requests)}", "expires_at": expires_at},
+        )
+
+    async def run():
+        session = create_session(handler)
+        try:
+            await session.refresh_token()
+            first = session.client.token
+            await asyncio.gather(session.refresh_token(), session.refresh_token())
+            return first, session.client.token, session._seconds_until_refresh()
+        finally:
+            await session.close()
+
+    first, last, until_refresh = asyncio.run(run())
+
+    assert first == "token-1"
+    assert last == "token-3"
+    assert [str(request.url) for request in requests] == [AUTH_URL] * 3
+    assert requests[0].headers["Authorization"] == "Bearer Y3JlZGVudGlhbHM="
+    assert 1700 < until_refresh <= 1740
+
+
+def test_refresh_loop_refreshes_token_after_start():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            json={
+                "access_token": "token",
+                "expires_at": int((time.time() + 1800) * 1000),
+            },
+        )
+
+    async def run():
+        session = create_session(handler)
+        try:
+            await session.start()
+            for _ in range(100):
+                if session.client.token:
+                    break
+                await asyncio.sleep(0.01)
+            return session.client.token
+        finally:
+            await session.close()
+
+    assert asyncio.run(run()) == "token"